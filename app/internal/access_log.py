@@ -0,0 +1,327 @@
+"""
+This module contains the structured access and audit log.
+
+Requests only put their log record on an in-memory queue. A background thread formats the records as JSON lines and
+writes them in batches to a rotating file, so disk I/O never adds latency to a request. Reads can be sampled, while
+writes and errors are always logged for auditing.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pymongo import monitoring
+
+
+# Fields collected while handling the current request (user, candidate id, DB time)
+REQUEST_CONTEXT = contextvars.ContextVar("request_context", default=None)
+
+# Methods that change data, always logged
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Queue item telling the writer thread to stop
+_STOP = object()
+
+# Set by the multi-worker launcher, so that each worker rotates its own log files
+PER_WORKER_LOGS = "PER_WORKER_LOGS"
+
+
+def worker_log_path(path: str) -> str:
+    """
+    Return the log file of this worker process.
+
+    Rotating handlers of several processes sharing one file would rename it under each other, so under several
+    workers each one writes its own file, named after its pid (`access.log` becomes `access.1234.log`).
+    """
+    if not path or not os.environ.get(PER_WORKER_LOGS):
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{extension}"
+
+
+def annotate(**fields):
+    """
+    Attach fields (e.g. user, candidate_id) to the access log record of the current request.
+    """
+    context = REQUEST_CONTEXT.get()
+    if context is not None:
+        context.update(fields)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON line. Dictionary messages are merged into the line.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._encoder = json.JSONEncoder(default=str, separators=(",", ":"))
+        self._second = None
+        self._second_text = ""
+
+    def timestamp(self, created: float) -> str:
+        """
+        Format a UTC ISO 8601 timestamp with milliseconds, reusing the formatted second.
+        """
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        return f"{self._second_text}.{int(created * 1000) % 1000:03d}Z"
+
+    def format_entry(self, created: float, level: str, name: str, entry: dict) -> str:
+        """
+        Format a dictionary entry as one JSON line.
+        """
+        return self._encoder.encode(
+            {"ts": self.timestamp(created), "level": level, "logger": name, **entry}
+        )
+
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            entry = record.msg
+        else:
+            entry = {"message": record.getMessage()}
+        return self.format_entry(record.created, record.levelname, record.name, entry)
+
+
+class _QueueHandler(logging.Handler):
+    """
+    Handler only enqueuing records; formatting happens on the writer thread. Records are dropped (and counted)
+    when the queue is full instead of blocking the request.
+    """
+
+    def __init__(self, access_log):
+        super().__init__()
+        self.access_log = access_log
+
+    def emit(self, record: logging.LogRecord):
+        self.access_log.enqueue(record)
+
+
+class AccessLog:
+    """
+    Non-blocking JSON log pipeline: queue, background batching writer and rotating file.
+
+    Access records skip the logging module's record creation (`record`), other loggers can be attached to the
+    same pipeline (`attach`).
+
+    Attributes:
+    - sample_rate: Share of successful reads logged (writes and errors are always logged).
+    - logger: Logger receiving the access records.
+    """
+
+    def __init__(
+        self,
+        path: str = "access.log",
+        sample_rate: float = 1.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 5,
+        max_queue: int = 100000,
+        max_batch: int = 1000,
+    ):
+        self.sample_rate = sample_rate
+        self.max_batch = max_batch
+        self._queue = queue.Queue(max_queue)
+        self._formatter = JsonFormatter()
+        # No path writes the JSON lines to stderr
+        self._output = (
+            RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+            )
+            if path
+            else logging.StreamHandler(sys.stderr)
+        )
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+
+        self.handler = _QueueHandler(self)
+        self.logger = logging.getLogger("app.access")
+        self.attach(self.logger)
+
+    def attach(self, logger: logging.Logger):
+        """
+        Send the records of a logger (e.g. lifecycle events) through this pipeline.
+        """
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        if self.handler not in logger.handlers:
+            logger.addHandler(self.handler)
+
+    def record(self, entry: dict):
+        """
+        Queue an access record, the cheapest way in: only the timestamp is taken on the request's thread.
+        """
+        self.enqueue((time.time(), entry))
+
+    def enqueue(self, record):
+        """
+        Queue a log record (or a (timestamp, entry) pair) for the writer thread, starting it on first use.
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+
+    def start(self):
+        """
+        Start the writer thread.
+        """
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._write_batches, name="access-log", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """
+        Write the queued records and stop the writer thread.
+        """
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._output.close()
+
+    def _write_batches(self):
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever queued up meanwhile, so busy periods are written in large batches
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = _STOP in batch
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                lines = []
+                for record in records:
+                    try:
+                        if isinstance(record, tuple):
+                            lines.append(
+                                self._formatter.format_entry(
+                                    record[0], "INFO", self.logger.name, record[1]
+                                )
+                            )
+                        else:
+                            lines.append(self._formatter.format(record))
+                    except Exception:
+                        self._dropped += 1
+                # One write (and rollover check) per batch
+                self._output.emit(logging.makeLogRecord({"msg": "\n".join(lines)}))
+                self._written += len(lines)
+                self._batches += 1
+            if stopping:
+                return
+
+    def stats(self) -> dict:
+        """
+        Return the number of written and dropped records, and of written batches.
+        """
+        return {
+            "written": self._written,
+            "dropped": self._dropped,
+            "batches": self._batches,
+            "queued": self._queue.qsize(),
+        }
+
+
+class DbTimer(monitoring.CommandListener):
+    """
+    Command listener adding the duration of each DB command to the current request's access log record.
+
+    pymongo calls listeners on the thread running the command, which carries the request's context. A request may
+    run commands on several threads at once (e.g. a list and its count), so the total is summed under a lock.
+    """
+
+    _lock = threading.Lock()
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._add(event)
+
+    def failed(self, event):
+        self._add(event)
+
+    @classmethod
+    def _add(cls, event):
+        context = REQUEST_CONTEXT.get()
+        if context is not None:
+            with cls._lock:
+                context["db_ms"] = (
+                    context.get("db_ms", 0) + event.duration_micros / 1000
+                )
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware logging one structured record per request: route, method, status, latency, DB time, and the
+    user and candidate annotated by the routes.
+
+    Attributes:
+    - access_log: Pipeline the records are sent to.
+    """
+
+    def __init__(self, app, access_log: AccessLog):
+        self.app = app
+        self.access_log = access_log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        context = {}
+        token = REQUEST_CONTEXT.set(context)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_CONTEXT.reset(token)
+            method = scope["method"]
+            if (
+                method in WRITE_METHODS
+                or status >= 400
+                or self.access_log.sample_rate >= 1
+                or random.random() < self.access_log.sample_rate
+            ):
+                route = scope.get("route")
+                path_params = scope.get("path_params") or {}
+                self.access_log.record(
+                    {
+                        "event": "access",
+                        "method": method,
+                        "route": getattr(route, "path", scope["path"]),
+                        "status": status,
+                        "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+                        "db_ms": context.get("db_ms"),
+                        "user": context.get("user"),
+                        "candidate_id": context.get(
+                            "candidate_id", path_params.get("candidate_id")
+                        ),
+                    }
+                )
@@ -0,0 +1,188 @@
+"""
+This module contains the stateless JWT authorization helpers.
+
+Tokens carry the user's id and token version, so authorization only needs an in-memory revocation check
+instead of a user lookup. Bumping a user's `token_version` in the DB revokes all their older tokens.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+# Field storing the current token version on each user document
+TOKEN_VERSION_FIELD = "token_version"
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Attributes:
+    - size: Number of bits.
+    - hashes: Number of hash functions.
+    """
+
+    def __init__(self, size: int = 1 << 20, hashes: int = 4):
+        self.size = size
+        self.hashes = hashes
+        self._bits = bytearray(size // 8 + 1)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=8 * self.hashes).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[i * 8 : (i + 1) * 8], "little") % self.size
+
+    def add(self, value: str):
+        """
+        Add a value to the filter.
+        """
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class RevocationFilter:
+    """
+    In-memory view of revoked token versions, refreshed periodically from the user repository.
+
+    The Bloom filter answers "never revoked" for almost every user without touching the exact map,
+    which stays authoritative for the (rare) users whose tokens were revoked.
+
+    Revocations are only applied locally by the worker that handled them, other workers pick them up on their
+    next refresh, up to `refresh_interval` seconds later.
+
+    Attributes:
+    - refresh_interval: Seconds between two refreshes from the DB.
+    """
+
+    def __init__(self, refresh_interval: float = 30):
+        self.refresh_interval = refresh_interval
+        self._bloom = BloomFilter()
+        self._min_versions = {}
+        self._refreshed_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # Local revocations made since the current refresh started, which its scan may have missed
+        self._revoked_since_refresh = {}
+
+    def refresh(self, user_repository):
+        """
+        Reload the revoked token versions from the user repository.
+
+        Args:
+        - user_repository: Repository holding the users.
+        """
+        with self._lock:
+            self._revoked_since_refresh = {}
+        bloom = BloomFilter(self._bloom.size, self._bloom.hashes)
+        min_versions = {}
+        for user in user_repository.find_revoked():
+            bloom.add(user["_id"])
+            min_versions[user["_id"]] = user[TOKEN_VERSION_FIELD]
+
+        with self._lock:
+            for user_id, min_version in self._revoked_since_refresh.items():
+                bloom.add(user_id)
+                min_versions[user_id] = max(min_version, min_versions.get(user_id, 0))
+            # Swap both structures at once so readers never see a partial refresh
+            self._bloom, self._min_versions = bloom, min_versions
+        self._refreshed_at = time.monotonic()
+
+    def maybe_refresh(self, user_repository):
+        """
+        Refresh in the background if the snapshot is stale. Only one refresh runs at a time, and callers keep
+        using the old snapshot meanwhile, so this never blocks.
+
+        Args:
+        - user_repository: Repository holding the users.
+        """
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        threading.Thread(
+            target=self._refresh_and_release, args=(user_repository,), daemon=True
+        ).start()
+
+    def _refresh_and_release(self, user_repository):
+        try:
+            self.refresh(user_repository)
+        finally:
+            self._refresh_lock.release()
+
+    def revoke(self, user_id: str, min_version: int):
+        """
+        Locally revoke all tokens of a user older than `min_version`, ahead of the next refresh.
+
+        Args:
+        - user_id: User's UUID.
+        - min_version: Lowest token version still accepted.
+        """
+        with self._lock:
+            self._bloom.add(user_id)
+            self._min_versions[user_id] = max(
+                min_version, self._min_versions.get(user_id, 0)
+            )
+            self._revoked_since_refresh[user_id] = self._min_versions[user_id]
+
+    def is_revoked(self, user_id: str, version: int) -> bool:
+        """
+        Check whether a token version of a user was revoked.
+
+        Args:
+        - user_id: User's UUID.
+        - version: Token version claim.
+
+        Returns:
+        - True if the token must be rejected.
+        """
+        if user_id not in self._bloom:
+            return False
+        return version < self._min_versions.get(user_id, 0)
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of decoded and verified JWT payloads, kept until each token expires.
+
+    Attributes:
+    - max_size: Maximum number of cached tokens.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        """
+        Return the cached payload of a token, or None if absent or expired.
+        """
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            if payload["exp"] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict):
+        """
+        Cache the verified payload of a token.
+        """
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,120 @@
+"""
+This module contains the micro-batching stage for candidate inserts.
+
+Concurrent inserts are collected for a few milliseconds (or until the batch is full) and flushed together as one
+unordered bulk insert. Each waiting request then gets back its own result, including per-row duplicate errors.
+"""
+
+import threading
+
+
+class _Batch:
+    """
+    A batch of documents waiting to be flushed together.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.results = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class InsertBatcher:
+    """
+    Collects concurrent inserts into micro-batches.
+
+    The first request of a batch leads it: it waits up to `max_delay_ms` for more documents (or until `max_batch`
+    documents are queued) and then flushes the batch, so no request waits much longer than `max_delay_ms` plus
+    one bulk insert.
+
+    Every request blocks its thread until the flush, so a batch can only grow as large as the number of threads
+    submitting to it (the threadpool of the sync routes, 40 threads by default).
+
+    Attributes:
+    - flush: Callable inserting a list of documents and returning one result (document or exception) per row.
+    - max_delay_ms: Maximum time the leader waits for more documents.
+    - max_batch: Maximum number of documents per batch.
+    """
+
+    def __init__(self, flush, max_delay_ms: float = 5, max_batch: int = 100):
+        self.flush = flush
+        self.max_delay_ms = max_delay_ms
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = None
+        self._batches = 0
+        self._documents = 0
+        self._largest = 0
+
+    def submit(self, document: dict) -> dict:
+        """
+        Insert a document as part of the current batch, blocking until the batch is flushed.
+
+        Args:
+        - document: Document to insert.
+
+        Returns:
+        - The stored document.
+
+        Raises:
+        - The row's error (e.g. DuplicateKeyError), or the error of the whole flush.
+        """
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._pending = batch
+            index = len(batch.documents)
+            batch.documents.append(document)
+            if len(batch.documents) >= self.max_batch:
+                # Close the batch so the next request starts a new one
+                self._pending = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_delay_ms / 1000)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            self._flush(batch)
+        else:
+            batch.done.wait()
+
+        result = batch.results[index]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _flush(self, batch: _Batch):
+        """
+        Flush a closed batch and wake up its waiting requests.
+        """
+        try:
+            batch.results = self.flush(batch.documents)
+        except Exception as e:
+            batch.results = [e] * len(batch.documents)
+        finally:
+            with self._lock:
+                self._batches += 1
+                self._documents += len(batch.documents)
+                self._largest = max(self._largest, len(batch.documents))
+            batch.done.set()
+
+    def stats(self) -> dict:
+        """
+        Return batching metrics.
+
+        Returns:
+        - Dictionary with the number of flushed batches and documents.
+        """
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "documents": self._documents,
+                "largest_batch": self._largest,
+                "average_batch": self._documents / self._batches
+                if self._batches
+                else 0,
+            }
@@ -0,0 +1,196 @@
+"""
+This module contains the query time budgets.
+
+Each read operation gets a time budget, shortened by the caller's own deadline when it sends one. The remaining
+budget is applied as `maxTimeMS` on the DB cursor, and queries whose client disconnected are cancelled on the
+server instead of running to completion for nobody.
+"""
+
+import asyncio
+import threading
+import time
+from uuid import uuid4
+from pymongo.errors import ExecutionTimeout, OperationFailure
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+
+# Header carrying the caller's remaining time budget in milliseconds
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+# Non-standard status code logged for requests whose client closed the connection
+CLIENT_CLOSED_REQUEST = 499
+
+# Error codes raised by MongoDB for timed out and killed operations
+EXCEEDED_TIME_LIMIT = 50
+INTERRUPTED = 11601
+
+
+class QueryBudget:
+    """
+    Time budget and cancellation flag of the queries run for one request.
+
+    Attributes:
+    - operation: Name of the read operation (e.g. "list", "report").
+    - comment: Unique tag attached to the queries, used to find and kill them on the server.
+    - cancelled: Set once the client is gone.
+    """
+
+    def __init__(self, operation: str, budget_ms: int = 0, timeout_header: str = None):
+        self.operation = operation
+        self.comment = f"{operation}:{uuid4().hex}"
+        self.cancelled = threading.Event()
+
+        # The caller's deadline can only shorten the budget of the operation
+        try:
+            requested_ms = int(timeout_header) if timeout_header else 0
+        except ValueError:
+            requested_ms = 0
+        if requested_ms > 0:
+            budget_ms = min(budget_ms, requested_ms) if budget_ms else requested_ms
+
+        self.budget_ms = budget_ms
+        self._deadline = time.monotonic() + budget_ms / 1000 if budget_ms else None
+
+    def max_time_ms(self):
+        """
+        Return the remaining budget to apply as `maxTimeMS`, or None if unbounded.
+        """
+        if self._deadline is None:
+            return None
+        return max(1, int((self._deadline - time.monotonic()) * 1000))
+
+    def check(self):
+        """
+        Stop a query running in-process once it is cancelled or over budget.
+
+        Raises:
+        - OperationFailure: If the query was cancelled.
+        - ExecutionTimeout: If the budget is exhausted.
+        """
+        if self.cancelled.is_set():
+            raise OperationFailure("operation was interrupted", INTERRUPTED)
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise ExecutionTimeout("operation exceeded time limit", EXCEEDED_TIME_LIMIT)
+
+    def cancel(self, repository):
+        """
+        Cancel the queries of this budget, killing them on the server in the background.
+
+        Args:
+        - repository: Repository the queries were sent to.
+        """
+        self.cancelled.set()
+        threading.Thread(
+            target=repository.kill, args=(self.comment,), daemon=True
+        ).start()
+
+
+class BudgetMetrics:
+    """
+    Counts the queries that ran out of budget or were cancelled, per operation.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, outcome: str):
+        """
+        Count one outcome ("timeouts" or "cancelled") of an operation.
+        """
+        with self._lock:
+            counts = self._counts.setdefault(operation, {"timeouts": 0, "cancelled": 0})
+            counts[outcome] += 1
+
+    def stats(self) -> dict:
+        """
+        Return the counts per operation.
+        """
+        with self._lock:
+            return {
+                operation: dict(counts) for operation, counts in self._counts.items()
+            }
+
+
+class ClientDisconnected(Exception):
+    """
+    Raised when the client closed the connection while its query was running.
+    """
+
+
+async def run_query(
+    request,
+    budget: QueryBudget,
+    repository,
+    metrics: BudgetMetrics,
+    query,
+    poll_interval=0.1,
+):
+    """
+    Run a blocking query in the threadpool, cancelling it if the client disconnects meanwhile.
+
+    Args:
+    - request: Request the query is run for.
+    - budget: Budget of the query.
+    - repository: Repository the query is sent to, used to kill it.
+    - metrics: Metrics recording timeouts and cancellations.
+    - query: Callable running the query.
+    - poll_interval: Seconds between two disconnect checks.
+
+    Returns:
+    - The query's result.
+
+    Raises:
+    - ExecutionTimeout: If the query ran out of budget.
+    - ClientDisconnected: If the client disconnected before the query finished.
+    """
+    task = asyncio.ensure_future(run_in_threadpool(query))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll_interval)
+        if done:
+            try:
+                return task.result()
+            except ExecutionTimeout:
+                metrics.record(budget.operation, "timeouts")
+                raise
+        if await request.is_disconnected():
+            budget.cancel(repository)
+            metrics.record(budget.operation, "cancelled")
+            # The killed query still fails in its thread, nobody is left to read the error
+            task.add_done_callback(lambda finished: finished.exception())
+            raise ClientDisconnected()
+
+
+async def stream_query(
+    chunks, budget: QueryBudget, repository, metrics: BudgetMetrics, on_close=None
+):
+    """
+    Stream the chunks of a blocking iterator, cancelling its query if the response stops early.
+
+    A query running out of budget mid-stream aborts the response, since its status was already sent.
+
+    Args:
+    - chunks: Iterator of encoded chunks, reading from a DB cursor.
+    - budget: Budget of the cursor.
+    - repository: Repository the cursor reads from, used to kill it.
+    - metrics: Metrics recording timeouts and cancellations.
+    - on_close: Optional callable run once the stream is over, however it ended (e.g. ending its session).
+
+    Yields:
+    - The chunks.
+    """
+    finished = False
+    try:
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+        finished = True
+    except ExecutionTimeout:
+        finished = True
+        metrics.record(budget.operation, "timeouts")
+        raise
+    finally:
+        if not finished:
+            budget.cancel(repository)
+            metrics.record(budget.operation, "cancelled")
+        if on_close is not None:
+            on_close()
@@ -0,0 +1,163 @@
+"""
+This module contains the incremental change feed of the candidate collection.
+
+Downstream systems (warehouse, search cluster) sync by reading the candidates inserted, updated and deleted since
+their last checkpoint, in revision order, instead of exporting the whole collection. Each page is served by two
+range scans on the revision indexes (candidates and tombstones), bounded by the page size.
+
+Revisions are allocated before the write they stamp is committed, so a revision can become visible after a higher
+one. A checkpoint therefore never moves past a horizon (the collection revision at some point in time) until
+`settle_seconds` after that horizon was read, when every write stamped up to it has committed.
+
+The horizon and the changes are read from the primary: a secondary may lag by up to its maximum staleness, far
+beyond the settle delay, and a checkpoint moved past writes it had not replicated yet would skip them for good.
+"""
+
+import base64
+import time
+
+from app.internal.models import Candidate
+from app.internal.revisions import (
+    REVISION_FIELD,
+    CREATED_REVISION_FIELD,
+    DELETED_AT_FIELD,
+)
+
+
+# Candidate fields returned by the feed, plus the revisions used to order and classify the changes
+FEED_PROJECTION = {
+    **{field.alias or name: 1 for name, field in Candidate.model_fields.items()},
+    REVISION_FIELD: 1,
+    CREATED_REVISION_FIELD: 1,
+}
+
+
+class CheckpointExpired(Exception):
+    """
+    Raised when a checkpoint is older than the tombstones, so deletes may have been missed.
+    """
+
+
+def encode_checkpoint(since: int, horizon: int, read_at: float) -> str:
+    """
+    Build an opaque checkpoint.
+
+    Args:
+    - since: Revision of the last change delivered.
+    - horizon: Collection revision read at `read_at`, up to which changes are served once settled.
+    - read_at: Unix time the horizon was read at.
+    """
+    raw = f"{since}.{horizon}.{read_at:.3f}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_checkpoint(checkpoint: str) -> tuple:
+    """
+    Decode a checkpoint built by `encode_checkpoint`.
+
+    Raises:
+    - ValueError: If the checkpoint is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(checkpoint + "=" * (-len(checkpoint) % 4))
+        since, horizon, read_at = raw.decode().split(".", 2)
+        since, horizon, read_at = int(since), int(horizon), float(read_at)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid checkpoint")
+    if since < 0 or horizon < 0:
+        raise ValueError("Invalid checkpoint")
+    return since, horizon, read_at
+
+
+class ChangeFeed:
+    """
+    Paginated feed of the candidate changes after a checkpoint.
+
+    Attributes:
+    - settle_seconds: Seconds after which every write stamped with a revision up to a horizon has committed.
+    - retention_seconds: Seconds tombstones are kept, after which a checkpoint may have missed deletes.
+    """
+
+    def __init__(
+        self, settle_seconds: float = 2, retention_seconds: float = 30 * 24 * 60 * 60
+    ):
+        self.settle_seconds = settle_seconds
+        self.retention_seconds = retention_seconds
+
+    def page(
+        self,
+        candidate_repository,
+        checkpoint: str = None,
+        since: int = 0,
+        limit: int = 1000,
+        operation: str = None,
+    ) -> dict:
+        """
+        Return the next page of changes.
+
+        Each change is an insert or update (of a candidate written after the checkpoint, at its latest revision)
+        or the delete of a candidate.
+
+        Args:
+        - candidate_repository: Repository holding the candidates.
+        - checkpoint: Checkpoint returned by the previous page (None to start from `since`).
+        - since: Revision to start from without a checkpoint (e.g. the revision of a snapshot).
+        - limit: Maximum number of changes.
+        - operation: Name of the read operation used to pick its read preference (None for the primary, the
+          only member guaranteed to hold every committed write).
+
+        Returns:
+        - The changes, the checkpoint to pass for the next page, whether more changes are known, and the
+          seconds to wait before asking for them.
+
+        Raises:
+        - ValueError: If the checkpoint is malformed.
+        - CheckpointExpired: If the checkpoint is older than the tombstones.
+        """
+        now = time.time()
+        if checkpoint:
+            since, horizon, read_at = decode_checkpoint(checkpoint)
+            if now - read_at > self.retention_seconds:
+                raise CheckpointExpired("Checkpoint expired, resync from a snapshot")
+        else:
+            horizon, read_at = since, now
+
+        if since >= horizon:
+            # Caught up with the horizon: read the next one, served once settled
+            horizon, read_at = candidate_repository.current_revision(operation), now
+
+        changes = []
+        if since < horizon and now - read_at >= self.settle_seconds:
+            documents = candidate_repository.changes(
+                since, horizon, limit, operation, FEED_PROJECTION
+            )
+            last = documents[-1][REVISION_FIELD] if len(documents) == limit else horizon
+            changes = [self._change(document, since) for document in documents]
+            since = last
+            if since >= horizon:
+                horizon, read_at = candidate_repository.current_revision(operation), now
+
+        has_more = since < horizon
+        return {
+            "changes": changes,
+            "checkpoint": encode_checkpoint(since, horizon, read_at),
+            "has_more": has_more,
+            "retry_after": (
+                round(max(self.settle_seconds - (now - read_at), 0), 3)
+                if has_more
+                else self.settle_seconds
+            ),
+        }
+
+    @staticmethod
+    def _change(document: dict, since: int) -> dict:
+        revision = document.pop(REVISION_FIELD)
+        if DELETED_AT_FIELD in document:
+            return {"op": "delete", "revision": revision, "_id": document["_id"]}
+        # Candidates created before the checkpoint were already delivered once
+        created = document.pop(CREATED_REVISION_FIELD, 0)
+        return {
+            "op": "insert" if created > since else "update",
+            "revision": revision,
+            "candidate": document,
+        }
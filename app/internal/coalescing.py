@@ -0,0 +1,187 @@
+"""
+This module contains the request coalescing layer for candidate list queries.
+
+Identical concurrent queries share a single in-flight DB call, and results may optionally be kept in a short-TTL cache.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+# Operators whose list operands are order-insensitive
+UNORDERED_OPERATORS = {"$all", "$in", "$nin"}
+
+
+def normalize_filters(filters):
+    """
+    Normalize a Mongo filter document so that equivalent filters compare equal.
+
+    Args:
+    - filters: Filter document (or any nested value inside it).
+
+    Returns:
+    - A normalized copy of the filter with order-insensitive operands sorted.
+    """
+    if isinstance(filters, dict):
+        normalized = {}
+        for key, value in filters.items():
+            if key in UNORDERED_OPERATORS and isinstance(value, list):
+                normalized[key] = sorted(
+                    (normalize_filters(item) for item in value), key=repr
+                )
+            else:
+                normalized[key] = normalize_filters(value)
+        return normalized
+    if isinstance(filters, list):
+        return [normalize_filters(item) for item in filters]
+    return filters
+
+
+def canonical_filter_key(filters: dict) -> str:
+    """
+    Build a canonical cache key for a Mongo filter document.
+
+    Args:
+    - filters: Filter document built from the query parameters.
+
+    Returns:
+    - A stable string key, identical for equivalent filters.
+    """
+    return json.dumps(
+        normalize_filters(filters), sort_keys=True, separators=(",", ":"), default=str
+    )
+
+
+class _Call:
+    """
+    An in-flight call shared by the leader and its followers.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into a single execution.
+
+    Cached results are kept in a bounded LRU: expired entries are dropped whenever a result is stored, and the
+    least recently used ones once `max_entries` is reached.
+
+    Attributes:
+    - ttl: Seconds a successful result stays cached (0 disables the cache).
+    - max_entries: Maximum number of cached results.
+    """
+
+    def __init__(self, ttl: float = 0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cache = OrderedDict()
+        self._generation = 0
+        self._executed = 0
+        self._collapsed = 0
+        self._cache_hits = 0
+
+    def do(self, key: str, fn, retry_if=None):
+        """
+        Run `fn` once for all concurrent callers sharing `key`.
+
+        Args:
+        - key: Canonical key of the call.
+        - fn: Zero-argument callable performing the actual work.
+        - retry_if: Optional predicate on the leader's error. Followers seeing an error it accepts (e.g. the
+          leader's query was killed because its own client left) run the call again instead of raising it.
+
+        Returns:
+        - The result of `fn`, either computed, shared, or cached.
+        """
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                expires, result = cached
+                if expires > time.monotonic():
+                    self._cache_hits += 1
+                    self._cache.move_to_end(key)
+                    return result
+                del self._cache[key]
+
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                generation = self._generation
+                self._executed += 1
+            else:
+                self._collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                if retry_if is not None and retry_if(call.error):
+                    return self.do(key, fn, retry_if)
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                # Never cache a result that may predate a write
+                if (
+                    call.error is None
+                    and self.ttl > 0
+                    and self.max_entries > 0
+                    and generation == self._generation
+                ):
+                    self._store(key, call.result)
+            call.done.set()
+
+        return call.result
+
+    def _store(self, key: str, result):
+        now = time.monotonic()
+        for expired in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+            del self._cache[expired]
+        self._cache[key] = (now + self.ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Drop cached results and detach in-flight calls after a write.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._calls.clear()
+            self._generation += 1
+
+    def stats(self) -> dict:
+        """
+        Return coalescing metrics.
+
+        Returns:
+        - Dictionary with executed, collapsed and cached call counts.
+        """
+        with self._lock:
+            return {
+                "executed": self._executed,
+                "collapsed": self._collapsed,
+                "cache_hits": self._cache_hits,
+                "in_flight": len(self._calls),
+                "cached_keys": len(self._cache),
+                "cache_ttl_seconds": self.ttl,
+                "cache_max_entries": self.max_entries,
+            }
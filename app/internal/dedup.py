@@ -0,0 +1,234 @@
+"""
+This module contains the near-duplicate candidate detection.
+
+Each candidate gets a MinHash signature over its normalized name, city, major and skills, and the signature is split
+into LSH bands stored on the candidate (`_lsh`, with a multikey index). Candidates sharing a band are likely similar,
+so finding the duplicates of a candidate is one indexed query, and clustering the whole collection is a single pass
+over the stored bands instead of comparing every pair of candidates.
+"""
+
+import hashlib
+import operator
+import re
+import sys
+import unicodedata
+from array import array
+
+
+# Fields storing the signature and its LSH band keys on each candidate
+SIGNATURE_FIELD = "_minhash"
+BANDS_FIELD = "_lsh"
+
+# Candidate fields the signature is built from
+FINGERPRINT_FIELDS = ("first_name", "last_name", "city", "job_major", "skills")
+
+# Fields read to cluster candidates (candidates written before fingerprints were stored are fingerprinted on the fly)
+CLUSTER_PROJECTION = {
+    "_id": 1,
+    SIGNATURE_FIELD: 1,
+    BANDS_FIELD: 1,
+    **dict.fromkeys(FINGERPRINT_FIELDS, 1),
+}
+
+# Modes of the check run when creating a candidate
+DEDUP_MODES = ("off", "warn", "reject")
+
+# Signature value of a candidate without any feature
+_EMPTY = (1 << 63) - 1
+
+
+def normalize(value: str) -> str:
+    """
+    Normalize a text value: strip accents and punctuation, lowercase and collapse whitespace.
+    """
+    value = unicodedata.normalize("NFKD", str(value))
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w]+", " ", value.lower()).split())
+
+
+def features(candidate: dict) -> set:
+    """
+    Build the set of features compared between candidates.
+
+    Names contribute character trigrams (robust to typos and transliterations, independent of the order of first
+    and last names), the other fields contribute whole normalized values.
+
+    Args:
+    - candidate: Candidate document.
+
+    Returns:
+    - Set of feature strings.
+    """
+    result = set()
+    name = f"{candidate.get('first_name', '')} {candidate.get('last_name', '')}"
+    for token in normalize(name).split():
+        padded = f" {token} "
+        result.update(f"n:{padded[i : i + 3]}" for i in range(len(padded) - 2))
+    if candidate.get("city"):
+        result.add(f"c:{normalize(candidate['city'])}")
+    if candidate.get("job_major"):
+        result.add(f"m:{normalize(candidate['job_major'])}")
+    for skill in candidate.get("skills") or []:
+        result.add(f"s:{normalize(skill)}")
+    return result
+
+
+class MinHashLSH:
+    """
+    MinHash signatures split into LSH bands.
+
+    Two candidates with Jaccard similarity `s` share at least one band with probability `1 - (1 - s^rows)^bands`,
+    so the bands act as a high recall pre-filter, and the signatures then estimate the actual similarity.
+
+    Each feature is hashed once into `bands * rows` independent signed 64-bit values (one SHAKE-128 digest, so
+    they fit BSON int64), and the signature keeps the minimum of each value over the features.
+
+    Attributes:
+    - bands: Number of bands.
+    - rows: Number of signature values per band.
+    - threshold: Minimum estimated similarity for two candidates to be duplicates.
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 4, threshold: float = 0.6):
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+
+    def signature(self, candidate: dict) -> list:
+        """
+        Compute the MinHash signature of a candidate.
+        """
+        size = self.bands * self.rows
+        hashes = [
+            array("q", hashlib.shake_128(feature.encode()).digest(8 * size))
+            for feature in features(candidate)
+        ]
+        if sys.byteorder == "big":
+            for values in hashes:
+                values.byteswap()
+        if not hashes:
+            return [_EMPTY] * size
+        return [min(values) for values in zip(*hashes)]
+
+    def band_keys(self, signature: list) -> list:
+        """
+        Hash each band of a signature into a key, prefixed by the band number.
+        """
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows : (band + 1) * self.rows]
+            digest = hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest()
+            keys.append(f"{band}:{digest}")
+        return keys
+
+    def fingerprint(self, candidate: dict) -> dict:
+        """
+        Return the signature and band fields to store on a candidate.
+        """
+        signature = self.signature(candidate)
+        return {SIGNATURE_FIELD: signature, BANDS_FIELD: self.band_keys(signature)}
+
+    @staticmethod
+    def similarity(first: list, second: list) -> float:
+        """
+        Estimate the Jaccard similarity of two candidates from their signatures.
+        """
+        if not first or not second or len(first) != len(second):
+            return 0.0
+        return sum(map(operator.eq, first, second)) / len(first)
+
+    def find_duplicates(
+        self, candidate: dict, candidate_repository, max_matches: int = 1000
+    ) -> list:
+        """
+        Find the stored candidates likely to be the same person as a candidate.
+
+        Only the signatures of the candidates sharing a band are read, and at most `max_matches` of them, so very
+        common profiles cannot turn the check into a large scan.
+
+        Args:
+        - candidate: Candidate document, fingerprinted or not.
+        - candidate_repository: Repository holding the candidates.
+        - max_matches: Maximum number of candidates sharing a band compared.
+
+        Returns:
+        - List of {"_id", "email", "similarity"}, most similar first.
+        """
+        if SIGNATURE_FIELD not in candidate:
+            candidate = {**candidate, **self.fingerprint(candidate)}
+        filters = {BANDS_FIELD: {"$in": candidate[BANDS_FIELD]}}
+        if candidate.get("_id"):
+            filters["_id"] = {"$ne": candidate["_id"]}
+
+        duplicates = []
+        for other in candidate_repository.find(
+            filters,
+            limit=max_matches,
+            projection={"_id": 1, "email": 1, SIGNATURE_FIELD: 1},
+        ):
+            similarity = self.similarity(
+                candidate[SIGNATURE_FIELD], other.get(SIGNATURE_FIELD)
+            )
+            if similarity >= self.threshold:
+                duplicates.append(
+                    {
+                        "_id": other["_id"],
+                        "email": other.get("email"),
+                        "similarity": similarity,
+                    }
+                )
+        return sorted(duplicates, key=lambda duplicate: -duplicate["similarity"])
+
+    def clusters(self, candidates, max_bucket: int = 100) -> list:
+        """
+        Group candidates into clusters of likely duplicates, in a single pass.
+
+        Candidates sharing a band are merged (union-find) when their estimated similarity reaches the threshold,
+        so the work grows with the number of candidates and colliding pairs, not with all pairs. Signatures are
+        kept as compact arrays, and buckets stop growing at `max_bucket` members so that very common profiles
+        cannot make the pass quadratic.
+
+        Args:
+        - candidates: Iterable of candidate documents (e.g. a cursor), fingerprinted or not.
+        - max_bucket: Maximum number of candidates compared per band bucket.
+
+        Returns:
+        - List of clusters (lists of candidate ids) with at least two candidates, largest first.
+        """
+        parents = {}
+        signatures = {}
+        buckets = {}
+
+        def root(candidate_id):
+            while parents[candidate_id] != candidate_id:
+                parents[candidate_id] = parents[parents[candidate_id]]
+                candidate_id = parents[candidate_id]
+            return candidate_id
+
+        for candidate in candidates:
+            candidate_id = candidate["_id"]
+            signature = candidate.get(SIGNATURE_FIELD) or self.signature(candidate)
+            keys = candidate.get(BANDS_FIELD) or self.band_keys(signature)
+            parents[candidate_id] = candidate_id
+            signatures[candidate_id] = array("q", signature)
+            for key in keys:
+                members = buckets.setdefault(key, [])
+                for other_id in members:
+                    if root(other_id) == root(candidate_id):
+                        continue
+                    if (
+                        self.similarity(signature, signatures[other_id])
+                        >= self.threshold
+                    ):
+                        parents[root(other_id)] = root(candidate_id)
+                if len(members) < max_bucket:
+                    members.append(candidate_id)
+
+        groups = {}
+        for candidate_id in parents:
+            groups.setdefault(root(candidate_id), []).append(candidate_id)
+        return sorted(
+            (group for group in groups.values() if len(group) > 1),
+            key=len,
+            reverse=True,
+        )
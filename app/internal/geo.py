@@ -0,0 +1,151 @@
+"""
+This module contains the geographic candidate search.
+
+Candidates get the coordinates of their city, resolved from a local gazetteer when they are written and stored as a
+GeoJSON point (`_location`, with a 2dsphere index). Searching around a city or a coordinate is then a single `$near`
+query, which combines with the other filters and returns the candidates nearest first, instead of enumerating the
+nearby cities by hand.
+"""
+
+import csv
+import math
+import os
+
+from app.internal.dedup import normalize
+
+
+# Field storing the GeoJSON point of each candidate
+LOCATION_FIELD = "_location"
+
+# Gazetteer shipped with the application
+DEFAULT_GAZETTEER = os.path.join(os.path.dirname(__file__), "data", "cities.csv")
+
+# Earth radius used by MongoDB's spherical queries
+EARTH_RADIUS_METERS = 6378100.0
+
+
+def point(longitude: float, latitude: float) -> dict:
+    """
+    Build a GeoJSON point.
+    """
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def distance_meters(a: list, b: list) -> float:
+    """
+    Return the great-circle distance between two (longitude, latitude) coordinates, in meters.
+    """
+    longitude_a, latitude_a = map(math.radians, a)
+    longitude_b, latitude_b = map(math.radians, b)
+    haversine = (
+        math.sin((latitude_b - latitude_a) / 2) ** 2
+        + math.cos(latitude_a)
+        * math.cos(latitude_b)
+        * math.sin((longitude_b - longitude_a) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(haversine)))
+
+
+def near_filter(coordinates: list, radius_km: float) -> dict:
+    """
+    Build the filter matching the candidates within `radius_km` of a (longitude, latitude) coordinate, nearest first.
+    """
+    return {
+        LOCATION_FIELD: {
+            "$near": {
+                "$geometry": point(*coordinates),
+                "$maxDistance": radius_km * 1000,
+            }
+        }
+    }
+
+
+def countable_filters(filters: dict) -> dict:
+    """
+    Replace the `$near` predicates of a filter document by `$geoWithin` ones matching the same candidates.
+
+    `$near` sorts by distance, which counts (run as aggregations) do not allow.
+    """
+    return {
+        field: (
+            {
+                "$geoWithin": {
+                    "$centerSphere": [
+                        predicate["$near"]["$geometry"]["coordinates"],
+                        predicate["$near"]["$maxDistance"] / EARTH_RADIUS_METERS,
+                    ]
+                }
+            }
+            if isinstance(predicate, dict) and "$near" in predicate
+            else predicate
+        )
+        for field, predicate in filters.items()
+    }
+
+
+class Gazetteer:
+    """
+    City names and their coordinates, loaded from a CSV file.
+
+    The file has a `name`, `country`, `latitude`, `longitude` and `alternate_names` (separated by `|`) column.
+    Names are matched normalized (case, accents and punctuation are ignored), and the first city listed wins
+    when several share a name.
+
+    Attributes:
+    - path: Path of the CSV file.
+    """
+
+    def __init__(self, path: str = DEFAULT_GAZETTEER):
+        self.path = path
+        self._cities = {}
+        with open(path, newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                coordinates = (float(row["longitude"]), float(row["latitude"]))
+                names = [row["name"], *(row.get("alternate_names") or "").split("|")]
+                for name in filter(None, map(normalize, names)):
+                    self._cities.setdefault(name, coordinates)
+
+    def __len__(self) -> int:
+        return len(self._cities)
+
+    def resolve(self, city: str):
+        """
+        Return the (longitude, latitude) of a city, or None if it is not in the gazetteer.
+        """
+        if not city:
+            return None
+        return self._cities.get(normalize(city))
+
+    def location(self, city: str) -> dict:
+        """
+        Return the location fields to store on a candidate living in a city.
+
+        Candidates in a city missing from the gazetteer get a null location, which the 2dsphere index skips.
+        """
+        coordinates = self.resolve(city)
+        return {LOCATION_FIELD: point(*coordinates) if coordinates else None}
+
+    def parse_near(self, near: str) -> tuple:
+        """
+        Resolve the center of a geographic search: a city name, or a `latitude,longitude` pair.
+
+        Returns:
+        - The (longitude, latitude) of the center.
+
+        Raises:
+        - ValueError: If the coordinates are out of range or the city is unknown.
+        """
+        parts = near.split(",")
+        if len(parts) == 2:
+            try:
+                latitude, longitude = float(parts[0]), float(parts[1])
+            except ValueError:
+                pass
+            else:
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                    raise ValueError("Coordinates out of range")
+                return longitude, latitude
+        coordinates = self.resolve(near)
+        if coordinates is None:
+            raise ValueError(f"Unknown city: {near}")
+        return coordinates
@@ -0,0 +1,212 @@
+"""
+This module contains the readiness probing of a worker.
+
+A background prober periodically pings the DB and samples the connection pool, the threadpool running the sync
+routes (including password hashing) and the event loop lag, then stores the result as a snapshot. Readiness
+checks serve that snapshot, so frequent load balancer probes never reach the DB.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from anyio import to_thread
+from pymongo import monitoring
+
+
+# pymongo's default maxPoolSize, used when the client does not set one
+DEFAULT_MAX_POOL_SIZE = 100
+
+
+class PoolUsage(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener tracking the checked out connections and the check outs waiting for one.
+    """
+
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _update(self, address, **changes):
+        with self._lock:
+            pool = self._pools.setdefault(
+                address,
+                {"max_size": DEFAULT_MAX_POOL_SIZE, "checked_out": 0, "waiting": 0},
+            )
+            for name, change in changes.items():
+                pool[name] += change
+
+    def pool_created(self, event):
+        self._update(event.address)
+        max_size = event.options.get("maxPoolSize")
+        if max_size:
+            with self._lock:
+                self._pools[event.address]["max_size"] = max_size
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(event.address, None)
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, waiting=-1)
+
+    def connection_checked_out(self, event):
+        self._update(event.address, waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, checked_out=-1)
+
+    def summary(self) -> dict:
+        """
+        Return the checked out and waiting connections of all pools, and the saturation of the busiest one.
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+        return {
+            "checked_out": sum(pool["checked_out"] for pool in pools),
+            "waiting": sum(pool["waiting"] for pool in pools),
+            "saturation": max(
+                (pool["checked_out"] / pool["max_size"] for pool in pools), default=0
+            ),
+        }
+
+
+class HealthProber:
+    """
+    Background prober of a worker's dependencies, serving readiness from its last snapshot.
+
+    The worker is ready when the DB answered the last ping, the event loop lag is under `max_loop_lag_ms` and
+    the snapshot is recent (the prober is still running).
+
+    Attributes:
+    - ping: Callable pinging the DB (None when there is no DB, e.g. the in-memory backend).
+    - pool_usage: Connection pool listener registered on the DB client (optional).
+    - interval: Seconds between probes.
+    - timeout: Seconds a DB ping may take before it counts as failed.
+    - max_loop_lag_ms: Event loop lag above which the worker is not ready.
+    """
+
+    def __init__(
+        self,
+        ping=None,
+        pool_usage: PoolUsage = None,
+        interval: float = 5,
+        timeout: float = 2,
+        max_loop_lag_ms: float = 500,
+    ):
+        self.ping = ping
+        self.pool_usage = pool_usage
+        self.interval = interval
+        self.timeout = timeout
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self._snapshot = None
+        self._checked_at = None
+        self._loop_lag_ms = 0.0
+        self._task = None
+        # Pings run on their own thread, so a saturated threadpool does not delay them
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health")
+
+    async def _ping(self) -> dict:
+        if self.ping is None:
+            return {"ok": True}
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            await asyncio.wait_for(
+                loop.run_in_executor(self._executor, self.ping), self.timeout
+            )
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": f"No answer within {self.timeout} s"}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "ping_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def probe(self) -> dict:
+        """
+        Probe the dependencies once and store the snapshot.
+
+        Must run on the event loop serving the requests, whose threadpool it samples.
+        """
+        threadpool = to_thread.current_default_thread_limiter().statistics()
+        snapshot = {
+            "db": await self._ping(),
+            "pool": self.pool_usage.summary() if self.pool_usage else None,
+            "threadpool": {
+                "busy": threadpool.borrowed_tokens,
+                "size": threadpool.total_tokens,
+                "queued": threadpool.tasks_waiting,
+            },
+            "event_loop_lag_ms": round(self._loop_lag_ms, 1),
+        }
+        self._snapshot, self._checked_at = snapshot, time.monotonic()
+        return snapshot
+
+    async def _run(self):
+        while True:
+            # The sleep overshoot is the time callbacks waited for the event loop
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            self._loop_lag_ms = max(lag, 0) * 1000
+            await self.probe()
+
+    async def start(self):
+        """
+        Run a first probe, then keep probing in the background.
+        """
+        await self.probe()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop probing.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._snapshot = None
+
+    def readiness(self) -> tuple:
+        """
+        Return whether the worker is ready, and the last snapshot with its age and the reasons it is not ready.
+        """
+        if self._snapshot is None:
+            return False, {"status": "starting", "reasons": ["not probed yet"]}
+
+        age = time.monotonic() - self._checked_at
+        reasons = []
+        if not self._snapshot["db"]["ok"]:
+            reasons.append("db unreachable")
+        if self._snapshot["event_loop_lag_ms"] > self.max_loop_lag_ms:
+            reasons.append("event loop lagging")
+        # Three missed probes: the prober is stuck or stopped
+        if age > 3 * self.interval:
+            reasons.append("stale probe")
+        return not reasons, {
+            "status": "not ready" if reasons else "ready",
+            "reasons": reasons,
+            "age_s": round(age, 1),
+            **self._snapshot,
+        }
@@ -0,0 +1,380 @@
+"""
+This module contains the idempotency keys of the create endpoints.
+
+The first response to a request carrying an `Idempotency-Key` header is stored for a while (in a TTL-indexed
+collection, or in memory), and retries with the same key get the stored response back without running the
+handler again. Concurrent requests with the same key share a single execution.
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from fastapi import Response, status
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
+
+from app.internal.coalescing import SingleFlight
+
+
+# Header carrying the client's idempotency key, and the header marking replayed responses
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Longest accepted idempotency key
+MAX_KEY_LENGTH = 255
+
+
+def as_response(result, response: Response, model, status_code: int) -> Response:
+    """
+    Render a route's result the way FastAPI would, so that it can be stored.
+
+    Args:
+    - result: Value returned by the route (a document, or a Response).
+    - response: Response object injected into the route, carrying its extra headers.
+    - model: Response model of the route.
+    - status_code: Status code of the route.
+
+    Returns:
+    - The rendered response.
+    """
+    if isinstance(result, Response):
+        return result
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name != "content-length"
+    }
+    return JSONResponse(
+        content=model.model_validate(result).model_dump(mode="json", by_alias=True),
+        status_code=status_code,
+        headers=headers,
+    )
+
+
+class IdempotencyStore(ABC):
+    """
+    Storage interface for the responses stored under idempotency keys.
+
+    A key is first claimed (pending), then completed with its response, or released if the request failed.
+    """
+
+    @abstractmethod
+    def claim(self, key: str, fingerprint: str, lock_seconds: float):
+        """
+        Claim a key for a request, unless it is already claimed.
+
+        Returns:
+        - None if the key was claimed, otherwise the existing {"fingerprint", "response"} record
+          (a None response means another request is still running).
+        """
+
+    @abstractmethod
+    def get(self, key: str):
+        """
+        Return the unexpired record of a key, or None.
+        """
+
+    @abstractmethod
+    def complete(self, key: str, response: dict, ttl_seconds: float):
+        """
+        Store the response of a claimed key, keeping it for `ttl_seconds`.
+        """
+
+    @abstractmethod
+    def release(self, key: str):
+        """
+        Drop a pending claim, so that a retry runs the request again.
+        """
+
+    @abstractmethod
+    def ensure_indexes(self):
+        """
+        Create the indexes the store relies on.
+        """
+
+    @abstractmethod
+    def drop(self):
+        """
+        Remove every stored key.
+        """
+
+
+class MongoIdempotencyStore(IdempotencyStore):
+    """
+    Idempotency keys stored in a collection, removed by a TTL index once expired.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def claim(self, key: str, fingerprint: str, lock_seconds: float):
+        now = datetime.now(timezone.utc)
+        # A second attempt is needed when the key expired but the TTL monitor did not remove it yet
+        for _ in range(2):
+            try:
+                self.collection.insert_one(
+                    {
+                        "_id": key,
+                        "fingerprint": fingerprint,
+                        "response": None,
+                        "expires_at": now + timedelta(seconds=lock_seconds),
+                    }
+                )
+                return None
+            except DuplicateKeyError:
+                record = self.get(key)
+                if record is not None:
+                    return record
+                self.collection.delete_one({"_id": key, "expires_at": {"$lte": now}})
+        return self.get(key)
+
+    def get(self, key: str):
+        return self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"fingerprint": 1, "response": 1},
+        )
+
+    def complete(self, key: str, response: dict, ttl_seconds: float):
+        self.collection.update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    "response": response,
+                    "expires_at": datetime.now(timezone.utc)
+                    + timedelta(seconds=ttl_seconds),
+                }
+            },
+        )
+
+    def release(self, key: str):
+        self.collection.delete_one({"_id": key, "response": None})
+
+    def ensure_indexes(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def drop(self):
+        self.collection.drop()
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Idempotency keys kept in process memory, expired keys are purged on access.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, fingerprint: str, lock_seconds: float):
+        with self._lock:
+            record = self._unexpired(key)
+            if record is not None:
+                return {
+                    "fingerprint": record["fingerprint"],
+                    "response": record["response"],
+                }
+            self._records[key] = {
+                "fingerprint": fingerprint,
+                "response": None,
+                "expires_at": time.monotonic() + lock_seconds,
+            }
+            return None
+
+    def get(self, key: str):
+        with self._lock:
+            record = self._unexpired(key)
+            if record is None:
+                return None
+            return {
+                "fingerprint": record["fingerprint"],
+                "response": record["response"],
+            }
+
+    def complete(self, key: str, response: dict, ttl_seconds: float):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                record["response"] = response
+                record["expires_at"] = time.monotonic() + ttl_seconds
+
+    def release(self, key: str):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record["response"] is None:
+                del self._records[key]
+
+    def ensure_indexes(self):
+        pass
+
+    def drop(self):
+        with self._lock:
+            self._records.clear()
+
+    def _unexpired(self, key: str):
+        record = self._records.get(key)
+        if record is not None and record["expires_at"] <= time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+
+class IdempotentRequests:
+    """
+    Runs requests at most once per idempotency key, replaying the stored response to retries.
+
+    Responses are stored unless they are server errors, so that a retry after a failure runs the request again.
+    Keys are scoped (e.g. per route and user), and reusing a key for another payload is rejected.
+
+    Attributes:
+    - secret: Key of the payload fingerprints, so that stored fingerprints reveal nothing of the payloads.
+    - ttl_seconds: Seconds a response stays stored.
+    - lock_seconds: Seconds a pending claim blocks the key, should its worker die before completing it.
+    - wait_seconds: Seconds a retry waits for a request running in another worker before answering 409.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        ttl_seconds: float = 24 * 60 * 60,
+        lock_seconds: float = 60,
+        wait_seconds: float = 10,
+        poll_interval: float = 0.05,
+    ):
+        self.secret = secret.encode()
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._counts = {"executed": 0, "replayed": 0, "mismatched": 0, "in_progress": 0}
+
+    def fingerprint(self, payload) -> str:
+        """
+        Fingerprint a request payload.
+        """
+        canonical = json.dumps(
+            payload, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hmac.new(self.secret, canonical.encode(), hashlib.sha256).hexdigest()
+
+    def run(
+        self, store: IdempotencyStore, key: str, scope: str, payload, handler
+    ) -> Response:
+        """
+        Run a request once per idempotency key.
+
+        Args:
+        - store: Store holding the keys.
+        - key: Idempotency key sent by the client.
+        - scope: Scope of the key (e.g. route and user), so that clients cannot see each other's responses.
+        - payload: Request payload, fingerprinted to detect keys reused for another request.
+        - handler: Callable running the request and returning a Response.
+
+        Returns:
+        - The handler's response, the stored response of an earlier request with the same key, or an error:
+          400 for an invalid key, 422 for a key reused with another payload, 409 for a key whose request is
+          still running in another worker.
+        """
+        if len(key) > MAX_KEY_LENGTH or not key.isprintable():
+            return JSONResponse(
+                content={
+                    "detail": f"{IDEMPOTENCY_HEADER} must be printable and at most {MAX_KEY_LENGTH} characters"
+                },
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        store_key = hashlib.sha256(f"{scope}\n{key}".encode()).hexdigest()
+        fingerprint = self.fingerprint(payload)
+        executed = []
+
+        def execute():
+            executed.append(True)
+            return self._execute(store, store_key, fingerprint, handler)
+
+        # Concurrent requests with the same key in this worker share one execution
+        outcome, record = self._flights.do(store_key, execute)
+
+        if outcome == "in_progress":
+            self._count("in_progress")
+            return JSONResponse(
+                content={
+                    "detail": f"A request with this {IDEMPOTENCY_HEADER} is still in progress"
+                },
+                status_code=status.HTTP_409_CONFLICT,
+            )
+        if record["fingerprint"] != fingerprint:
+            self._count("mismatched")
+            return JSONResponse(
+                content={
+                    "detail": f"{IDEMPOTENCY_HEADER} was already used for another request"
+                },
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        replayed = outcome == "replayed" or not executed
+        self._count("replayed" if replayed else "executed")
+        response = record["response"]
+        headers = dict(response["headers"])
+        if replayed:
+            headers[REPLAYED_HEADER] = "true"
+        return Response(
+            content=response["body"],
+            status_code=response["status_code"],
+            headers=headers,
+        )
+
+    def _execute(self, store: IdempotencyStore, key: str, fingerprint: str, handler):
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            record = store.claim(key, fingerprint, self.lock_seconds)
+            if record is None:
+                break
+            if record["fingerprint"] != fingerprint or record["response"] is not None:
+                return "replayed", record
+
+            # Another worker is running the request: wait for its response, or for its claim to be released
+            while record is not None and record["response"] is None:
+                if time.monotonic() >= deadline:
+                    return "in_progress", None
+                time.sleep(self.poll_interval)
+                record = store.get(key)
+            if record is not None:
+                return "replayed", record
+
+        try:
+            result = handler()
+        except Exception:
+            store.release(key)
+            raise
+
+        response = {
+            "status_code": result.status_code,
+            "headers": {
+                name: value
+                for name, value in result.headers.items()
+                if name != "content-length"
+            },
+            "body": result.body.decode(),
+        }
+        if result.status_code < 500:
+            store.complete(key, response, self.ttl_seconds)
+        else:
+            store.release(key)
+        return "executed", {"fingerprint": fingerprint, "response": response}
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self) -> dict:
+        """
+        Return the number of executed, replayed, mismatched and still in progress keyed requests.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        counts["coalesced"] = self._flights.stats()["collapsed"]
+        return counts
@@ -0,0 +1,632 @@
+"""
+This module contains the in-memory storage engine.
+
+It evaluates the same Mongo style filter and update documents as the MongoDB backend, keeping documents in a hash
+index on `_id`, unique hash indexes (e.g. on `email`) and secondary hash indexes used to narrow down filters.
+It lets the test suite and benchmarks run without any external service.
+"""
+
+import heapq
+import itertools
+import math
+import re
+import threading
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+
+from app.internal.auth import TOKEN_VERSION_FIELD
+from app.internal.dedup import BANDS_FIELD
+from app.internal.geo import LOCATION_FIELD, distance_meters
+from app.internal.repository import UserRepository, CandidateRepository
+from app.internal.revisions import (
+    REVISION_FIELD,
+    CREATED_REVISION_FIELD,
+    DELETED_AT_FIELD,
+)
+from app.internal.updates import apply_update
+
+
+# Candidate fields with a secondary index (array fields are indexed per element)
+CANDIDATE_INDEXES = (
+    "first_name",
+    "last_name",
+    "career_level",
+    "job_major",
+    "years_of_experience",
+    "degree_type",
+    "skills",
+    "nationality",
+    "city",
+    "salary",
+    "gender",
+    BANDS_FIELD,
+    LOCATION_FIELD,
+)
+
+
+# Range operators and their comparison functions
+RANGE_OPERATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def _copy(document: dict) -> dict:
+    """
+    Copy a document so callers can never mutate the stored one.
+    """
+    return {
+        key: list(value) if isinstance(value, list) else value
+        for key, value in document.items()
+    }
+
+
+def _values(document: dict, field: str) -> list:
+    """
+    Return the values a filter on `field` is compared against (array elements count individually).
+    """
+    if field not in document:
+        return []
+    value = document[field]
+    return [value, *value] if isinstance(value, list) else [value]
+
+
+def _index_keys(document: dict, field: str) -> set:
+    """
+    Return the hash index keys of a document for a field (array elements are indexed individually).
+    """
+    if field not in document:
+        return set()
+    value = document[field]
+    if _coordinates(value) is not None:
+        # Points are indexed by their coordinates, so $near only measures the distance to each distinct point
+        return {_coordinates(value)}
+    items = value if isinstance(value, list) else [value]
+    return {item for item in items if not isinstance(item, (list, dict))}
+
+
+def _coordinates(value):
+    """
+    Return the (longitude, latitude) of a GeoJSON point, or None for any other value.
+    """
+    if isinstance(value, dict) and value.get("type") == "Point":
+        return tuple(value["coordinates"])
+    return None
+
+
+def _near_distance(coordinates, near: dict):
+    """
+    Return the distance in meters from the center of a `$near` operand to coordinates, or None if out of its range.
+    """
+    if coordinates is None:
+        return None
+    distance = distance_meters(coordinates, near["$geometry"]["coordinates"])
+    if near.get("$minDistance", 0) <= distance <= near.get("$maxDistance", math.inf):
+        return distance
+    return None
+
+
+def _near_predicate(filters: dict):
+    """
+    Return the field and operand of the `$near` predicate of a filter document, or None.
+    """
+    for field, predicate in filters.items():
+        if isinstance(predicate, dict) and "$near" in predicate:
+            return field, predicate["$near"]
+    return None
+
+
+def _project(document: dict, projection: dict) -> dict:
+    """
+    Copy a document, keeping only the fields of an inclusion projection (and `_id` unless excluded).
+    """
+    if not projection:
+        return _copy(document)
+    fields = {field for field, included in projection.items() if included}
+    if projection.get("_id", 1):
+        fields.add("_id")
+    return _copy({key: value for key, value in document.items() if key in fields})
+
+
+def _compare(values: list, predicate) -> bool:
+    """
+    Evaluate a single field predicate against the candidate values of a document.
+    """
+    if not isinstance(predicate, dict) or not any(
+        key.startswith("$") for key in predicate
+    ):
+        return predicate in values
+
+    for operator, operand in predicate.items():
+        if operator == "$options":
+            continue
+        if operator == "$regex":
+            flags = re.IGNORECASE if "i" in predicate.get("$options", "") else 0
+            pattern = re.compile(operand, flags)
+            matched = any(
+                isinstance(value, str) and pattern.search(value) for value in values
+            )
+        elif operator == "$in":
+            matched = any(item in values for item in operand)
+        elif operator == "$nin":
+            matched = not any(item in values for item in operand)
+        elif operator == "$all":
+            matched = all(item in values for item in operand)
+        elif operator == "$ne":
+            matched = operand not in values
+        elif operator == "$exists":
+            matched = bool(values) == bool(operand)
+        elif operator == "$near":
+            matched = any(
+                _near_distance(_coordinates(value), operand) is not None
+                for value in values
+            )
+        elif operator in RANGE_OPERATORS:
+            compare = RANGE_OPERATORS[operator]
+            matched = any(_safe_compare(compare, value, operand) for value in values)
+        else:
+            raise ValueError(f"Unsupported query operator: {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def _safe_compare(compare, value, operand) -> bool:
+    """
+    Compare two values, treating values of incomparable types as not matching.
+    """
+    try:
+        return compare(value, operand)
+    except TypeError:
+        return False
+
+
+def matches(document: dict, filters: dict) -> bool:
+    """
+    Check whether a document matches a Mongo style filter document.
+
+    Args:
+    - document: The stored document.
+    - filters: Filter document supporting equality, `$or`, `$and`, `$nor`, `$regex`, `$in`, `$nin`, `$all`,
+      `$ne`, `$exists`, `$near` (GeoJSON point) and range operators.
+
+    Returns:
+    - True if the document matches.
+    """
+    for key, predicate in filters.items():
+        if key == "$or":
+            if not any(matches(document, branch) for branch in predicate):
+                return False
+        elif key == "$and":
+            if not all(matches(document, branch) for branch in predicate):
+                return False
+        elif key == "$nor":
+            if any(matches(document, branch) for branch in predicate):
+                return False
+        elif not _compare(_values(document, key), predicate):
+            return False
+    return True
+
+
+class MemoryCollection:
+    """
+    Thread-safe in-memory collection with hash indexes.
+
+    Attributes:
+    - unique: Fields with a unique hash index (`_id` always is).
+    - indexed: Fields with a secondary hash index.
+    """
+
+    def __init__(self, unique=(), indexed=()):
+        self.unique = tuple(unique)
+        self.indexed = tuple(indexed)
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """
+        Remove every document.
+        """
+        with self._lock:
+            self._documents = {}
+            self._order = {}
+            self._sequence = itertools.count()
+            self._unique = {field: {} for field in self.unique}
+            self._indexes = {field: {} for field in self.indexed}
+
+    def _index(self, document: dict):
+        for field in self.unique:
+            if field in document:
+                self._unique[field][document[field]] = document["_id"]
+        for field in self.indexed:
+            for key in _index_keys(document, field):
+                self._indexes[field].setdefault(key, set()).add(document["_id"])
+
+    def _unindex(self, document: dict):
+        for field in self.unique:
+            if self._unique[field].get(document.get(field)) == document["_id"]:
+                del self._unique[field][document[field]]
+        for field in self.indexed:
+            for key in _index_keys(document, field):
+                ids = self._indexes[field].get(key)
+                if ids is not None:
+                    ids.discard(document["_id"])
+                    if not ids:
+                        del self._indexes[field][key]
+
+    def _check_unique(self, document: dict):
+        for field in self.unique:
+            owner = self._unique[field].get(document.get(field))
+            if owner is not None and owner != document["_id"]:
+                raise DuplicateKeyError(f"E11000 duplicate key error ({field})")
+
+    def _candidate_ids(self, filters: dict):
+        """
+        Narrow down a filter to a set of ids using the hash indexes, or None if it needs a full scan.
+        """
+        if "_id" in filters and not isinstance(filters["_id"], dict):
+            return {filters["_id"]}
+
+        narrowed = []
+        for field, predicate in filters.items():
+            if field in self.unique and not isinstance(predicate, (dict, list)):
+                owner = self._unique[field].get(predicate)
+                narrowed.append({owner} if owner is not None else set())
+            elif field in self.indexed:
+                index = self._indexes[field]
+                if not isinstance(predicate, (dict, list)):
+                    narrowed.append(index.get(predicate, set()))
+                elif isinstance(predicate, dict) and set(predicate) == {"$all"}:
+                    narrowed.extend(index.get(key, set()) for key in predicate["$all"])
+                elif isinstance(predicate, dict) and set(predicate) == {"$in"}:
+                    narrowed.append(
+                        set().union(
+                            *(index.get(key, set()) for key in predicate["$in"])
+                        )
+                    )
+                elif isinstance(predicate, dict) and set(predicate) == {"$near"}:
+                    narrowed.append(
+                        set().union(
+                            *(
+                                ids
+                                for key, ids in index.items()
+                                if isinstance(key, tuple)
+                                and _near_distance(key, predicate["$near"]) is not None
+                            )
+                        )
+                    )
+        if not narrowed:
+            return None
+        # Intersect starting from the most selective index
+        narrowed.sort(key=len)
+        return narrowed[0].intersection(*narrowed[1:])
+
+    def _scan(self, filters: dict, budget=None):
+        """
+        Yield the stored documents matching a filter, in insertion order (nearest first for `$near` filters),
+        checking the budget as it goes.
+        """
+        ids = self._candidate_ids(filters)
+        if ids is None:
+            documents = self._documents.values()
+        else:
+            documents = sorted(
+                (self._documents[_id] for _id in ids if _id in self._documents),
+                key=lambda document: self._order[document["_id"]],
+            )
+        near = _near_predicate(filters)
+        if near is not None:
+            field, operand = near
+
+            def distance(document):
+                found = _near_distance(_coordinates(document.get(field)), operand)
+                return math.inf if found is None else found
+
+            documents = sorted(documents, key=distance)
+        for document in documents:
+            if budget is not None:
+                budget.check()
+            if matches(document, filters):
+                yield document
+
+    def find(
+        self,
+        filters: dict = None,
+        projection: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+        budget=None,
+    ) -> list:
+        """
+        Return copies of the documents matching a filter, in insertion order.
+
+        Raises:
+        - ExecutionTimeout: If the query ran out of budget.
+        """
+        with self._lock:
+            matched = self._scan(filters or {}, budget)
+            selected = itertools.islice(matched, skip, skip + limit if limit else None)
+            return [_project(document, projection) for document in selected]
+
+    def iterate(
+        self,
+        filters: dict = None,
+        batch_size: int = 100,
+        budget=None,
+        projection: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+    ):
+        """
+        Lazily yield copies of the documents matching a filter, in insertion order, `batch_size` at a time.
+
+        Only the matching ids are snapshotted up front; documents deleted while iterating are skipped and
+        updated ones are returned in their latest state, like a DB cursor.
+        """
+        with self._lock:
+            matched = self._scan(filters or {}, budget)
+            selected = itertools.islice(matched, skip, skip + limit if limit else None)
+            ids = [document["_id"] for document in selected]
+        for start in range(0, len(ids), batch_size):
+            if budget is not None:
+                budget.check()
+            with self._lock:
+                batch = [
+                    _project(self._documents[_id], projection)
+                    for _id in ids[start : start + batch_size]
+                    if _id in self._documents
+                ]
+            yield from batch
+
+    def find_one(self, filters: dict, projection: dict = None):
+        """
+        Return a copy of the first document matching a filter, or None.
+        """
+        found = self.find(filters, projection, limit=1)
+        return found[0] if found else None
+
+    def count(self, filters: dict = None, limit: int = 0, budget=None) -> int:
+        """
+        Return the number of documents matching a filter, counting at most `limit` (0 for no limit).
+
+        Raises:
+        - ExecutionTimeout: If the count ran out of budget.
+        """
+        with self._lock:
+            if not filters:
+                return len(self._documents)
+            matched = itertools.islice(self._scan(filters, budget), limit or None)
+            return sum(1 for _ in matched)
+
+    def insert(self, document: dict) -> dict:
+        """
+        Insert a document and return a copy of it.
+
+        Raises:
+        - DuplicateKeyError: If the `_id` or a unique field is already taken.
+        """
+        with self._lock:
+            if document["_id"] in self._documents:
+                raise DuplicateKeyError("E11000 duplicate key error (_id)")
+            self._check_unique(document)
+            stored = _copy(document)
+            self._documents[stored["_id"]] = stored
+            self._order[stored["_id"]] = next(self._sequence)
+            self._index(stored)
+            return _copy(stored)
+
+    def update(self, filters: dict, update: dict):
+        """
+        Apply an update document to the first document matching a filter.
+
+        Returns:
+        - A copy of the updated document, or None if nothing matched.
+
+        Raises:
+        - DuplicateKeyError: If the update would duplicate a unique field.
+        """
+        with self._lock:
+            current = next(self._scan(filters), None)
+            if current is None:
+                return None
+            updated = apply_update(current, update)
+            self._check_unique(updated)
+            self._unindex(current)
+            self._documents[updated["_id"]] = updated
+            self._index(updated)
+            return _copy(updated)
+
+    def delete(self, filters: dict) -> bool:
+        """
+        Delete the first document matching a filter.
+
+        Returns:
+        - True if a document was deleted.
+        """
+        with self._lock:
+            current = next(self._scan(filters), None)
+            if current is None:
+                return False
+            del self._documents[current["_id"]]
+            del self._order[current["_id"]]
+            self._unindex(current)
+            return True
+
+
+class MemoryUserRepository(UserRepository):
+    """
+    In-memory implementation of the user repository.
+    """
+
+    def __init__(self):
+        self.collection = MemoryCollection(unique=("email",))
+
+    def get_by_email(self, email: str):
+        return self.collection.find_one({"email": email})
+
+    def insert(self, user: dict) -> dict:
+        return self.collection.insert(user)
+
+    def bump_token_version(self, email: str):
+        return self.collection.update(
+            {"email": email}, {"$inc": {TOKEN_VERSION_FIELD: 1}}
+        )
+
+    def find_revoked(self):
+        return self.collection.find(
+            {TOKEN_VERSION_FIELD: {"$gt": 0}}, {TOKEN_VERSION_FIELD: 1}
+        )
+
+    def ensure_indexes(self):
+        pass
+
+    def drop(self):
+        self.collection.clear()
+
+
+class MemoryCandidateRepository(CandidateRepository):
+    """
+    In-memory implementation of the candidate repository.
+    """
+
+    def __init__(self):
+        self.collection = MemoryCollection(unique=("email",), indexed=CANDIDATE_INDEXES)
+        self.tombstones = MemoryCollection()
+        self._revision = 0
+        self._version = 0
+        self._revision_lock = threading.Lock()
+
+    def _next_revision(self) -> int:
+        with self._revision_lock:
+            self._revision += 1
+            return self._revision
+
+    def _commit_version(self):
+        with self._revision_lock:
+            self._version += 1
+
+    def get(self, candidate_id: str, projection: dict = None):
+        return self.collection.find_one({"_id": candidate_id}, projection)
+
+    def insert(self, candidate: dict) -> dict:
+        revision = self._next_revision()
+        candidate[REVISION_FIELD] = candidate[CREATED_REVISION_FIELD] = revision
+        inserted = self.collection.insert(candidate)
+        self._commit_version()
+        return inserted
+
+    def insert_many(self, candidates: list) -> list:
+        results = []
+        for candidate in candidates:
+            try:
+                results.append(self.insert(candidate))
+            except DuplicateKeyError as e:
+                results.append(e)
+        return results
+
+    def update(self, candidate_id: str, update: dict, revisions: list = None):
+        query = {"_id": candidate_id}
+        if revisions is not None:
+            query[REVISION_FIELD] = {"$in": revisions}
+        update = {**update, "$set": {**update.get("$set", {})}}
+        update["$set"][REVISION_FIELD] = self._next_revision()
+        updated = self.collection.update(query, update)
+        if updated is not None:
+            self._commit_version()
+        return updated
+
+    def delete(self, candidate_id: str) -> bool:
+        deleted = self.collection.delete({"_id": candidate_id})
+        if deleted:
+            self.tombstones.delete({"_id": candidate_id})
+            self.tombstones.insert(
+                {
+                    "_id": candidate_id,
+                    REVISION_FIELD: self._next_revision(),
+                    DELETED_AT_FIELD: datetime.now(timezone.utc),
+                }
+            )
+            self._commit_version()
+        return deleted
+
+    def find(
+        self,
+        filters: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+        operation: str = None,
+        budget=None,
+        projection: dict = None,
+        session=None,
+    ) -> list:
+        return self.collection.find(
+            filters, projection, skip=skip, limit=limit, budget=budget
+        )
+
+    def iterate(
+        self,
+        filters: dict = None,
+        batch_size: int = 100,
+        operation: str = None,
+        budget=None,
+        projection: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+        session=None,
+    ):
+        return self.collection.iterate(
+            filters, batch_size, budget, projection, skip=skip, limit=limit
+        )
+
+    def count(
+        self,
+        filters: dict = None,
+        limit: int = 0,
+        operation: str = None,
+        budget=None,
+    ) -> int:
+        return self.collection.count(filters, limit, budget)
+
+    def changes(
+        self,
+        since: int,
+        until: int,
+        limit: int,
+        operation: str = None,
+        projection: dict = None,
+    ) -> list:
+        revisions = {REVISION_FIELD: {"$gt": since, "$lte": until}}
+
+        def revision(document):
+            return document[REVISION_FIELD]
+
+        written = sorted(self.collection.find(revisions, projection), key=revision)
+        deleted = sorted(self.tombstones.find(revisions), key=revision)
+        return list(
+            itertools.islice(heapq.merge(written, deleted, key=revision), limit)
+        )
+
+    def kill(self, comment: str):
+        # In-process queries stop by themselves once their budget is cancelled
+        pass
+
+    def current_revision(self, operation: str = None) -> int:
+        return self._revision
+
+    def current_version(self, operation: str = None, session=None) -> int:
+        return self._version
+
+    def causal_session(self):
+        # A single in-process store: every read already sees the previous writes
+        return None
+
+    def ensure_indexes(self):
+        pass
+
+    def drop(self):
+        self.collection.clear()
+        self.tombstones.clear()
+        with self._revision_lock:
+            self._revision = self._version = 0
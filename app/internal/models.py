@@ -141,3 +141,215 @@ class Candidate(BaseModel):
                 "gender": "Male",
             }
         }
+
+
+class CandidateSummary(BaseModel):
+    """
+    Compact read model of a candidate for list views.
+
+    Documents are read with `CANDIDATE_SUMMARY_PROJECTION`, and list responses encode them as they are: they
+    were validated when written, so rows skip the per-row validation (and email checks) of the full model,
+    which only documents the response. Full candidates are fetched with `view=full` or by ID.
+
+    Attributes:
+    - uuid: Candidate's UUID.
+    - first_name: Candidate's first name.
+    - last_name: Candidate's last name.
+    - email: Candidate's email address.
+    - career_level: Candidate's career level.
+    - job_major: Candidate's job major.
+    - years_of_experience: Candidate's years of experience.
+    - city: Candidate's city.
+    """
+
+    uuid: str = Field(..., alias="_id", description="Candidate's UUID")
+    first_name: str = Field(..., description="Candidate's first name")
+    last_name: str = Field(..., description="Candidate's last name")
+    email: str = Field(..., description="Candidate's email address")
+    career_level: str = Field(..., description="Candidate's career level")
+    job_major: str = Field(..., description="Candidate's job major")
+    years_of_experience: int = Field(..., description="Candidate's years of experience")
+    city: str = Field(..., description="Candidate's city")
+
+
+# Projection reading only the fields of a candidate summary
+CANDIDATE_SUMMARY_PROJECTION = {
+    field.alias or name: 1 for name, field in CandidateSummary.model_fields.items()
+}
+
+
+class CandidateFilters(BaseModel):
+    """
+    Model for the filters of a candidate list query.
+
+    Attributes:
+    - first_name .. salary: Exact match on the candidate field.
+    - skills: Skills the candidate must all have.
+    - gender: Genders the candidate may have.
+    - keywords: Global search using keywords (case insensitive, on every field).
+    """
+
+    first_name: str = Field(None, description="Filter by first name")
+    last_name: str = Field(None, description="Filter by last name")
+    email: str = Field(None, description="Filter by email")
+    career_level: str = Field(None, description="Filter by career level")
+    job_major: str = Field(None, description="Filter by job major")
+    years_of_experience: int = Field(None, description="Filter by years of experience")
+    degree_type: str = Field(None, description="Filter by degree type")
+    skills: List[str] = Field(None, description="Filter by skills")
+    nationality: str = Field(None, description="Filter by nationality")
+    city: str = Field(None, description="Filter by city")
+    salary: float = Field(None, description="Filter by salary")
+    gender: List[str] = Field(None, description="Filter by gender")
+    keywords: str = Field(None, description="Global search using keywords")
+
+    def to_filters(self) -> dict:
+        """
+        Build the Mongo filter document of the query.
+        """
+        filters = {}
+        # Add filters for each field
+        for field in (
+            "first_name",
+            "last_name",
+            "email",
+            "career_level",
+            "job_major",
+            "degree_type",
+            "nationality",
+            "city",
+        ):
+            if getattr(self, field):
+                filters[field] = getattr(self, field)
+        for field in ("years_of_experience", "salary"):
+            if getattr(self, field) is not None:
+                filters[field] = getattr(self, field)
+        if self.skills:
+            filters["skills"] = {"$all": self.skills}
+        if self.gender:
+            filters["gender"] = {"$in": self.gender}
+
+        # Add global search using keywords
+        keywords = self.keywords
+        if keywords:
+            filters["$or"] = [
+                {"_id": {"$regex": keywords, "$options": "i"}},
+                {"first_name": {"$regex": keywords, "$options": "i"}},
+                {"last_name": {"$regex": keywords, "$options": "i"}},
+                {"email": {"$regex": keywords, "$options": "i"}},
+                {"career_level": {"$regex": keywords, "$options": "i"}},
+                {"job_major": {"$regex": keywords, "$options": "i"}},
+                {"years_of_experience": {"$regex": str(keywords), "$options": "i"}},
+                {"degree_type": {"$regex": keywords, "$options": "i"}},
+                {"nationality": {"$regex": keywords, "$options": "i"}},
+                {"city": {"$regex": keywords, "$options": "i"}},
+                {"skills": {"$in": [keywords]}},
+                {"gender": {"$regex": keywords, "$options": "i"}},
+                {"salary": {"$regex": str(keywords), "$options": "i"}},
+            ]
+        return filters
+
+
+class SavedSearch(CandidateFilters):
+    """
+    Model for representing a user's saved candidate search in the database.
+
+    Attributes:
+    - uuid: Saved search's UUID.
+    - name: Saved search's name.
+    - first_name .. keywords: Same filters as the candidate list query.
+
+    ConfigDict:
+    - populate_by_name: Enables populating the model from dictionary keys.
+    - json_schema_extra: Additional JSON schema information, including an example.
+    """
+
+    uuid: str = Field(
+        default_factory=lambda: str(uuid4()),
+        alias="_id",
+        description="Saved search's UUID",
+    )
+    name: str = Field(..., description="Saved search's name")
+
+    class ConfigDict:
+        populate_by_name = True
+        json_schema_extra = {
+            "example": {
+                "name": "Senior Python developers in Amman",
+                "career_level": "Senior",
+                "skills": ["Python"],
+                "city": "Amman",
+            }
+        }
+
+
+class CandidatePatch(BaseModel):
+    """
+    Model for a partial candidate update.
+
+    Only the supplied fields are validated and written. Omitted fields are left untouched,
+    and explicitly sending `null` for a field is rejected.
+
+    Attributes:
+    - first_name .. gender: Same as in the Candidate model, all optional.
+    - add_skills: Skills to add to the candidate's skills, ignoring existing ones.
+    - remove_skills: Skills to remove from the candidate's skills.
+
+    ConfigDict:
+    - json_schema_extra: Additional JSON schema information, including an example.
+    """
+
+    first_name: str = Field(None, description="Candidate's first name")
+    last_name: str = Field(None, description="Candidate's last name")
+    email: EmailStr = Field(None, description="Candidate's email address")
+    career_level: str = Field(None, description="Candidate's career level")
+    job_major: str = Field(None, description="Candidate's job major")
+    years_of_experience: int = Field(None, description="Candidate's years of experience")
+    degree_type: str = Field(None, description="Candidate's degree type")
+    skills: List[str] = Field(None, description="List of candidate's skills")
+    nationality: str = Field(None, description="Candidate's nationality")
+    city: str = Field(None, description="Candidate's city")
+    salary: float = Field(None, description="Candidate's salary")
+    gender: Literal["Male", "Female", "Not Specified"] = Field(
+        None, description="Candidate's gender"
+    )
+    add_skills: List[str] = Field(None, description="Skills to add")
+    remove_skills: List[str] = Field(None, description="Skills to remove")
+
+    class ConfigDict:
+        json_schema_extra = {
+            "example": {
+                "city": "Irbid",
+                "add_skills": ["Go"],
+            }
+        }
+
+    def to_update(self) -> dict:
+        """
+        Build the minimal Mongo update document for the supplied fields.
+
+        Returns:
+        - Update document using `$set`, `$addToSet` and `$pull` as needed.
+
+        Raises:
+        - ValueError: If more than one operation targets the skills list.
+        """
+        changes = self.model_dump(exclude_unset=True)
+        add_skills = changes.pop("add_skills", None)
+        remove_skills = changes.pop("remove_skills", None)
+
+        # Mongo rejects several operators on the same path in one update
+        skill_operations = [
+            value for value in ("skills" in changes, add_skills, remove_skills) if value
+        ]
+        if len(skill_operations) > 1:
+            raise ValueError(
+                "Only one of skills, add_skills and remove_skills can be sent at once"
+            )
+
+        update = {"$set": changes}
+        if add_skills:
+            update["$addToSet"] = {"skills": {"$each": add_skills}}
+        if remove_skills:
+            update["$pull"] = {"skills": {"$in": remove_skills}}
+        return update
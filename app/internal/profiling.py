@@ -0,0 +1,200 @@
+"""
+This module contains the memory instrumentation of a worker.
+
+The resident set size (RSS) and the garbage collector statistics are always available. Python allocations are traced
+with tracemalloc once tracing is started (it slows every allocation down, so it is off by default), and named
+snapshots of the traced allocations can be diffed to find the allocation sites that grew between two points, e.g.
+before and after a broad /all-candidates request.
+"""
+
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+
+# Allocations made by tracemalloc itself and the import machinery are left out of snapshots
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes():
+    """
+    Return the current resident set size of the process, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> int:
+    """
+    Return the highest resident set size the process reached.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def gc_stats() -> dict:
+    """
+    Return the garbage collector state: thresholds, objects per generation and collections so far.
+    """
+    return {
+        "enabled": gc.isenabled(),
+        "thresholds": gc.get_threshold(),
+        "counts": gc.get_count(),
+        "generations": gc.get_stats(),
+        "uncollectable": len(gc.garbage),
+    }
+
+
+def _site(statistic) -> str:
+    frames = statistic.traceback.format() if statistic.traceback else []
+    return " <- ".join(line.strip() for line in frames if line.strip()) or "?"
+
+
+class MemoryProfiler:
+    """
+    Memory instrumentation of a worker, with named snapshots of the traced allocations.
+
+    Every worker process has its own profiler: with several workers, each request reaches one of them (reported
+    by its `pid`).
+
+    Attributes:
+    - max_snapshots: Number of snapshots kept, the oldest ones are dropped first.
+    """
+
+    def __init__(self, max_snapshots: int = 10):
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        """
+        Whether Python allocations are being traced.
+        """
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        """
+        Start tracing Python allocations, keeping `frames` frames per allocation site.
+        """
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+
+    def stop(self):
+        """
+        Stop tracing, freeing the traces and the snapshots.
+        """
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def _snapshot(self):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Memory tracing is not started")
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def _get(self, name: str):
+        with self._lock:
+            if name not in self._snapshots:
+                raise LookupError(f"Unknown snapshot: {name}")
+            return self._snapshots[name]
+
+    def take(self, name: str) -> dict:
+        """
+        Take a named snapshot of the traced allocations, replacing any snapshot with the same name.
+
+        Raises:
+        - RuntimeError: If tracing is not started.
+        """
+        snapshot, taken_at = self._snapshot(), time.time()
+        traced = sum(trace.size for trace in snapshot.traces)
+        with self._lock:
+            self._snapshots.pop(name, None)
+            self._snapshots[name] = (snapshot, taken_at, traced)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return {"name": name, "taken_at": taken_at, "traced_bytes": traced}
+
+    def top(self, name: str, limit: int = 20, group_by: str = "lineno") -> list:
+        """
+        Return the allocation sites holding the most memory in a snapshot.
+
+        Raises:
+        - LookupError: If there is no snapshot with this name.
+        """
+        snapshot, _, _ = self._get(name)
+        return [
+            {
+                "site": _site(statistic),
+                "size_bytes": statistic.size,
+                "count": statistic.count,
+            }
+            for statistic in snapshot.statistics(group_by)[:limit]
+        ]
+
+    def diff(
+        self, first: str, second: str = None, limit: int = 20, group_by: str = "lineno"
+    ) -> list:
+        """
+        Return the allocation sites whose memory grew (or shrank) the most between two snapshots.
+
+        Args:
+        - first: Name of the earlier snapshot.
+        - second: Name of the later snapshot (None to compare with the allocations right now).
+        - limit: Number of allocation sites.
+        - group_by: "lineno", "filename" or "traceback".
+
+        Raises:
+        - LookupError: If a snapshot is unknown.
+        - RuntimeError: If `second` is None and tracing is not started.
+        """
+        earlier, _, _ = self._get(first)
+        later = self._get(second)[0] if second else self._snapshot()
+        return [
+            {
+                "site": _site(statistic),
+                "size_diff_bytes": statistic.size_diff,
+                "size_bytes": statistic.size,
+                "count_diff": statistic.count_diff,
+            }
+            for statistic in later.compare_to(earlier, group_by)[:limit]
+        ]
+
+    def summary(self) -> dict:
+        """
+        Return the process memory, the garbage collector state and the tracing state with its snapshots.
+        """
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            snapshots = [
+                {"name": name, "taken_at": taken_at, "traced_bytes": size}
+                for name, (_, taken_at, size) in self._snapshots.items()
+            ]
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "gc": gc_stats(),
+            "tracemalloc": {
+                "tracing": self.tracing,
+                "frames": tracemalloc.get_traceback_limit(),
+                "traced_bytes": traced,
+                "peak_traced_bytes": peak,
+                "snapshots": snapshots,
+            },
+        }
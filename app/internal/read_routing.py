@@ -0,0 +1,162 @@
+"""
+This module contains the read preference routing helpers.
+
+Heavy read-only operations (lists, reports) can be routed to secondaries, while writes and read-after-write
+lookups stay on the primary. A command listener records which replica set member served each query, and direct
+connections reach the secondaries for the commands the replica set client always sends to the primary (e.g.
+killing a query running on a secondary).
+"""
+
+import threading
+from pymongo import MongoClient, monitoring, uri_parser
+from pymongo.read_preferences import (
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+    Nearest,
+)
+
+
+# Commands counted as reads
+READ_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct"}
+
+# Connection string options that do not apply to a direct connection to a single member
+REPLICA_SET_OPTIONS = {
+    "replicaset",
+    "readpreference",
+    "readpreferencetags",
+    "maxstalenessseconds",
+}
+
+# Read preference modes by their connection string name
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(mode: str, max_staleness: int = -1):
+    """
+    Build a pymongo read preference from its mode name.
+
+    Args:
+    - mode: One of the READ_PREFERENCE_MODES names.
+    - max_staleness: Maximum replication lag in seconds (-1 for no bound, otherwise at least 90).
+
+    Returns:
+    - The read preference instance.
+
+    Raises:
+    - ValueError: If the mode is unknown.
+    """
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=max_staleness)
+
+
+class MemberUsage(monitoring.CommandListener):
+    """
+    Command listener counting the read commands served by each replica set member.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name not in READ_COMMANDS:
+            return
+        host, port = event.connection_id
+        key = (f"{host}:{port}", f"{event.database_name}.{event.command_name}")
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def failed(self, event):
+        pass
+
+    def summary(self, clients) -> list:
+        """
+        Return the read command counts per member, labelled with the member's current role.
+
+        Args:
+        - clients: pymongo clients whose topology is used to label the members.
+
+        Returns:
+        - List of per-member command counts.
+        """
+        roles = {}
+        for client in clients:
+            if client is None:
+                continue
+            for host, port in client.secondaries:
+                roles[f"{host}:{port}"] = "secondary"
+            if client.primary:
+                host, port = client.primary
+                roles[f"{host}:{port}"] = "primary"
+
+        with self._lock:
+            counts = dict(self._counts)
+
+        members = {}
+        for (address, command), count in counts.items():
+            member = members.setdefault(
+                address,
+                {
+                    "address": address,
+                    "role": roles.get(address, "unknown"),
+                    "commands": {},
+                },
+            )
+            member["commands"][command] = count
+        return list(members.values())
+
+
+class MemberClients:
+    """
+    Direct connections to single replica set members, opened on first use with the credentials and options of
+    the replica set's connection string.
+
+    Attributes:
+    - uri: Connection string of the replica set.
+    - options: Extra MongoClient options (e.g. the server API version).
+    """
+
+    def __init__(self, uri: str, **options):
+        self.uri = uri
+        self.options = options
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, address: tuple) -> MongoClient:
+        """
+        Return the direct client of the member at a (host, port) address.
+        """
+        with self._lock:
+            client = self._clients.get(address)
+            if client is None:
+                # Resolves the seed list and TXT options of mongodb+srv:// strings
+                parsed = uri_parser.parse_uri(self.uri)
+                options = {
+                    name: value
+                    for name, value in parsed["options"].items()
+                    if name.lower() not in REPLICA_SET_OPTIONS
+                }
+                client = MongoClient(
+                    *address,
+                    directConnection=True,
+                    username=parsed["username"],
+                    password=parsed["password"],
+                    **options,
+                    **self.options,
+                )
+                self._clients[address] = client
+            return client
@@ -0,0 +1,567 @@
+"""
+This module contains the storage repositories for users and candidates.
+
+Routes only talk to these interfaces, so the storage backend (MongoDB or the in-memory engine) can be selected by
+configuration. Both backends raise pymongo's DuplicateKeyError on unique email violations.
+"""
+
+import heapq
+import itertools
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+    OperationFailure,
+    PyMongoError,
+)
+
+from app.internal.auth import TOKEN_VERSION_FIELD
+from app.internal.dedup import BANDS_FIELD
+from app.internal.geo import LOCATION_FIELD, countable_filters
+from app.internal.revisions import (
+    REVISION_FIELD,
+    CREATED_REVISION_FIELD,
+    DELETED_AT_FIELD,
+    next_revision,
+    current_revision,
+    commit_version,
+    current_version,
+)
+
+
+def _bounded(cursor, budget):
+    """
+    Tag a cursor with a QueryBudget's comment and apply its remaining time as `maxTimeMS`.
+    """
+    if budget is None:
+        return cursor
+    cursor = cursor.comment(budget.comment)
+    max_time_ms = budget.max_time_ms()
+    return cursor.max_time_ms(max_time_ms) if max_time_ms else cursor
+
+
+class UserRepository(ABC):
+    """
+    Storage interface for users.
+    """
+
+    @abstractmethod
+    def get_by_email(self, email: str):
+        """
+        Return the user with the given email, or None.
+        """
+
+    @abstractmethod
+    def insert(self, user: dict) -> dict:
+        """
+        Insert a user and return the stored document.
+
+        Raises:
+        - DuplicateKeyError: If the email is already taken.
+        """
+
+    @abstractmethod
+    def bump_token_version(self, email: str):
+        """
+        Increment the token version of a user, revoking their older tokens.
+
+        Returns:
+        - The updated user, or None if not found.
+        """
+
+    @abstractmethod
+    def find_revoked(self):
+        """
+        Return the id and token version of every user with revoked tokens.
+        """
+
+    @abstractmethod
+    def ensure_indexes(self):
+        """
+        Create the indexes the queries rely on.
+        """
+
+    @abstractmethod
+    def drop(self):
+        """
+        Remove every user.
+        """
+
+
+class CandidateRepository(ABC):
+    """
+    Storage interface for candidates.
+
+    Every write stamps the candidate with a new revision taken from a monotonically increasing counter, and
+    every delete leaves a tombstone stamped with one. Once a write has committed, it bumps the collection
+    version.
+    """
+
+    @abstractmethod
+    def get(self, candidate_id: str, projection: dict = None):
+        """
+        Return the candidate with the given id, or None.
+        """
+
+    @abstractmethod
+    def insert(self, candidate: dict) -> dict:
+        """
+        Insert a candidate, stamping its revision (and creation revision), and return the stored document.
+
+        Raises:
+        - DuplicateKeyError: If the email is already taken.
+        """
+
+    @abstractmethod
+    def insert_many(self, candidates: list) -> list:
+        """
+        Insert candidates in one unordered bulk write, stamping their revisions.
+
+        Returns:
+        - One result per candidate, in order: the stored document, or the row's exception
+          (e.g. DuplicateKeyError).
+        """
+
+    @abstractmethod
+    def update(self, candidate_id: str, update: dict, revisions: list = None):
+        """
+        Apply a Mongo style update document, stamping a new revision.
+
+        Args:
+        - candidate_id: Candidate's UUID.
+        - update: Update document using `$set`, `$addToSet` and `$pull`.
+        - revisions: If given, only update when the current revision is one of them.
+
+        Returns:
+        - The updated candidate, or None if not found or the revision did not match.
+
+        Raises:
+        - DuplicateKeyError: If the email is already taken.
+        """
+
+    @abstractmethod
+    def delete(self, candidate_id: str) -> bool:
+        """
+        Delete a candidate, leaving a tombstone stamped with a new revision.
+
+        Returns:
+        - True if a candidate was deleted.
+        """
+
+    @abstractmethod
+    def find(
+        self,
+        filters: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+        operation: str = None,
+        budget=None,
+        projection: dict = None,
+        session=None,
+    ) -> list:
+        """
+        Return the candidates matching a Mongo style filter document, in natural order.
+
+        Args:
+        - filters: Filter document.
+        - skip: Number of candidates to skip.
+        - limit: Maximum number of candidates (0 for no limit).
+        - operation: Name of the read operation (e.g. "list", "report") used to pick its read preference.
+          None reads from the primary.
+        - budget: Optional QueryBudget bounding the query's time.
+        - projection: Optional inclusion projection of the returned fields.
+        - session: Optional session from `causal_session`.
+
+        Raises:
+        - ExecutionTimeout: If the query ran out of budget.
+        """
+
+    @abstractmethod
+    def iterate(
+        self,
+        filters: dict = None,
+        batch_size: int = 100,
+        operation: str = None,
+        budget=None,
+        projection: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+        session=None,
+    ):
+        """
+        Lazily iterate over the candidates matching a Mongo style filter document, in natural order.
+
+        Unlike `find`, only one batch of candidates is held in memory at a time.
+
+        Args:
+        - filters: Filter document.
+        - batch_size: Number of candidates fetched per round trip.
+        - operation: Name of the read operation used to pick its read preference.
+        - budget: Optional QueryBudget bounding the time of the whole iteration.
+        - projection: Optional inclusion projection of the returned fields.
+        - skip: Number of candidates to skip.
+        - limit: Maximum number of candidates (0 for no limit).
+        - session: Optional session from `causal_session`.
+        """
+
+    @abstractmethod
+    def count(
+        self,
+        filters: dict = None,
+        limit: int = 0,
+        operation: str = None,
+        budget=None,
+    ) -> int:
+        """
+        Return the number of candidates matching a Mongo style filter document.
+
+        Unfiltered counts are read from the collection metadata instead of scanning it, and are never capped.
+
+        Args:
+        - filters: Filter document.
+        - limit: Stop counting at this many candidates (0 to count them all).
+        - operation: Name of the read operation used to pick its read preference.
+        - budget: Optional QueryBudget bounding the query's time.
+
+        Raises:
+        - ExecutionTimeout: If the count ran out of budget.
+        """
+
+    @abstractmethod
+    def changes(
+        self,
+        since: int,
+        until: int,
+        limit: int,
+        operation: str = None,
+        projection: dict = None,
+    ) -> list:
+        """
+        Return the candidates written and deleted after revision `since` up to revision `until`, in revision order.
+
+        Candidates written several times in the range only appear once, at their latest revision.
+
+        Args:
+        - since: Exclusive lower revision bound.
+        - until: Inclusive upper revision bound.
+        - limit: Maximum number of changes.
+        - operation: Name of the read operation used to pick its read preference.
+        - projection: Optional inclusion projection of the returned candidate fields (must include `_rev`).
+
+        Returns:
+        - Candidates, and tombstones (`_id`, `_rev` of the deletion and `deleted_at`) of deleted candidates.
+        """
+
+    @abstractmethod
+    def kill(self, comment: str):
+        """
+        Kill the running queries tagged with a QueryBudget comment (best effort).
+        """
+
+    @abstractmethod
+    def current_revision(self, operation: str = None) -> int:
+        """
+        Return the latest allocated revision. Writes stamped with it may not have committed yet.
+
+        Args:
+        - operation: Name of the read operation the revision is paired with, so both are read from the
+          same kind of member.
+        """
+
+    @abstractmethod
+    def current_version(self, operation: str = None, session=None) -> int:
+        """
+        Return the collection version: the number of candidate writes committed so far.
+
+        A version read before a query never counts a write the query cannot see, as long as both are read in
+        the same `causal_session`, so list ETags built from it never describe an older body.
+
+        Args:
+        - operation: Name of the read operation the version is paired with.
+        - session: Optional session from `causal_session`.
+        """
+
+    @abstractmethod
+    def causal_session(self):
+        """
+        Start a session whose reads each observe at least the state seen by the previous ones, whichever
+        replica set member serves them, or return None if every read already does. The caller ends it.
+        """
+
+    @abstractmethod
+    def ensure_indexes(self):
+        """
+        Create the indexes the queries rely on.
+        """
+
+    @abstractmethod
+    def drop(self):
+        """
+        Remove every candidate and reset the revision counter.
+        """
+
+
+class MongoUserRepository(UserRepository):
+    """
+    MongoDB implementation of the user repository.
+    """
+
+    def __init__(self, database):
+        self.collection = database["user"]
+
+    def get_by_email(self, email: str):
+        return self.collection.find_one({"email": email})
+
+    def insert(self, user: dict) -> dict:
+        new_user = self.collection.insert_one(user)
+        return self.collection.find_one({"_id": new_user.inserted_id})
+
+    def bump_token_version(self, email: str):
+        return self.collection.find_one_and_update(
+            {"email": email},
+            {"$inc": {TOKEN_VERSION_FIELD: 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def find_revoked(self):
+        return self.collection.find(
+            {TOKEN_VERSION_FIELD: {"$gt": 0}}, {TOKEN_VERSION_FIELD: 1}
+        )
+
+    def ensure_indexes(self):
+        self.collection.create_index([("email", 1)], unique=True)
+        # Only users with revoked tokens are indexed, so revocation refreshes never scan every user
+        self.collection.create_index(
+            [(TOKEN_VERSION_FIELD, 1)],
+            partialFilterExpression={TOKEN_VERSION_FIELD: {"$gt": 0}},
+        )
+
+    def drop(self):
+        self.collection.drop()
+
+
+class MongoCandidateRepository(CandidateRepository):
+    """
+    MongoDB implementation of the candidate repository.
+
+    Writes and read-after-write lookups always use the primary, while named read operations use the read
+    preference configured for them.
+
+    Attributes:
+    - member_clients: Optional MemberClients reaching the secondaries, to kill the queries routed to them.
+    """
+
+    def __init__(
+        self,
+        database,
+        read_preferences: dict = None,
+        tombstone_ttl_seconds: float = 30 * 24 * 60 * 60,
+        member_clients=None,
+    ):
+        self.collection = database["candidate"]
+        self.member_clients = member_clients
+        self.counters = database["counter"]
+        self.tombstones = database["candidate_tombstone"]
+        self.tombstone_ttl_seconds = tombstone_ttl_seconds
+        self.readers = {
+            operation: (
+                self.collection.with_options(read_preference=preference),
+                self.counters.with_options(read_preference=preference),
+            )
+            for operation, preference in (read_preferences or {}).items()
+        }
+        self.tombstone_readers = {
+            operation: self.tombstones.with_options(read_preference=preference)
+            for operation, preference in (read_preferences or {}).items()
+        }
+
+    def get(self, candidate_id: str, projection: dict = None):
+        return self.collection.find_one({"_id": candidate_id}, projection)
+
+    def insert(self, candidate: dict) -> dict:
+        revision = next_revision(self.counters)
+        candidate[REVISION_FIELD] = candidate[CREATED_REVISION_FIELD] = revision
+        new_candidate = self.collection.insert_one(candidate)
+        commit_version(self.counters)
+        return self.collection.find_one({"_id": new_candidate.inserted_id})
+
+    def insert_many(self, candidates: list) -> list:
+        # Allocate a block of consecutive revisions with a single counter update
+        first_revision = (
+            next_revision(self.counters, len(candidates)) - len(candidates) + 1
+        )
+        for offset, candidate in enumerate(candidates):
+            candidate[REVISION_FIELD] = first_revision + offset
+            candidate[CREATED_REVISION_FIELD] = first_revision + offset
+
+        results = list(candidates)
+        try:
+            self.collection.insert_many(candidates, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                error_type = (
+                    DuplicateKeyError if error["code"] == 11000 else OperationFailure
+                )
+                results[error["index"]] = error_type(
+                    error["errmsg"], error["code"], error
+                )
+        if any(isinstance(result, dict) for result in results):
+            commit_version(self.counters)
+        return results
+
+    def update(self, candidate_id: str, update: dict, revisions: list = None):
+        query = {"_id": candidate_id}
+        if revisions is not None:
+            query[REVISION_FIELD] = {"$in": revisions}
+        update = {**update, "$set": {**update.get("$set", {})}}
+        update["$set"][REVISION_FIELD] = next_revision(self.counters)
+        updated = self.collection.find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER
+        )
+        if updated is not None:
+            commit_version(self.counters)
+        return updated
+
+    def delete(self, candidate_id: str) -> bool:
+        result = self.collection.delete_one({"_id": candidate_id})
+        if result.deleted_count == 1:
+            self.tombstones.replace_one(
+                {"_id": candidate_id},
+                {
+                    REVISION_FIELD: next_revision(self.counters),
+                    DELETED_AT_FIELD: datetime.now(timezone.utc),
+                },
+                upsert=True,
+            )
+            commit_version(self.counters)
+        return result.deleted_count == 1
+
+    def find(
+        self,
+        filters: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+        operation: str = None,
+        budget=None,
+        projection: dict = None,
+        session=None,
+    ) -> list:
+        collection, _ = self.readers.get(operation, (self.collection, None))
+        cursor = (
+            collection.find(filters or {}, projection, session=session)
+            .skip(skip)
+            .limit(limit)
+        )
+        return list(_bounded(cursor, budget))
+
+    def iterate(
+        self,
+        filters: dict = None,
+        batch_size: int = 100,
+        operation: str = None,
+        budget=None,
+        projection: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+        session=None,
+    ):
+        collection, _ = self.readers.get(operation, (self.collection, None))
+        cursor = (
+            collection.find(filters or {}, projection, session=session)
+            .skip(skip)
+            .limit(limit)
+            .batch_size(batch_size)
+        )
+        return _bounded(cursor, budget)
+
+    def count(
+        self,
+        filters: dict = None,
+        limit: int = 0,
+        operation: str = None,
+        budget=None,
+    ) -> int:
+        collection, _ = self.readers.get(operation, (self.collection, None))
+        options = {}
+        if budget is not None and budget.max_time_ms():
+            options["maxTimeMS"] = budget.max_time_ms()
+        if not filters:
+            # Read from the collection metadata, too quick to ever need killing
+            return collection.estimated_document_count(**options)
+        if budget is not None:
+            options["comment"] = budget.comment
+        if limit:
+            options["limit"] = limit
+        return collection.count_documents(countable_filters(filters), **options)
+
+    def changes(
+        self,
+        since: int,
+        until: int,
+        limit: int,
+        operation: str = None,
+        projection: dict = None,
+    ) -> list:
+        collection, _ = self.readers.get(operation, (self.collection, None))
+        tombstones = self.tombstone_readers.get(operation, self.tombstones)
+        revisions = {REVISION_FIELD: {"$gt": since, "$lte": until}}
+        # Two bounded range scans on the revision indexes, merged in revision order
+        written = (
+            collection.find(revisions, projection).sort(REVISION_FIELD, 1).limit(limit)
+        )
+        deleted = tombstones.find(revisions).sort(REVISION_FIELD, 1).limit(limit)
+        merged = heapq.merge(
+            written, deleted, key=lambda document: document[REVISION_FIELD]
+        )
+        return list(itertools.islice(merged, limit))
+
+    def kill(self, comment: str):
+        client = self.collection.database.client
+        admins = [client.admin]
+        if self.member_clients is not None:
+            # Reads routed to a secondary run there, out of reach of the replica set client's admin commands
+            admins += [
+                self.member_clients.get(address).admin
+                for address in sorted(client.secondaries)
+            ]
+        for admin in admins:
+            try:
+                for operation in admin.aggregate(
+                    [{"$currentOp": {}}, {"$match": {"command.comment": comment}}]
+                ):
+                    admin.command("killOp", op=operation["opid"])
+            except PyMongoError:
+                # Missing privileges or unreachable member: maxTimeMS still bounds the query
+                pass
+
+    def current_revision(self, operation: str = None) -> int:
+        _, counters = self.readers.get(operation, (None, self.counters))
+        return current_revision(counters)
+
+    def current_version(self, operation: str = None, session=None) -> int:
+        _, counters = self.readers.get(operation, (None, self.counters))
+        return current_version(counters, session)
+
+    def causal_session(self):
+        # Reads routed to secondaries wait for their member to catch up with the previous reads of the session
+        return self.collection.database.client.start_session(causal_consistency=True)
+
+    def ensure_indexes(self):
+        self.collection.create_index([("email", 1)], unique=True)
+        # Multikey index on the LSH bands used to look up near-duplicates
+        self.collection.create_index([(BANDS_FIELD, 1)])
+        # Spherical index on the candidate locations, used by $near searches around a city
+        self.collection.create_index([(LOCATION_FIELD, "2dsphere")])
+        # Candidates written since a revision, read by incremental snapshots and the change feed
+        self.collection.create_index([(REVISION_FIELD, 1)])
+        self.tombstones.create_index([(REVISION_FIELD, 1)])
+        self.tombstones.create_index(
+            DELETED_AT_FIELD, expireAfterSeconds=int(self.tombstone_ttl_seconds)
+        )
+
+    def drop(self):
+        self.collection.drop()
+        self.counters.drop()
+        self.tombstones.drop()
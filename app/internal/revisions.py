@@ -0,0 +1,167 @@
+"""
+This module contains the candidate revision counter and ETag helpers.
+
+Every candidate write stamps the document with a revision taken from a single monotonically increasing counter.
+Revisions are allocated before the write they stamp commits, so the collection version used by list ETags is a
+separate count of the committed writes, only bumped once a write is visible: a version read before a query never
+counts a write the query cannot see yet.
+"""
+
+import hashlib
+from pymongo import ReturnDocument
+
+
+# Counter document holding the latest candidate revision
+CANDIDATE_COUNTER_ID = "candidate"
+
+# Field of the counter document counting the committed candidate writes (the collection version)
+VERSION_FIELD = "version"
+
+# Field storing the revision on each candidate document
+REVISION_FIELD = "_rev"
+
+# Field storing the revision a candidate was created at
+CREATED_REVISION_FIELD = "_created_rev"
+
+# Field storing the deletion time on candidate tombstones
+DELETED_AT_FIELD = "deleted_at"
+
+
+def next_revision(counter_collection, count: int = 1) -> int:
+    """
+    Atomically allocate the next candidate revision(s).
+
+    Args:
+    - counter_collection: Collection holding the revision counters.
+    - count: Number of consecutive revisions to allocate.
+
+    Returns:
+    - The last newly allocated revision.
+    """
+    counter = counter_collection.find_one_and_update(
+        {"_id": CANDIDATE_COUNTER_ID},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["seq"]
+
+
+def commit_version(counter_collection):
+    """
+    Bump the candidate collection version, once a write has committed.
+
+    Args:
+    - counter_collection: Collection holding the revision counters.
+    """
+    counter_collection.update_one(
+        {"_id": CANDIDATE_COUNTER_ID}, {"$inc": {VERSION_FIELD: 1}}, upsert=True
+    )
+
+
+def current_version(counter_collection, session=None) -> int:
+    """
+    Return the candidate collection version: the number of candidate writes committed so far.
+
+    Args:
+    - counter_collection: Collection holding the revision counters.
+    - session: Optional session the read belongs to.
+
+    Returns:
+    - The collection version, or 0 if no candidate was ever written.
+    """
+    counter = counter_collection.find_one(
+        {"_id": CANDIDATE_COUNTER_ID}, session=session
+    )
+    return counter.get(VERSION_FIELD, 0) if counter else 0
+
+
+def current_revision(counter_collection) -> int:
+    """
+    Return the latest allocated candidate revision.
+
+    Args:
+    - counter_collection: Collection holding the revision counters.
+
+    Returns:
+    - The latest revision, or 0 if no candidate was ever written.
+    """
+    counter = counter_collection.find_one({"_id": CANDIDATE_COUNTER_ID})
+    return counter["seq"] if counter else 0
+
+
+def candidate_etag(candidate_id: str, revision: int) -> str:
+    """
+    Build the strong ETag of a single candidate.
+
+    Args:
+    - candidate_id: Candidate's UUID.
+    - revision: Candidate's revision.
+
+    Returns:
+    - The quoted ETag value.
+    """
+    return f'"{candidate_id}-{revision}"'
+
+
+def list_etag(collection_version: int, filter_key: str) -> str:
+    """
+    Build the strong ETag of a candidate list query.
+
+    Args:
+    - collection_version: Current candidate collection version.
+    - filter_key: Canonical key of the query filters.
+
+    Returns:
+    - The quoted ETag value.
+    """
+    digest = hashlib.sha1(f"{collection_version}:{filter_key}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an `If-None-Match` header against an ETag.
+
+    Args:
+    - if_none_match: Raw header value (may be "*" or a comma separated list).
+    - etag: The current ETag of the resource.
+
+    Returns:
+    - True if the client copy is still current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison function
+    candidates = (
+        value.strip().removeprefix("W/") for value in if_none_match.split(",")
+    )
+    return etag in candidates
+
+
+def if_match_revisions(if_match: str, candidate_id: str):
+    """
+    Extract the candidate revisions listed in an `If-Match` header.
+
+    Args:
+    - if_match: Raw header value (may be "*" or a comma separated list).
+    - candidate_id: Candidate's UUID the ETags must belong to.
+
+    Returns:
+    - None for "*" (any current revision), otherwise the list of acceptable revisions.
+    """
+    if if_match.strip() == "*":
+        return None
+
+    revisions = []
+    for value in if_match.split(","):
+        value = value.strip()
+        # If-Match uses the strong comparison function, so weak ETags never match
+        if value.startswith("W/") or len(value) < 2:
+            continue
+        etag_id, _, revision = value.strip('"').rpartition("-")
+        if etag_id == candidate_id and revision.isdigit():
+            revisions.append(int(revision))
+    return revisions
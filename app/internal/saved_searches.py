@@ -0,0 +1,506 @@
+"""
+This module contains the saved candidate searches and their incremental matching (percolation).
+
+Instead of users re-running their searches to find new candidates, each written candidate is matched against the
+saved searches at write time, and new matches are recorded for users to fetch. An in-memory index anchors every
+saved search on one of its equality predicates, so a candidate is only tested against the searches sharing one of
+its field values (plus the few searches without any equality predicate), not against every search.
+
+Matches are ordered by a sequence allocated when they are recorded, and only served once every match allocated
+before them has committed (after a settle delay), so fetching by cursor never skips a match recorded late.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.internal.memory import MemoryCollection, matches
+
+
+logger = logging.getLogger("app.saved_searches")
+
+# Candidate fields a saved search can be anchored on (array fields are anchored per element)
+ANCHOR_FIELDS = (
+    "first_name",
+    "last_name",
+    "email",
+    "career_level",
+    "job_major",
+    "years_of_experience",
+    "degree_type",
+    "skills",
+    "nationality",
+    "city",
+    "salary",
+    "gender",
+)
+
+# Counter document holding the latest match sequence
+MATCH_COUNTER_ID = "saved_search_match"
+
+
+def match_cursor(sequence: int) -> str:
+    """
+    Build the cursor of a match, ordering matches by the sequence allocated when they were recorded.
+    """
+    return f"{sequence:016x}"
+
+
+class SavedSearchStore(ABC):
+    """
+    Storage interface for the saved searches and their recorded matches.
+    """
+
+    @abstractmethod
+    def insert(self, search: dict) -> dict:
+        """
+        Insert a saved search and return the stored document.
+        """
+
+    @abstractmethod
+    def find(self, user_email: str = None) -> list:
+        """
+        Return the saved searches of a user, or of every user.
+        """
+
+    @abstractmethod
+    def delete(self, user_email: str, search_id: str) -> bool:
+        """
+        Delete a user's saved search and its matches.
+
+        Returns:
+        - True if a saved search was deleted.
+        """
+
+    @abstractmethod
+    def record_matches(self, matches: list):
+        """
+        Record matches, ignoring the (search, candidate) pairs already recorded.
+
+        Each new match gets its cursor from a sequence allocated at recording time, and the time it was
+        recorded (`recorded_at`, taken after the allocation).
+
+        Args:
+        - matches: Match documents, keyed by search and candidate.
+        """
+
+    @abstractmethod
+    def find_matches(
+        self,
+        user_email: str,
+        after: str = "",
+        search_id: str = None,
+        limit: int = 100,
+        recorded_before: datetime = None,
+    ) -> list:
+        """
+        Return the matches of a user's saved searches recorded after a cursor, oldest first.
+
+        Matches of deleted searches are never returned, even when recorded after the deletion by a worker
+        whose index still held the search.
+
+        Args:
+        - user_email: Owner of the saved searches.
+        - after: Cursor of the last match already fetched ("" for all).
+        - search_id: Only return the matches of this saved search.
+        - limit: Maximum number of matches.
+        - recorded_before: Only return the matches recorded up to this time (the settle horizon).
+        """
+
+    @abstractmethod
+    def ensure_indexes(self):
+        """
+        Create the indexes the queries rely on.
+        """
+
+    @abstractmethod
+    def drop(self):
+        """
+        Remove every saved search and match.
+        """
+
+
+def _match_filters(
+    search_ids: list, after: str, search_id: str, recorded_before: datetime
+) -> dict:
+    """
+    Build the filter document of the matches of a user's live searches.
+    """
+    if search_id:
+        search_ids = [search_id] if search_id in search_ids else []
+    filters = {"search_id": {"$in": search_ids}, "cursor": {"$gt": after}}
+    if recorded_before:
+        filters["recorded_at"] = {"$lte": recorded_before}
+    return filters
+
+
+class MongoSavedSearchStore(SavedSearchStore):
+    """
+    MongoDB implementation of the saved search store.
+    """
+
+    def __init__(self, database):
+        self.collection = database["saved_search"]
+        self.matches = database["saved_search_match"]
+        self.counters = database["counter"]
+
+    def insert(self, search: dict) -> dict:
+        self.collection.insert_one(search)
+        return self.collection.find_one({"_id": search["_id"]})
+
+    def find(self, user_email: str = None) -> list:
+        return list(
+            self.collection.find({"user_email": user_email} if user_email else {})
+        )
+
+    def delete(self, user_email: str, search_id: str) -> bool:
+        result = self.collection.delete_one(
+            {"_id": search_id, "user_email": user_email}
+        )
+        if result.deleted_count == 1:
+            self.matches.delete_many({"search_id": search_id})
+        return result.deleted_count == 1
+
+    def record_matches(self, matches: list):
+        # Allocate a block of consecutive sequences with a single counter update
+        first = (
+            self.counters.find_one_and_update(
+                {"_id": MATCH_COUNTER_ID},
+                {"$inc": {"seq": len(matches)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )["seq"]
+            - len(matches)
+            + 1
+        )
+        recorded_at = datetime.now(timezone.utc)
+        self.matches.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": match["_id"]},
+                    {
+                        "$setOnInsert": {
+                            **{k: v for k, v in match.items() if k != "_id"},
+                            "cursor": match_cursor(sequence),
+                            "recorded_at": recorded_at,
+                        }
+                    },
+                    upsert=True,
+                )
+                for sequence, match in enumerate(matches, first)
+            ],
+            ordered=False,
+        )
+
+    def find_matches(
+        self,
+        user_email: str,
+        after: str = "",
+        search_id: str = None,
+        limit: int = 100,
+        recorded_before: datetime = None,
+    ) -> list:
+        search_ids = [
+            search["_id"]
+            for search in self.collection.find({"user_email": user_email}, {"_id": 1})
+        ]
+        filters = _match_filters(search_ids, after, search_id, recorded_before)
+        return list(self.matches.find(filters).sort("cursor", 1).limit(limit))
+
+    def ensure_indexes(self):
+        self.collection.create_index([("user_email", 1)])
+        # New matches of a user's searches, read by cursor
+        self.matches.create_index([("search_id", 1), ("cursor", 1)])
+
+    def drop(self):
+        self.collection.drop()
+        self.matches.drop()
+        self.counters.delete_one({"_id": MATCH_COUNTER_ID})
+
+
+class MemorySavedSearchStore(SavedSearchStore):
+    """
+    In-memory implementation of the saved search store.
+    """
+
+    def __init__(self):
+        self.collection = MemoryCollection(indexed=("user_email",))
+        self.matches = MemoryCollection(indexed=("user_email", "search_id"))
+        self._sequence = itertools.count(1)
+        self._sequence_lock = threading.Lock()
+
+    def insert(self, search: dict) -> dict:
+        return self.collection.insert(search)
+
+    def find(self, user_email: str = None) -> list:
+        return self.collection.find({"user_email": user_email} if user_email else {})
+
+    def delete(self, user_email: str, search_id: str) -> bool:
+        deleted = self.collection.delete({"_id": search_id, "user_email": user_email})
+        if deleted:
+            while self.matches.delete({"search_id": search_id}):
+                pass
+        return deleted
+
+    def record_matches(self, matches: list):
+        for match in matches:
+            with self._sequence_lock:
+                sequence = next(self._sequence)
+            recorded = {
+                **match,
+                "cursor": match_cursor(sequence),
+                "recorded_at": datetime.now(timezone.utc),
+            }
+            try:
+                self.matches.insert(recorded)
+            except DuplicateKeyError:
+                pass
+
+    def find_matches(
+        self,
+        user_email: str,
+        after: str = "",
+        search_id: str = None,
+        limit: int = 100,
+        recorded_before: datetime = None,
+    ) -> list:
+        search_ids = [search["_id"] for search in self.find(user_email)]
+        filters = _match_filters(search_ids, after, search_id, recorded_before)
+        found = sorted(self.matches.find(filters), key=lambda match: match["cursor"])
+        return found[:limit]
+
+    def ensure_indexes(self):
+        pass
+
+    def drop(self):
+        self.collection.clear()
+        self.matches.clear()
+        with self._sequence_lock:
+            self._sequence = itertools.count(1)
+
+
+class Percolator:
+    """
+    In-memory index of the saved search predicates, matching written candidates against them.
+
+    Each saved search is anchored on one of its equality predicates (the one whose index bucket is the smallest
+    when the search is added), and searches without any are tested against every candidate. The index is
+    refreshed periodically from the store, so searches saved through other workers are picked up.
+
+    Attributes:
+    - to_filters: Callable building the candidate filter document of a stored saved search.
+    - summary_fields: Candidate fields copied into the recorded matches.
+    - refresh_interval: Seconds between two refreshes from the store.
+    - settle_seconds: Seconds after which every match allocated before a recorded one has committed.
+    """
+
+    def __init__(
+        self,
+        to_filters,
+        summary_fields=(),
+        refresh_interval: float = 30,
+        settle_seconds: float = 2,
+    ):
+        self.to_filters = to_filters
+        self.summary_fields = tuple(summary_fields)
+        self.refresh_interval = refresh_interval
+        self.settle_seconds = settle_seconds
+        self._searches = {}
+        self._anchors = {}
+        self._index = {}
+        self._unanchored = set()
+        self._failing = set()
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Local adds (the search) and removes (None) made since the current refresh started, which its read
+        # may have missed
+        self._changed_since_refresh = {}
+        self._stats = {
+            "candidates": 0,
+            "searches_tested": 0,
+            "matches": 0,
+            "search_errors": 0,
+            "errors": 0,
+        }
+
+    def _anchor_options(self, filters: dict) -> list:
+        """
+        Return the index keys each equality predicate of a filter could be anchored on.
+        """
+        options = []
+        for field in ANCHOR_FIELDS:
+            predicate = filters.get(field)
+            if predicate is None:
+                continue
+            if not isinstance(predicate, dict):
+                options.append([(field, predicate)])
+            elif "$all" in predicate:
+                # Any of the required values is a valid anchor
+                options.extend([(field, value)] for value in predicate["$all"])
+            elif "$in" in predicate:
+                # The search must be reachable from every accepted value
+                options.append([(field, value) for value in predicate["$in"]])
+        return options
+
+    def _add(self, search: dict):
+        self._remove(search["_id"])
+        filters = self.to_filters(search)
+        self._searches[search["_id"]] = (search, filters)
+        options = self._anchor_options(filters)
+        if not options:
+            self._unanchored.add(search["_id"])
+            return
+        keys = min(
+            options,
+            key=lambda keys: sum(len(self._index.get(key, ())) for key in keys),
+        )
+        self._anchors[search["_id"]] = keys
+        for key in keys:
+            self._index.setdefault(key, set()).add(search["_id"])
+
+    def _remove(self, search_id: str):
+        self._searches.pop(search_id, None)
+        self._unanchored.discard(search_id)
+        for key in self._anchors.pop(search_id, ()):
+            ids = self._index.get(key)
+            if ids is not None:
+                ids.discard(search_id)
+                if not ids:
+                    del self._index[key]
+
+    def add(self, search: dict):
+        """
+        Index a saved search locally, ahead of the next refresh.
+        """
+        with self._lock:
+            self._add(search)
+            self._changed_since_refresh[search["_id"]] = search
+
+    def remove(self, search_id: str):
+        """
+        Remove a saved search from the local index, ahead of the next refresh.
+        """
+        with self._lock:
+            self._remove(search_id)
+            self._failing.discard(search_id)
+            self._changed_since_refresh[search_id] = None
+
+    def refresh(self, store: SavedSearchStore):
+        """
+        Rebuild the index from the saved searches of the store, keeping the local adds and removes made
+        meanwhile.
+        """
+        with self._lock:
+            self._changed_since_refresh = {}
+        searches = store.find()
+        with self._lock:
+            self._searches, self._anchors, self._index = {}, {}, {}
+            self._unanchored = set()
+            for search in searches:
+                if search["_id"] not in self._changed_since_refresh:
+                    self._add(search)
+            for search in self._changed_since_refresh.values():
+                if search is not None:
+                    self._add(search)
+        self._refreshed_at = time.monotonic()
+
+    def maybe_refresh(self, store: SavedSearchStore):
+        """
+        Refresh if the index is stale. Only one caller refreshes, the others keep using the old index.
+        """
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.refresh(store)
+        finally:
+            self._refresh_lock.release()
+
+    def match(self, candidate: dict) -> list:
+        """
+        Return the saved searches a candidate matches.
+        """
+        with self._lock:
+            search_ids = set(self._unanchored)
+            for field in ANCHOR_FIELDS:
+                value = candidate.get(field)
+                for item in value if isinstance(value, list) else [value]:
+                    search_ids.update(self._index.get((field, item), ()))
+            tested = [self._searches[search_id] for search_id in search_ids]
+
+        matched, failed = [], []
+        for search, filters in tested:
+            # A search whose predicate cannot be evaluated must not stop the others from matching
+            try:
+                if matches(candidate, filters):
+                    matched.append(search)
+            except Exception:
+                failed.append(search["_id"])
+        with self._lock:
+            self._stats["candidates"] += 1
+            self._stats["searches_tested"] += len(tested)
+            self._stats["search_errors"] += len(failed)
+            newly_failing = set(failed) - self._failing
+            self._failing.update(newly_failing)
+        for search_id in newly_failing:
+            logger.warning("Saved search %s cannot be matched", search_id)
+        return matched
+
+    def percolate(self, store: SavedSearchStore, candidates: list) -> int:
+        """
+        Record the saved searches newly matched by written candidates.
+
+        Failures are logged and counted instead of raised: the candidates were already written.
+
+        Args:
+        - store: Store holding the saved searches and their matches.
+        - candidates: Written candidates.
+
+        Returns:
+        - The number of matches found (including already recorded ones).
+        """
+        try:
+            self.maybe_refresh(store)
+            now = datetime.now(timezone.utc)
+            found = [
+                {
+                    "_id": f"{search['_id']}:{candidate['_id']}",
+                    "search_id": search["_id"],
+                    "user_email": search["user_email"],
+                    "candidate": {
+                        field: candidate.get(field) for field in self.summary_fields
+                    },
+                    "matched_at": now,
+                }
+                for candidate in candidates
+                for search in self.match(candidate)
+            ]
+            if found:
+                store.record_matches(found)
+        except Exception:
+            logger.exception("Could not record saved search matches")
+            with self._lock:
+                self._stats["errors"] += 1
+            return 0
+        with self._lock:
+            self._stats["matches"] += len(found)
+        return len(found)
+
+    def stats(self) -> dict:
+        """
+        Return the indexed searches and the matching counters.
+        """
+        with self._lock:
+            return {
+                "searches": len(self._searches),
+                "unanchored": len(self._unanchored),
+                "index_keys": len(self._index),
+                **self._stats,
+            }
@@ -5,32 +5,128 @@ This module contains DB configurations.
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
 from dotenv import dotenv_values
+from app.internal.access_log import AccessLog, DbTimer, worker_log_path
+from app.internal.slow_queries import SlowQueryLog
+from app.internal.dedup import DEDUP_MODES
+from app.internal.geo import DEFAULT_GAZETTEER
+from app.internal.health import PoolUsage
+from app.internal.idempotency import MemoryIdempotencyStore, MongoIdempotencyStore
+from app.internal.read_routing import MemberClients, MemberUsage, read_preference
+from app.internal.saved_searches import MemorySavedSearchStore, MongoSavedSearchStore
+from app.internal.repository import MongoUserRepository, MongoCandidateRepository
+from app.internal.memory import MemoryUserRepository, MemoryCandidateRepository
 
 
 # Load configuration from .env file
 CONFIG = dotenv_values(".env")
 
-# Production MongoDB configuration
-CLIENT = MongoClient(CONFIG["ATLAS_URI"], server_api=ServerApi("1"))
-DB_NAME = CONFIG["DB_NAME"]
-DB = CLIENT[DB_NAME]
+# Slow candidate query log, registered on both clients (one file per worker under several workers)
+SLOW_QUERIES = SlowQueryLog(
+    "candidate",
+    threshold_ms=float(CONFIG.get("SLOW_QUERY_MS") or 100),
+    log_path=worker_log_path(CONFIG.get("SLOW_QUERY_LOG") or "slow_queries.log"),
+)
 
-USERS = DB["user"]
-CANDIDATES = DB["candidate"]
+# Replica set members serving the reads, registered on both clients
+MEMBER_USAGE = MemberUsage()
 
-USERS.create_index([("email", 1)], unique=True)
-CANDIDATES.create_index([("email", 1)], unique=True)
+# Structured access and audit log, and the DB time of each request, registered on both clients (one file per
+# worker under several workers)
+ACCESS_LOG = AccessLog(
+    worker_log_path(CONFIG.get("ACCESS_LOG", "access.log")),
+    sample_rate=float(CONFIG.get("ACCESS_LOG_SAMPLE_RATE") or 1),
+    max_bytes=int(CONFIG.get("ACCESS_LOG_MAX_BYTES") or 50 * 1024 * 1024),
+    backup_count=int(CONFIG.get("ACCESS_LOG_BACKUPS") or 5),
+)
+DB_TIMER = DbTimer()
 
-# Test MongoDB configuration
-TEST_CLIENT = MongoClient(CONFIG["TEST_ATLAS_URI"], server_api=ServerApi("1"))
-TEST_DB_NAME = CONFIG["TEST_DB_NAME"]
-TEST_DB = TEST_CLIENT[TEST_DB_NAME]
+# Checked out and waiting pooled connections, registered on both clients
+POOL_USAGE = PoolUsage()
 
-TEST_USERS = TEST_DB["user"]
-TEST_CANDIDATES = TEST_DB["candidate"]
+# Read preference of each named read operation (writes and read-after-write always use the primary)
+MAX_STALENESS_SECONDS = int(CONFIG.get("MAX_STALENESS_SECONDS") or 90)
+READ_PREFERENCES = {
+    operation: read_preference(
+        CONFIG.get(f"READ_PREFERENCE_{operation.upper()}") or "secondaryPreferred",
+        MAX_STALENESS_SECONDS,
+    )
+    for operation in ("list", "search", "report", "analytics")
+}
 
-TEST_USERS.create_index([("email", 1)], unique=True)
-TEST_CANDIDATES.create_index([("email", 1)], unique=True)
+# Days the candidate tombstones (and change feed checkpoints) are kept
+CHANGE_FEED_RETENTION_DAYS = float(CONFIG.get("CHANGE_FEED_RETENTION_DAYS") or 30)
+TOMBSTONE_TTL_SECONDS = CHANGE_FEED_RETENTION_DAYS * 24 * 60 * 60
+
+# Storage backend: "mongo" (default) or "memory" (no external service, e.g. for tests and benchmarks)
+STORAGE_BACKEND = (CONFIG.get("STORAGE_BACKEND") or "mongo").lower().strip()
+
+if STORAGE_BACKEND == "memory":
+    CLIENT = DB = TEST_CLIENT = TEST_DB = None
+    DB_NAME = CONFIG.get("DB_NAME") or "memory"
+    TEST_DB_NAME = CONFIG.get("TEST_DB_NAME") or "memory"
+
+    USERS = MemoryUserRepository()
+    CANDIDATES = MemoryCandidateRepository()
+    TEST_USERS = MemoryUserRepository()
+    TEST_CANDIDATES = MemoryCandidateRepository()
+    IDEMPOTENCY_KEYS = MemoryIdempotencyStore()
+    TEST_IDEMPOTENCY_KEYS = MemoryIdempotencyStore()
+    SAVED_SEARCHES = MemorySavedSearchStore()
+    TEST_SAVED_SEARCHES = MemorySavedSearchStore()
+else:
+    # Production MongoDB configuration
+    CLIENT = MongoClient(
+        CONFIG["ATLAS_URI"],
+        server_api=ServerApi("1"),
+        event_listeners=[SLOW_QUERIES, MEMBER_USAGE, DB_TIMER, POOL_USAGE],
+    )
+    DB_NAME = CONFIG["DB_NAME"]
+    DB = CLIENT[DB_NAME]
+    SLOW_QUERIES.watch(DB)
+
+    USERS = MongoUserRepository(DB)
+    CANDIDATES = MongoCandidateRepository(
+        DB,
+        READ_PREFERENCES,
+        tombstone_ttl_seconds=TOMBSTONE_TTL_SECONDS,
+        member_clients=MemberClients(CONFIG["ATLAS_URI"], server_api=ServerApi("1")),
+    )
+    IDEMPOTENCY_KEYS = MongoIdempotencyStore(DB["idempotency_keys"])
+    SAVED_SEARCHES = MongoSavedSearchStore(DB)
+
+    # Test MongoDB configuration
+    TEST_CLIENT = MongoClient(
+        CONFIG["TEST_ATLAS_URI"],
+        server_api=ServerApi("1"),
+        event_listeners=[SLOW_QUERIES, MEMBER_USAGE, DB_TIMER, POOL_USAGE],
+    )
+    TEST_DB_NAME = CONFIG["TEST_DB_NAME"]
+    TEST_DB = TEST_CLIENT[TEST_DB_NAME]
+    SLOW_QUERIES.watch(TEST_DB)
+
+    TEST_USERS = MongoUserRepository(TEST_DB)
+    TEST_CANDIDATES = MongoCandidateRepository(
+        TEST_DB,
+        READ_PREFERENCES,
+        tombstone_ttl_seconds=TOMBSTONE_TTL_SECONDS,
+        member_clients=MemberClients(
+            CONFIG["TEST_ATLAS_URI"], server_api=ServerApi("1")
+        ),
+    )
+    TEST_IDEMPOTENCY_KEYS = MongoIdempotencyStore(TEST_DB["idempotency_keys"])
+    TEST_SAVED_SEARCHES = MongoSavedSearchStore(TEST_DB)
+
+for repository in (
+    USERS,
+    CANDIDATES,
+    TEST_USERS,
+    TEST_CANDIDATES,
+    IDEMPOTENCY_KEYS,
+    TEST_IDEMPOTENCY_KEYS,
+    SAVED_SEARCHES,
+    TEST_SAVED_SEARCHES,
+):
+    repository.ensure_indexes()
 
 # Production flag
 PRODUCTION = CONFIG["PRODUCTION"].lower().strip()
@@ -38,4 +134,76 @@ PRODUCTION = CONFIG["PRODUCTION"].lower().strip()
 # Application level configurations
 SECRET_KEY = CONFIG["SECRET_KEY"]
 ALGORITHM = CONFIG["ALGORITHM"]
-ACCESS_TOKEN_EXPIRE_MINUTES = int(CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"])
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = int(CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"])
+
+# Candidate list query coalescing (0 disables the short-TTL result cache), and the number of cached lists
+CANDIDATE_QUERY_CACHE_TTL = float(CONFIG.get("CANDIDATE_QUERY_CACHE_TTL") or 0)
+CANDIDATE_QUERY_CACHE_SIZE = int(CONFIG.get("CANDIDATE_QUERY_CACHE_SIZE") or 1000)
+
+# Seconds the total counts of candidate lists stay cached, and the number of candidates approximate counts stop at
+CANDIDATE_COUNT_CACHE_TTL = float(CONFIG.get("CANDIDATE_COUNT_CACHE_TTL") or 10)
+CANDIDATE_COUNT_LIMIT = int(CONFIG.get("CANDIDATE_COUNT_LIMIT") or 10000)
+
+# Authorization caches (revocations reach the other workers on their next refresh)
+TOKEN_CACHE_SIZE = int(CONFIG.get("TOKEN_CACHE_SIZE") or 10000)
+REVOCATION_REFRESH_SECONDS = float(CONFIG.get("REVOCATION_REFRESH_SECONDS") or 30)
+
+# Comma separated emails allowed to use the /admin endpoints
+ADMIN_EMAILS = {
+    email.strip()
+    for email in (CONFIG.get("ADMIN_EMAILS") or "").split(",")
+    if email.strip()
+}
+
+# Micro-batching of concurrent candidate inserts (0 disables batching). Each waiting insert holds a threadpool
+# thread (40 per worker), so batches never grow past the threadpool and should stay well below it
+CANDIDATE_BATCH_WINDOW_MS = float(CONFIG.get("CANDIDATE_BATCH_WINDOW_MS") or 0)
+CANDIDATE_BATCH_SIZE = int(CONFIG.get("CANDIDATE_BATCH_SIZE") or 16)
+
+# Number of candidates read from the cursor and written per chunk by streaming responses
+CANDIDATE_STREAM_BATCH_SIZE = int(CONFIG.get("CANDIDATE_STREAM_BATCH_SIZE") or 100)
+
+# Query time budgets in milliseconds per read operation, applied as maxTimeMS (0 for no budget)
+QUERY_BUDGETS_MS = {
+    operation: int(CONFIG.get(f"QUERY_BUDGET_MS_{operation.upper()}") or default)
+    for operation, default in (("list", 5000), ("count", 1000), ("report", 30000))
+}
+
+# Near-duplicate check when creating candidates: off, warn (X-Possible-Duplicates header) or reject (409)
+DEDUP_ON_INSERT = (CONFIG.get("DEDUP_ON_INSERT") or "off").lower()
+if DEDUP_ON_INSERT not in DEDUP_MODES:
+    raise ValueError(f"Unknown DEDUP_ON_INSERT mode: {DEDUP_ON_INSERT}")
+DEDUP_THRESHOLD = float(CONFIG.get("DEDUP_THRESHOLD") or 0.6)
+# Seconds the near-duplicate clusters of the whole collection are reused for
+DEDUP_CLUSTERS_CACHE_TTL = float(CONFIG.get("DEDUP_CLUSTERS_CACHE_TTL") or 300)
+
+# Hours the responses of requests sent with an Idempotency-Key are kept for replays
+IDEMPOTENCY_TTL_HOURS = float(CONFIG.get("IDEMPOTENCY_TTL_HOURS") or 24)
+
+# Directory, row group size and number of kept files of the columnar candidate snapshots
+SNAPSHOT_DIR = CONFIG.get("SNAPSHOT_DIR") or "snapshots"
+SNAPSHOT_ROW_GROUP_SIZE = int(CONFIG.get("SNAPSHOT_ROW_GROUP_SIZE") or 10000)
+SNAPSHOTS_KEPT = int(CONFIG.get("SNAPSHOTS_KEPT") or 10)
+
+# Pooled DB connections opened by each worker before it accepts connections
+WARMUP_CONNECTIONS = int(CONFIG.get("WARMUP_CONNECTIONS") or 4)
+
+# Seconds between readiness probes, DB ping timeout and event loop lag above which a worker is not ready
+HEALTH_PROBE_INTERVAL = float(CONFIG.get("HEALTH_PROBE_INTERVAL") or 5)
+HEALTH_PING_TIMEOUT = float(CONFIG.get("HEALTH_PING_TIMEOUT") or 2)
+HEALTH_MAX_LOOP_LAG_MS = float(CONFIG.get("HEALTH_MAX_LOOP_LAG_MS") or 500)
+
+# Seconds between two reloads of the saved searches matched against written candidates
+SAVED_SEARCH_REFRESH_SECONDS = float(CONFIG.get("SAVED_SEARCH_REFRESH_SECONDS") or 30)
+
+# Seconds a change feed waits before serving the revisions allocated up to a new horizon, so that writes
+# whose revision was allocated but not yet committed are not skipped
+CHANGE_FEED_SETTLE_SECONDS = float(CONFIG.get("CHANGE_FEED_SETTLE_SECONDS") or 2)
+
+# CSV gazetteer resolving candidate cities to coordinates (the bundled one by default), and the default search radius
+GAZETTEER_PATH = CONFIG.get("GAZETTEER_PATH") or DEFAULT_GAZETTEER
+GEO_DEFAULT_RADIUS_KM = float(CONFIG.get("GEO_DEFAULT_RADIUS_KM") or 50)
+
+# Frames kept per traced allocation when memory tracing starts with the worker (0 leaves it off until started
+# through /admin/memory/tracing)
+TRACEMALLOC_FRAMES = int(CONFIG.get("TRACEMALLOC_FRAMES") or 0)
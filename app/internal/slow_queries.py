@@ -0,0 +1,346 @@
+"""
+This module contains the slow query log.
+
+A pymongo command listener records every candidate query slower than a threshold, together with its normalized
+filter shape, and captures its explain plan in the background. Records are written to a rotating JSON lines log
+and aggregated per shape.
+
+Queries returning a cursor are timed over every batch: the getMore time is added to the original command, and the
+query is compared to the threshold once its cursor is done, so a fast first batch followed by a slow drain is still
+recorded.
+
+Explaining with executionStats runs the query again, so each shape is explained at most once per interval and only
+a bounded number of explains wait in the background; the other records are logged without a plan. The explain is
+sent with the read preference of the original command, so a query read from a secondary is explained on one.
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from pymongo import monitoring
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+
+# Commands worth explaining (getMore batches belong to the original find)
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+# Commands reading or closing the cursor of a slow query, and the field naming their collection
+CURSOR_COMMANDS = {"getMore": "collection", "killCursors": "killCursors"}
+
+# Cursors followed until they are exhausted, the oldest ones are recorded as is beyond this
+MAX_OPEN_CURSORS = 1000
+
+# Read preference classes by the mode name sent in `$readPreference`
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Command fields that must not be replayed inside explain
+SESSION_FIELDS = {
+    "lsid",
+    "txnNumber",
+    "autocommit",
+    "startTransaction",
+    "apiVersion",
+    "apiStrict",
+    "apiDeprecationErrors",
+}
+
+
+def filter_shape(value):
+    """
+    Replace the literal values of a filter by placeholders, keeping its structure.
+
+    Args:
+    - value: Filter document (or any nested value inside it).
+
+    Returns:
+    - The filter shape, e.g. {"city": 1, "skills": {"$all": 1}}.
+    """
+    if isinstance(value, dict):
+        return {
+            key: (
+                filter_shape(item)
+                if key in ("$or", "$and", "$nor") or isinstance(item, dict)
+                else 1
+            )
+            for key, item in sorted(value.items())
+        }
+    if isinstance(value, list):
+        return [filter_shape(item) for item in value]
+    return 1
+
+
+def command_read_preference(command: dict):
+    """
+    Rebuild the read preference a command was sent with, from its `$readPreference` field.
+
+    Commands without one (e.g. primary reads) are sent to the primary.
+    """
+    document = command.get("$readPreference")
+    if not document or document.get("mode", "primary") == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[document["mode"]](
+        tag_sets=document.get("tags"),
+        max_staleness=document.get("maxStalenessSeconds", -1),
+    )
+
+
+def _plan_summary(explain: dict) -> dict:
+    """
+    Extract the interesting parts of an explain result.
+    """
+    stats = explain.get("executionStats", {})
+    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    stages = []
+    while winning_plan:
+        stages.append(winning_plan.get("stage"))
+        winning_plan = winning_plan.get("inputStage") or winning_plan.get("queryPlan")
+    return {
+        "stages": stages,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """
+    Command listener recording slow queries on a collection.
+
+    Queries returning a cursor are recorded once the cursor is exhausted or closed, so `duration_ms` and `returned`
+    count every batch (the time the application spends between two batches is not counted).
+
+    Attributes:
+    - collection: Name of the monitored collection.
+    - threshold_ms: Queries at or above this duration are recorded.
+    - explain_interval: Seconds before the same shape is explained again.
+    - max_pending_explains: Explains waiting in the background at most.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        threshold_ms: float = 100,
+        log_path: str = "slow_queries.log",
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        explain_interval: float = 60,
+        max_pending_explains: int = 10,
+    ):
+        self.collection = collection
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self.max_pending_explains = max_pending_explains
+        self._databases = {}
+        self._started = {}
+        self._cursors = {}
+        self._shapes = {}
+        self._explained_at = {}
+        self._pending_explains = 0
+        self._lock = threading.Lock()
+        self._explainer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="explain"
+        )
+
+        self._logger = logging.getLogger(f"slow_queries.{collection}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if not self._logger.handlers:
+            self._logger.addHandler(
+                RotatingFileHandler(
+                    log_path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+                )
+            )
+
+    def watch(self, database):
+        """
+        Monitor the collection in a database, explaining slow queries with the same connection.
+
+        Args:
+        - database: pymongo Database whose client has this listener registered.
+        """
+        self._databases[database.name] = database
+
+    def started(self, event):
+        if event.database_name not in self._databases:
+            return
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            collection = event.command.get(event.command_name)
+        elif event.command_name in CURSOR_COMMANDS and self._cursors:
+            collection = event.command.get(CURSOR_COMMANDS[event.command_name])
+        else:
+            return
+        if collection == self.collection:
+            self._started[event.request_id] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        started = self._started.pop(event.request_id, None)
+        if started is None:
+            return
+        database_name, command = started
+        if event.command_name in CURSOR_COMMANDS:
+            self._follow_cursor(event, command)
+            return
+
+        cursor = event.reply.get("cursor", {})
+        if event.command_name in ("find", "aggregate"):
+            returned = len(cursor.get("firstBatch", []))
+        else:
+            returned = event.reply.get("n")
+        record = {
+            "time": time.time(),
+            "command": event.command_name,
+            "duration_ms": event.duration_micros / 1000,
+            "returned": returned,
+        }
+        # Later batches are timed and counted as they are read, the query is checked once its cursor is done
+        if cursor.get("id"):
+            with self._lock:
+                self._cursors[cursor["id"]] = (database_name, command, record)
+                overflow = len(self._cursors) - MAX_OPEN_CURSORS
+                oldest = [
+                    self._cursors.pop(cursor_id)
+                    for cursor_id in list(self._cursors)[: max(overflow, 0)]
+                ]
+            for pending in oldest:
+                self._record(*pending)
+            return
+        self._record(database_name, command, record)
+
+    def failed(self, event):
+        started = self._started.pop(event.request_id, None)
+        if started is not None and event.command_name == "getMore":
+            # The query is recorded with the documents read so far
+            with self._lock:
+                pending = self._cursors.pop(started[1]["getMore"], None)
+            if pending is not None:
+                self._record(*pending)
+
+    def _follow_cursor(self, event, command: dict):
+        """
+        Count the documents of a getMore batch, and record the query once its cursor is exhausted or killed.
+        """
+        if event.command_name == "getMore":
+            cursor = event.reply.get("cursor", {})
+            with self._lock:
+                pending = self._cursors.get(command["getMore"])
+                if pending is None:
+                    return
+                pending[2]["duration_ms"] += event.duration_micros / 1000
+                pending[2]["returned"] += len(cursor.get("nextBatch", []))
+                if cursor.get("id"):
+                    return
+                del self._cursors[command["getMore"]]
+            finished = [pending]
+        else:
+            with self._lock:
+                finished = [
+                    self._cursors.pop(cursor_id)
+                    for cursor_id in command.get("cursors", [])
+                    if cursor_id in self._cursors
+                ]
+        for pending in finished:
+            self._record(*pending)
+
+    def _record(self, database_name: str, command: dict, record: dict):
+        """
+        Aggregate and log a finished query if it was slow, explaining its shape when not explained recently.
+        """
+        duration_ms = record["duration_ms"]
+        if duration_ms < self.threshold_ms:
+            return
+        query = command.get("filter", command.get("query", command.get("pipeline", {})))
+        record["shape"] = json.dumps(filter_shape(query), sort_keys=True)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._shapes.setdefault(
+                record["shape"],
+                {
+                    "shape": record["shape"],
+                    "command": record["command"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "docs_examined": 0,
+                    "returned": 0,
+                    "explained": 0,
+                    "last_plan": None,
+                },
+            )
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["returned"] += record["returned"] or 0
+            explained_at = self._explained_at.get(record["shape"])
+            explain = (
+                explained_at is None or now - explained_at >= self.explain_interval
+            ) and self._pending_explains < self.max_pending_explains
+            if explain:
+                self._explained_at[record["shape"]] = now
+                self._pending_explains += 1
+        if explain:
+            # Explain off the request thread, the explain itself is not monitored
+            self._explainer.submit(self._explain, database_name, command, record)
+        else:
+            self._logger.info(json.dumps(record, default=str))
+
+    def _explain(self, database_name: str, command: dict, record: dict):
+        """
+        Capture the explain plan of a slow query and write its log record.
+        """
+        replay = {
+            key: value
+            for key, value in command.items()
+            if not key.startswith("$") and key not in SESSION_FIELDS
+        }
+        try:
+            explain = self._databases[database_name].command(
+                {"explain": replay, "verbosity": "executionStats"},
+                read_preference=command_read_preference(command),
+            )
+            record["plan"] = _plan_summary(explain)
+        except Exception as e:
+            record["plan_error"] = str(e)
+
+        docs_examined = record.get("plan", {}).get("docs_examined")
+        with self._lock:
+            self._pending_explains -= 1
+            entry = self._shapes[record["shape"]]
+            entry["explained"] += 1
+            entry["docs_examined"] += docs_examined or 0
+            entry["last_plan"] = record.get("plan")
+        self._logger.info(json.dumps(record, default=str))
+
+    def summary(self, top: int = 10) -> list:
+        """
+        Return the slowest query shapes by total time.
+
+        Args:
+        - top: Number of shapes to return.
+
+        Returns:
+        - List of per-shape aggregates, slowest first.
+        """
+        with self._lock:
+            entries = sorted(
+                (dict(entry) for entry in self._shapes.values()),
+                key=lambda entry: entry["total_ms"],
+                reverse=True,
+            )
+        return entries[:top]
@@ -0,0 +1,233 @@
+"""
+This module contains the columnar snapshot export of the candidate collection.
+
+Snapshots are Parquet files written one row group per batch read from the cursor, so exporting the whole
+collection never holds more than a batch in memory. Low-cardinality fields are dictionary encoded and every column
+is compressed. Each snapshot records the collection revision it was taken at, and incremental snapshots only
+contain the candidates written since a given revision.
+
+pyarrow is only imported once a snapshot is written or read, so a broken Arrow install (e.g. a NumPy ABI mismatch)
+only breaks the snapshot endpoint, not the whole application.
+"""
+
+import functools
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+from app.internal.revisions import REVISION_FIELD
+
+
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Parquet schema metadata keys recording the revision range of a snapshot
+REVISION_KEY = b"revision"
+SINCE_KEY = b"since"
+
+# Low-cardinality fields, dictionary encoded
+DICTIONARY_FIELDS = [
+    "career_level",
+    "job_major",
+    "degree_type",
+    "nationality",
+    "city",
+    "gender",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def candidate_schema():
+    """
+    Return the Arrow schema of the snapshots.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            pa.field("_id", pa.string(), nullable=False),
+            pa.field("first_name", pa.string()),
+            pa.field("last_name", pa.string()),
+            pa.field("email", pa.string()),
+            pa.field("career_level", pa.string()),
+            pa.field("job_major", pa.string()),
+            pa.field("years_of_experience", pa.int32()),
+            pa.field("degree_type", pa.string()),
+            pa.field("skills", pa.list_(pa.string())),
+            pa.field("nationality", pa.string()),
+            pa.field("city", pa.string()),
+            pa.field("salary", pa.float64()),
+            pa.field("gender", pa.string()),
+            pa.field(REVISION_FIELD, pa.int64()),
+        ]
+    )
+
+
+def write_snapshot(
+    candidates, path: str, revision: int, since: int = 0, row_group_size: int = 10000
+) -> int:
+    """
+    Write candidates to a Parquet snapshot, one row group per `row_group_size` candidates.
+
+    The file is written next to its destination and renamed once complete, so readers never see a partial
+    snapshot.
+
+    Args:
+    - candidates: Iterable of candidate documents (e.g. a batched cursor).
+    - path: Destination file.
+    - revision: Collection revision the snapshot was taken at.
+    - since: Revision the snapshot is incremental from (0 for a full snapshot).
+    - row_group_size: Number of candidates per row group.
+
+    Returns:
+    - The number of candidates written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = candidate_schema().with_metadata(
+        {REVISION_KEY: str(revision), SINCE_KEY: str(since)}
+    )
+    directory = os.path.dirname(path) or "."
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(descriptor)
+
+    rows = 0
+    try:
+        with pq.ParquetWriter(
+            temporary,
+            schema,
+            compression="zstd",
+            use_dictionary=DICTIONARY_FIELDS,
+        ) as writer:
+            batch = []
+            for candidate in candidates:
+                batch.append(candidate)
+                if len(batch) == row_group_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    rows += len(batch)
+                    batch = []
+            # Always write a row group, so that empty snapshots still carry the schema
+            if batch or not rows:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                rows += len(batch)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return rows
+
+
+def read_snapshot(path: str):
+    """
+    Read a snapshot (as a pyarrow Table) through a memory map.
+    """
+    import pyarrow.parquet as pq
+
+    return pq.read_table(path, memory_map=True)
+
+
+def mapped_chunks(file, chunk_size: int = 1024 * 1024):
+    """
+    Yield the bytes of an open file in chunks, read through a memory map instead of buffered reads, and close it.
+    """
+    with file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), chunk_size):
+                yield mapped[start : start + chunk_size]
+
+
+class SnapshotStore:
+    """
+    Directory of candidate snapshots, reused while the collection has not changed.
+
+    A snapshot is named after its revision range, so requesting the same range again at the same collection
+    revision serves the existing file. Only the most recent snapshots are kept.
+
+    Attributes:
+    - directory: Directory holding the snapshot files.
+    - row_group_size: Number of candidates per row group.
+    - keep: Number of snapshot files kept.
+    - settle_seconds: Seconds after which every write stamped with a revision up to the one read has committed.
+    """
+
+    def __init__(
+        self,
+        directory: str = "snapshots",
+        row_group_size: int = 10000,
+        keep: int = 10,
+        settle_seconds: float = 2,
+    ):
+        self.directory = directory
+        self.row_group_size = row_group_size
+        self.keep = keep
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+
+    def path(self, revision: int, since: int = 0) -> str:
+        """
+        Return the file of the snapshot of a revision range.
+        """
+        return os.path.join(self.directory, f"candidates-{since}-{revision}.parquet")
+
+    def export(
+        self, candidate_repository, since: int = 0, operation: str = None
+    ) -> tuple:
+        """
+        Return the snapshot of the candidates written after `since`, writing it if needed.
+
+        Revisions are allocated before the write they stamp is committed, so the scan only starts
+        `settle_seconds` after the revision was read, when every write stamped up to it has committed (the change
+        feed's settle horizon). The revision and the candidates are read from the primary by default: a secondary
+        may lag far beyond the settle delay, and the cached file would keep missing its writes.
+        Candidates written during the export may also appear in the next incremental snapshot; consumers should
+        upsert rows by `_id` and keep the highest `_rev`. Deleted candidates are not part of snapshots.
+
+        The snapshot is returned opened, so that pruning it for a later export does not cut its stream short.
+
+        Args:
+        - candidate_repository: Repository holding the candidates.
+        - since: Only export candidates written after this revision (0 for the whole collection).
+        - operation: Name of the read operation used to pick its read preference (None for the primary).
+
+        Returns:
+        - The snapshot's file, opened for binary reads, and the revision it was taken at.
+        """
+        revision = candidate_repository.current_revision(operation)
+        path = self.path(revision, since)
+        if not os.path.exists(path):
+            # Settle before taking the lock, so that reused snapshots are not held up meanwhile
+            time.sleep(self.settle_seconds)
+        # One export at a time: concurrent requests for the same snapshot wait and reuse it
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                filters = {REVISION_FIELD: {"$gt": since}} if since else None
+                candidates = candidate_repository.iterate(
+                    filters,
+                    batch_size=self.row_group_size,
+                    operation=operation,
+                    projection={name: 1 for name in candidate_schema().names},
+                )
+                write_snapshot(candidates, path, revision, since, self.row_group_size)
+            else:
+                # Keep reused snapshots from being pruned first
+                os.utime(path)
+            snapshot = open(path, "rb")
+            self._prune()
+        return snapshot, revision
+
+    def _prune(self):
+        snapshots = sorted(
+            (
+                os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.startswith("candidates-") and name.endswith(".parquet")
+            ),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        # Snapshots still being streamed stay readable through their open file
+        for path in snapshots[self.keep :]:
+            os.remove(path)
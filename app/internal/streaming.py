@@ -0,0 +1,99 @@
+"""
+This module contains the streaming response encoders.
+
+Large result sets are encoded document by document as they come out of the DB cursor, so the response never holds
+the whole list (or its encoded body) in memory, and the first bytes go out as soon as the first batch is read.
+"""
+
+import itertools
+import json
+
+
+# Media type of newline delimited JSON responses
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def accepts(accept: str, media_type: str) -> bool:
+    """
+    Check whether an Accept header explicitly accepts a media type.
+
+    Args:
+    - accept: Value of the Accept header (may be None).
+    - media_type: Media type to look for, e.g. "application/x-ndjson".
+
+    Returns:
+    - True if the media type is listed without a zero quality.
+    """
+    for media_range in (accept or "").split(","):
+        name, *params = [part.strip() for part in media_range.split(";")]
+        if name.lower() != media_type:
+            continue
+        parameters = dict(
+            (key.strip().lower(), value.strip())
+            for key, _, value in (param.partition("=") for param in params)
+        )
+        quality = parameters.get("q", "1")
+        try:
+            return float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def _encoded(documents, model, chunk_size: int):
+    """
+    Yield lists of documents encoded as JSON, `chunk_size` at a time.
+
+    Documents are validated and serialized through the model, or encoded as they are without a model (e.g.
+    documents already projected on the fields of a read model).
+    """
+    documents = iter(documents)
+    while True:
+        chunk = list(itertools.islice(documents, chunk_size))
+        if not chunk:
+            return
+        if model is None:
+            yield [
+                json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+                for document in chunk
+            ]
+        else:
+            yield [
+                model.model_validate(document).model_dump_json(by_alias=True)
+                for document in chunk
+            ]
+
+
+def ndjson_lines(documents, model, chunk_size: int = 100):
+    """
+    Encode documents as newline delimited JSON, one chunk per `chunk_size` documents.
+
+    Args:
+    - documents: Iterable of documents (e.g. a DB cursor).
+    - model: Pydantic model each document is validated and serialized with, None to encode them as they are.
+    - chunk_size: Number of documents per written chunk.
+
+    Yields:
+    - Encoded chunks.
+    """
+    for chunk in _encoded(documents, model, chunk_size):
+        yield "".join(f"{line}\n" for line in chunk)
+
+
+def json_array_chunks(documents, model, chunk_size: int = 100):
+    """
+    Encode documents as a single JSON array, one chunk per `chunk_size` documents.
+
+    Args:
+    - documents: Iterable of documents (e.g. a DB cursor).
+    - model: Pydantic model each document is validated and serialized with, None to encode them as they are.
+    - chunk_size: Number of documents per written chunk.
+
+    Yields:
+    - Encoded chunks, which concatenated form a valid JSON array.
+    """
+    separator = "["
+    for chunk in _encoded(documents, model, chunk_size):
+        yield separator + ",".join(chunk)
+        separator = ","
+    yield "[]" if separator == "[" else "]"
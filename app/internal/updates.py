@@ -0,0 +1,45 @@
+"""
+This module contains the evaluation of Mongo style update documents.
+
+The in-memory engine applies candidate updates with it, and the routes use it to compute the document an update will
+produce (e.g. to refresh the fingerprint of a patched candidate), so both agree with the MongoDB backend on the
+supported operators.
+"""
+
+
+def apply_update(document: dict, update: dict) -> dict:
+    """
+    Return a copy of a document with a Mongo style update document applied.
+
+    Args:
+    - document: The document to update, left unchanged.
+    - update: Update document supporting `$set`, `$inc`, `$addToSet` (with `$each`) and `$pull` (with `$in`).
+
+    Returns:
+    - The updated copy.
+
+    Raises:
+    - ValueError: If the update uses an unsupported operator.
+    """
+    document = {
+        key: list(value) if isinstance(value, list) else value
+        for key, value in document.items()
+    }
+    for operator, changes in update.items():
+        for field, value in changes.items():
+            if operator == "$set":
+                document[field] = value
+            elif operator == "$inc":
+                document[field] = document.get(field, 0) + value
+            elif operator == "$addToSet":
+                items = value["$each"] if isinstance(value, dict) else [value]
+                current = document.setdefault(field, [])
+                current.extend(item for item in items if item not in current)
+            elif operator == "$pull":
+                removed = value["$in"] if isinstance(value, dict) else [value]
+                document[field] = [
+                    item for item in document.get(field, []) if item not in removed
+                ]
+            else:
+                raise ValueError(f"Unsupported update operator: {operator}")
+    return document
@@ -0,0 +1,46 @@
+"""
+This module contains the start-up warm-up of a worker.
+
+A worker runs its warm-up steps (DB connections, schemas, serializers, password hashing, caches) before it starts
+accepting connections, so the first requests it serves do not pay these one-off costs.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def warm_up(steps: dict, logger: logging.Logger = None) -> dict:
+    """
+    Run warm-up steps in order, timing each one.
+
+    A failing step is logged and skipped: a cold cache only costs latency, it should not stop the worker.
+
+    Args:
+    - steps: Callables by step name.
+    - logger: Logger reporting failed steps.
+
+    Returns:
+    - Duration of each step in milliseconds (None for failed steps).
+    """
+    timings = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            step()
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            timings[name] = None
+            if logger is not None:
+                logger.error(f"Warm-up step {name} failed: {e}")
+    return timings
+
+
+def open_connections(client, count: int):
+    """
+    Open up to `count` pooled connections to the DB by running concurrent pings.
+    """
+    if count <= 0:
+        return
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        list(executor.map(lambda _: client.admin.command("ping"), range(count)))
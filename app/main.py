@@ -5,43 +5,122 @@ It initializes a FastAPI instance with database connection setup and checks for
 """
 
 import logging
+import os
+import time
 from fastapi import FastAPI
-from app.routers.routes import router
+from app.routers.routes import (
+    router,
+    health_prober,
+    percolator,
+    revoked_tokens,
+    detect_user_context,
+    detect_candidate_context,
+    detect_saved_search_context,
+)
+from app.routers.admin import router as admin_router, memory_profiler
 from contextlib import asynccontextmanager
 
-from app.internal.settings import CLIENT, DB_NAME, DB, PRODUCTION
+from app.internal.access_log import AccessLogMiddleware
+from app.internal.models import Candidate, CandidateSummary, pwd_context
+from app.internal.warmup import open_connections, warm_up
+from app.internal.settings import (
+    CLIENT,
+    DB_NAME,
+    DB,
+    PRODUCTION,
+    STORAGE_BACKEND,
+    ACCESS_LOG,
+    WARMUP_CONNECTIONS,
+    TRACEMALLOC_FRAMES,
+)
 
 
 # NOTE: Just to silence this warning mentioned here: https://github.com/pyca/bcrypt/issues/684
 logging.getLogger('passlib').setLevel(logging.ERROR)
 
+# Lifecycle events go through the same non-blocking JSON log as the access records
+logger = logging.getLogger("app.lifecycle")
+ACCESS_LOG.attach(logger)
+
+
+def warm_up_steps(app: FastAPI) -> dict:
+    """
+    Build the warm-up steps run before the worker accepts connections.
+
+    :param app: FastAPI application instance.
+    """
+    example = Candidate.ConfigDict.json_schema_extra["example"]
+    steps = {}
+    if STORAGE_BACKEND != "memory":
+        steps["connections"] = lambda: open_connections(CLIENT, WARMUP_CONNECTIONS)
+    steps["caches"] = lambda: (
+        revoked_tokens.refresh(detect_user_context()),
+        detect_candidate_context().current_version("list"),
+        percolator.refresh(detect_saved_search_context()),
+    )
+    steps["schemas"] = app.openapi
+    steps["serializers"] = lambda: (
+        Candidate.model_validate(example).model_dump_json(by_alias=True),
+        CandidateSummary.model_validate({**example, "_id": "warm-up"}),
+    )
+    # Loads the bcrypt backend, otherwise paid by the first login or sign-up
+    steps["password_hashing"] = lambda: pwd_context.hash("warm-up")
+    return steps
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Async context manager to manage the lifespan of the FastAPI application.
-    Connects to the production database, performs a ping test, and disconnects on exit.
+    Connects to the production database, performs a ping test, warms the worker up before it accepts
+    connections, and disconnects on exit (after in-flight requests were drained).
 
     :param app: FastAPI application instance.
     """
     if PRODUCTION != "true":
         raise Exception("PLEASE ENABLE PRODUCTION ENVIRONMENT.")
 
-    # Connect to DB
-    app.mongodb_client = CLIENT
-    app.database = DB
+    started = time.perf_counter()
+    # Traces the allocations of the whole worker lifetime, warm-up included
+    if TRACEMALLOC_FRAMES:
+        memory_profiler.start(TRACEMALLOC_FRAMES)
 
-    try:
-        CLIENT.admin.command("ping")
-        print(f"Connected to production DB ({DB_NAME}) successfully.")
-    except Exception as e:
-        print(e)
+    if STORAGE_BACKEND == "memory":
+        logger.info("Using the in-memory storage backend.")
+    else:
+        # Connect to DB
+        app.mongodb_client = CLIENT
+        app.database = DB
+
+        try:
+            CLIENT.admin.command("ping")
+            logger.info(f"Connected to production DB ({DB_NAME}) successfully.")
+        except Exception as e:
+            logger.error(f"Could not connect to production DB ({DB_NAME}): {e}")
+
+    # The warm-up can be skipped (python -m app.serve --no-warm-up) to measure cold starts
+    timings = {}
+    if not os.environ.get("SKIP_WARM_UP"):
+        timings = warm_up(warm_up_steps(app), logger)
+    logger.info(
+        {
+            "event": "ready",
+            "pid": os.getpid(),
+            "startup_ms": round((time.perf_counter() - started) * 1000, 1),
+            "warm_up_ms": timings,
+        }
+    )
+    # Reports the worker ready from its first probe on
+    await health_prober.start()
 
     yield
 
+    await health_prober.stop()
     # Shutdown connection
-    CLIENT.close()
-    print(f"Disconnected from production DB ({DB_NAME}) successfully.")
+    if STORAGE_BACKEND != "memory":
+        CLIENT.close()
+        logger.info(f"Disconnected from production DB ({DB_NAME}) successfully.")
+    ACCESS_LOG.stop()
 
 
 app = FastAPI(
@@ -51,4 +130,8 @@ app = FastAPI(
 )
 
 # Set the application routes
-app.include_router(router)
\ No newline at end of file
+app.include_router(router)
+app.include_router(admin_router)
+
+# Log every request without blocking it on disk I/O
+app.add_middleware(AccessLogMiddleware, access_log=ACCESS_LOG)
\ No newline at end of file
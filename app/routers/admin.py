@@ -0,0 +1,264 @@
+"""
+This module contains the admin API routes.
+
+They expose operational diagnostics and are restricted to the users listed in ADMIN_EMAILS.
+"""
+
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.internal.coalescing import SingleFlight
+from app.internal.dedup import CLUSTER_PROJECTION
+from app.internal.profiling import MemoryProfiler
+from app.internal.settings import (
+    SLOW_QUERIES,
+    MEMBER_USAGE,
+    READ_PREFERENCES,
+    CLIENT,
+    TEST_CLIENT,
+    DEDUP_CLUSTERS_CACHE_TTL,
+)
+from app.routers.routes import (
+    authorize_admin,
+    candidate_dedup,
+    detect_candidate_context,
+)
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(authorize_admin)])
+
+# Memory usage and traced allocations of this worker
+memory_profiler = MemoryProfiler()
+
+# Near-duplicate clusters of the whole collection, computed once for concurrent requests and reused for a while
+duplicate_clusters_job = SingleFlight(ttl=DEDUP_CLUSTERS_CACHE_TTL)
+
+
+@router.get(
+    "/slow-queries",
+    response_description="Slowest candidate query shapes",
+    status_code=status.HTTP_200_OK,
+)
+def slow_queries(
+    top: int = Query(10, gt=0, le=100, description="Number of query shapes"),
+):
+    """
+    Endpoint for summarizing the slow candidate queries.
+
+    Args:
+    - top: Number of query shapes to return (default: 10, max: 100).
+
+    Returns:
+    - JSON response with the threshold and the query shapes with the highest total time,
+      including their last captured explain plan.
+    """
+    return {
+        "threshold_ms": SLOW_QUERIES.threshold_ms,
+        "shapes": SLOW_QUERIES.summary(top),
+    }
+
+
+@router.get(
+    "/read-routing",
+    response_description="Read preferences and the members serving reads",
+    status_code=status.HTTP_200_OK,
+)
+def read_routing():
+    """
+    Endpoint for reporting how reads are routed across the replica set.
+
+    Returns:
+    - JSON response with the read preference of each read operation, and the read commands served by
+      each member (labelled primary or secondary).
+    """
+    return {
+        "preferences": {
+            operation: preference.document
+            for operation, preference in READ_PREFERENCES.items()
+        },
+        "members": MEMBER_USAGE.summary([CLIENT, TEST_CLIENT]),
+    }
+
+
+@router.get(
+    "/duplicates",
+    response_description="Clusters of near-duplicate candidates",
+    status_code=status.HTTP_200_OK,
+)
+def duplicate_clusters(
+    top: int = Query(50, gt=0, le=1000, description="Number of clusters"),
+):
+    """
+    Endpoint for the batch job clustering near-duplicate candidates across the whole collection.
+
+    The job only reads the fingerprints of the candidates, and its result is reused for
+    `DEDUP_CLUSTERS_CACHE_TTL` seconds.
+
+    Args:
+    - top: Number of clusters to return, largest first (default: 50, max: 1000).
+
+    Returns:
+    - JSON response with the number of clusters found and the largest ones (lists of candidate ids).
+    """
+    candidate_repository = detect_candidate_context()
+    clusters = duplicate_clusters_job.do(
+        "clusters",
+        lambda: candidate_dedup.clusters(
+            candidate_repository.iterate(
+                batch_size=1000, operation="analytics", projection=CLUSTER_PROJECTION
+            )
+        ),
+    )
+    return {
+        "threshold": candidate_dedup.threshold,
+        "count": len(clusters),
+        "clusters": clusters[:top],
+    }
+
+
+@router.get(
+    "/memory",
+    response_description="Memory usage of this worker",
+    status_code=status.HTTP_200_OK,
+)
+def memory_usage():
+    """
+    Endpoint for reporting the memory usage of the worker serving the request.
+
+    Returns:
+    - JSON response with the worker's pid, its current and peak RSS, the garbage collector state, and the
+      traced Python memory with the snapshots taken so far.
+    """
+    return memory_profiler.summary()
+
+
+@router.post(
+    "/memory/tracing",
+    response_description="Start tracing Python allocations",
+    status_code=status.HTTP_200_OK,
+)
+def start_memory_tracing(
+    frames: int = Query(1, gt=0, le=100, description="Frames kept per allocation"),
+):
+    """
+    Endpoint for starting to trace the Python allocations of the worker (restarting it if already started).
+
+    Tracing slows every allocation down and keeps a record per live allocation, so it should be stopped once
+    the snapshots were taken.
+
+    Args:
+    - frames: Frames kept per allocation site (default: 1, more to group sites by traceback).
+
+    Returns:
+    - JSON response with the tracing state.
+    """
+    memory_profiler.start(frames)
+    return memory_profiler.summary()["tracemalloc"]
+
+
+@router.delete(
+    "/memory/tracing",
+    response_description="Stop tracing Python allocations",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+def stop_memory_tracing():
+    """
+    Endpoint for stopping the allocation tracing of the worker, dropping its snapshots.
+    """
+    memory_profiler.stop()
+
+
+@router.post(
+    "/memory/snapshots",
+    response_description="Take a snapshot of the traced allocations",
+    status_code=status.HTTP_201_CREATED,
+)
+def take_memory_snapshot(
+    name: str = Query(..., min_length=1, max_length=100, description="Snapshot name"),
+):
+    """
+    Endpoint for taking a named snapshot of the traced allocations (replacing any snapshot with this name).
+
+    Args:
+    - name: Snapshot name, e.g. "before".
+
+    Returns:
+    - JSON response with the snapshot's name, time and traced bytes.
+
+    Raises:
+    - HTTPException 409 CONFLICT: If tracing is not started.
+    """
+    try:
+        return memory_profiler.take(name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get(
+    "/memory/snapshots/{name}",
+    response_description="Allocation sites holding the most memory in a snapshot",
+    status_code=status.HTTP_200_OK,
+)
+def memory_snapshot_top(
+    name: str,
+    top: int = Query(20, gt=0, le=1000, description="Number of allocation sites"),
+    group_by: Literal["lineno", "filename", "traceback"] = Query(
+        "lineno", description="Group allocations by line, file or traceback"
+    ),
+):
+    """
+    Endpoint for listing the allocation sites holding the most memory in a snapshot.
+
+    Args:
+    - name: Snapshot name.
+    - top: Number of allocation sites (default: 20, max: 1000).
+    - group_by: "lineno" (default), "filename" or "traceback".
+
+    Returns:
+    - JSON response with the allocation sites, largest first.
+
+    Raises:
+    - HTTPException 404 NOT FOUND: If there is no snapshot with this name.
+    """
+    try:
+        return {"name": name, "sites": memory_profiler.top(name, top, group_by)}
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get(
+    "/memory/diff",
+    response_description="Allocation sites that grew the most between two snapshots",
+    status_code=status.HTTP_200_OK,
+)
+def memory_diff(
+    first: str = Query(..., description="Earlier snapshot"),
+    second: str = Query(None, description="Later snapshot (default: now)"),
+    top: int = Query(20, gt=0, le=1000, description="Number of allocation sites"),
+    group_by: Literal["lineno", "filename", "traceback"] = Query(
+        "lineno", description="Group allocations by line, file or traceback"
+    ),
+):
+    """
+    Endpoint for diffing two snapshots of the traced allocations, e.g. before and after a large request.
+
+    Args:
+    - first: Name of the earlier snapshot.
+    - second: Name of the later snapshot (default: the allocations right now).
+    - top: Number of allocation sites (default: 20, max: 1000).
+    - group_by: "lineno" (default), "filename" or "traceback".
+
+    Returns:
+    - JSON response with the allocation sites whose memory changed the most, by absolute size difference.
+
+    Raises:
+    - HTTPException 404 NOT FOUND: If a snapshot is unknown.
+    - HTTPException 409 CONFLICT: If comparing with now while tracing is not started.
+    """
+    try:
+        sites = memory_profiler.diff(first, second, top, group_by)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"first": first, "second": second, "sites": sites}
@@ -4,31 +4,114 @@ This module contains the API routes.
 It defines routes for health check and provides functionality to detect the user and candidate context based on the production environment.
 """
 
-from typing import Annotated, List
+import asyncio
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, List, Literal
 from fastapi import (
     APIRouter,
     Body,
     Depends,
+    Header,
     Query,
     Request,
+    Response,
     HTTPException,
     status,
 )
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from app.internal.models import User, Candidate, Auth
-from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+from app.internal.models import (
+    User,
+    Candidate,
+    CandidateSummary,
+    CandidateFilters,
+    CandidatePatch,
+    SavedSearch,
+    Auth,
+    CANDIDATE_SUMMARY_PROJECTION,
+)
+from app.internal.access_log import annotate
+from app.internal.auth import TOKEN_VERSION_FIELD, RevocationFilter, TokenCache
+from app.internal.batching import InsertBatcher
+from app.internal.budgets import (
+    CLIENT_CLOSED_REQUEST,
+    INTERRUPTED,
+    BudgetMetrics,
+    ClientDisconnected,
+    QueryBudget,
+    run_query,
+    stream_query,
+)
+from app.internal.change_feed import ChangeFeed, CheckpointExpired
+from app.internal.coalescing import SingleFlight, canonical_filter_key
+from app.internal.dedup import FINGERPRINT_FIELDS, MinHashLSH
+from app.internal.geo import Gazetteer, near_filter
+from app.internal.health import HealthProber
+from app.internal.idempotency import IdempotentRequests, as_response
+from app.internal.saved_searches import Percolator
+from app.internal.snapshots import PARQUET_MEDIA_TYPE, SnapshotStore, mapped_chunks
+from app.internal.streaming import (
+    NDJSON_MEDIA_TYPE,
+    accepts,
+    ndjson_lines,
+    json_array_chunks,
+)
+from app.internal.revisions import (
+    REVISION_FIELD,
+    candidate_etag,
+    list_etag,
+    etag_matches,
+    if_match_revisions,
+)
+from app.internal.updates import apply_update
+from pymongo.errors import DuplicateKeyError, ExecutionTimeout, OperationFailure
 from jose import jwt, JWTError
 
 from app.internal.settings import (
+    CLIENT,
+    TEST_CLIENT,
+    STORAGE_BACKEND,
+    POOL_USAGE,
     USERS,
     CANDIDATES,
     TEST_USERS,
     TEST_CANDIDATES,
+    IDEMPOTENCY_KEYS,
+    TEST_IDEMPOTENCY_KEYS,
+    SAVED_SEARCHES,
+    TEST_SAVED_SEARCHES,
     PRODUCTION,
     SECRET_KEY,
     ALGORITHM,
+    CANDIDATE_QUERY_CACHE_TTL,
+    CANDIDATE_QUERY_CACHE_SIZE,
+    CANDIDATE_COUNT_CACHE_TTL,
+    CANDIDATE_COUNT_LIMIT,
+    TOKEN_CACHE_SIZE,
+    REVOCATION_REFRESH_SECONDS,
+    ADMIN_EMAILS,
+    CANDIDATE_BATCH_WINDOW_MS,
+    CANDIDATE_BATCH_SIZE,
+    CANDIDATE_STREAM_BATCH_SIZE,
+    QUERY_BUDGETS_MS,
+    DEDUP_ON_INSERT,
+    DEDUP_THRESHOLD,
+    IDEMPOTENCY_TTL_HOURS,
+    SNAPSHOT_DIR,
+    SNAPSHOT_ROW_GROUP_SIZE,
+    SNAPSHOTS_KEPT,
+    HEALTH_PROBE_INTERVAL,
+    HEALTH_PING_TIMEOUT,
+    HEALTH_MAX_LOOP_LAG_MS,
+    SAVED_SEARCH_REFRESH_SECONDS,
+    CHANGE_FEED_SETTLE_SECONDS,
+    TOMBSTONE_TTL_SECONDS,
+    GAZETTEER_PATH,
+    GEO_DEFAULT_RADIUS_KM,
 )
 
 
@@ -36,14 +119,103 @@ router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Shares in-flight /all-candidates queries between identical concurrent requests
+candidate_queries = SingleFlight(
+    ttl=CANDIDATE_QUERY_CACHE_TTL, max_entries=CANDIDATE_QUERY_CACHE_SIZE
+)
+
+# Short-lived total counts of the /all-candidates filters, shared between list pages
+candidate_counts = SingleFlight(ttl=CANDIDATE_COUNT_CACHE_TTL)
+
+# Optional micro-batching of concurrent candidate inserts into unordered bulk inserts
+candidate_inserts = (
+    InsertBatcher(
+        lambda candidates: detect_candidate_context().insert_many(candidates),
+        max_delay_ms=CANDIDATE_BATCH_WINDOW_MS,
+        max_batch=CANDIDATE_BATCH_SIZE,
+    )
+    if CANDIDATE_BATCH_WINDOW_MS > 0
+    else None
+)
+
+# MinHash/LSH fingerprints stored on candidates to find near-duplicates
+candidate_dedup = MinHashLSH(threshold=DEDUP_THRESHOLD)
+
+# Writes attempted by a patch refreshing the fingerprint while the candidate keeps changing, before giving up
+PATCH_FINGERPRINT_ATTEMPTS = 3
+
+# City coordinates stored on candidates when they are written, for searches by distance
+gazetteer = Gazetteer(GAZETTEER_PATH)
+
+# Responses of create requests replayed to retries sent with the same Idempotency-Key
+idempotent_requests = IdempotentRequests(
+    SECRET_KEY, ttl_seconds=IDEMPOTENCY_TTL_HOURS * 60 * 60
+)
+
+# Columnar (Parquet) snapshots of the candidate collection for analytics
+candidate_snapshots = SnapshotStore(
+    SNAPSHOT_DIR,
+    row_group_size=SNAPSHOT_ROW_GROUP_SIZE,
+    keep=SNAPSHOTS_KEPT,
+    settle_seconds=CHANGE_FEED_SETTLE_SECONDS,
+)
+
+# Queries that ran out of time budget or whose client disconnected
+query_budgets = BudgetMetrics()
+
+# Columns of the CSV report, computed once instead of on every report
+REPORT_FIELDS = list(Candidate.model_json_schema()["properties"].keys())
+
+# Incremental feed of the candidate changes for downstream sync
+change_feed = ChangeFeed(
+    settle_seconds=CHANGE_FEED_SETTLE_SECONDS, retention_seconds=TOMBSTONE_TTL_SECONDS
+)
+
+# Saved searches matched against every written candidate, recording new matches
+percolator = Percolator(
+    lambda search: SavedSearch.model_validate(search).to_filters(),
+    CANDIDATE_SUMMARY_PROJECTION,
+    refresh_interval=SAVED_SEARCH_REFRESH_SECONDS,
+    settle_seconds=CHANGE_FEED_SETTLE_SECONDS,
+)
+
+# Dependency probes of this worker, served by /health/ready from the last snapshot
+health_prober = HealthProber(
+    (lambda: detect_db_client().admin.command("ping"))
+    if STORAGE_BACKEND != "memory"
+    else None,
+    pool_usage=POOL_USAGE,
+    interval=HEALTH_PROBE_INTERVAL,
+    timeout=HEALTH_PING_TIMEOUT,
+    max_loop_lag_ms=HEALTH_MAX_LOOP_LAG_MS,
+)
+
+# Verified token payloads and revoked token versions, so authorization needs no DB hit
+token_cache = TokenCache(max_size=TOKEN_CACHE_SIZE)
+revoked_tokens = RevocationFilter(refresh_interval=REVOCATION_REFRESH_SECONDS)
+
+
+def detect_db_client():
+    """
+    Detects the DB client based on the production environment.
+
+    Returns:
+    - CLIENT for production.
+    - TEST_CLIENT for testing.
+    """
+    if PRODUCTION == "true":
+        return CLIENT
+    else:
+        return TEST_CLIENT
+
 
 def detect_user_context():
     """
     Detects the user context based on the production environment.
 
     Returns:
-    - USERS collection for production.
-    - TEST_USERS collection for testing.
+    - USERS repository for production.
+    - TEST_USERS repository for testing.
     """
     if PRODUCTION == "true":
         return USERS
@@ -51,13 +223,29 @@ def detect_user_context():
         return TEST_USERS
 
 
+def invalidate_candidate_caches():
+    """
+    Drop the cached candidate lists and counts after a candidate write.
+    """
+    candidate_queries.invalidate()
+    candidate_counts.invalidate()
+
+
+def end_session(session):
+    """
+    End a session started by a repository's `causal_session`, if any.
+    """
+    if session is not None:
+        session.end_session()
+
+
 def detect_candidate_context():
     """
     Detects the candidate context based on the production environment.
 
     Returns:
-    - CANDIDATES collection for production.
-    - TEST_CANDIDATES collection for testing.
+    - CANDIDATES repository for production.
+    - TEST_CANDIDATES repository for testing.
     """
     if PRODUCTION == "true":
         return CANDIDATES
@@ -65,6 +253,34 @@ def detect_candidate_context():
         return TEST_CANDIDATES
 
 
+def detect_idempotency_context():
+    """
+    Detects the idempotency key store based on the production environment.
+
+    Returns:
+    - IDEMPOTENCY_KEYS store for production.
+    - TEST_IDEMPOTENCY_KEYS store for testing.
+    """
+    if PRODUCTION == "true":
+        return IDEMPOTENCY_KEYS
+    else:
+        return TEST_IDEMPOTENCY_KEYS
+
+
+def detect_saved_search_context():
+    """
+    Detects the saved search store based on the production environment.
+
+    Returns:
+    - SAVED_SEARCHES store for production.
+    - TEST_SAVED_SEARCHES store for testing.
+    """
+    if PRODUCTION == "true":
+        return SAVED_SEARCHES
+    else:
+        return TEST_SAVED_SEARCHES
+
+
 async def authorize_user(token: Annotated[str, Depends(oauth2_scheme)]):
     """
     Authorizes a user based on the provided JWT token.
@@ -76,7 +292,7 @@ async def authorize_user(token: Annotated[str, Depends(oauth2_scheme)]):
     - The user's email if the token is valid and the user exists.
 
     Raises:
-    - HTTPException 401 UNAUTHORIZED: If the token is invalid or the user does not exist.
+    - HTTPException 401 UNAUTHORIZED: If the token is invalid, revoked, or the user does not exist.
     """
 
     # Define an exception for credentials validation failure
@@ -86,22 +302,37 @@ async def authorize_user(token: Annotated[str, Depends(oauth2_scheme)]):
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        # Decode the JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-
-        # Check if email is present in the token
-        if email is None:
+    # Skip signature verification for hot tokens already verified
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            # Decode the JWT token
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            # Raise exception if decoding fails
             raise credentials_exception
+        token_cache.put(token, payload)
+
+    email: str = payload.get("sub")
 
-    except JWTError:
-        # Raise exception if decoding fails
+    # Check if email is present in the token
+    if email is None:
         raise credentials_exception
 
-    # Query the user collection to check if the user exists
-    user_collection = detect_user_context()
-    user = user_collection.find_one({"email": email})
+    user_repository = detect_user_context()
+    annotate(user=email)
+
+    # Fast path: tokens carrying the user id and token version only need the revocation check (a stale revocation
+    # snapshot is refreshed in the background)
+    user_id = payload.get("uid")
+    if user_id is not None:
+        revoked_tokens.maybe_refresh(user_repository)
+        if revoked_tokens.is_revoked(user_id, payload.get("ver", 0)):
+            raise credentials_exception
+        return email
+
+    # Query the users to check if the user exists (tokens issued before versioning)
+    user = user_repository.get_by_email(email)
 
     # Raise exception if user is not found
     if not user:
@@ -111,6 +342,24 @@ async def authorize_user(token: Annotated[str, Depends(oauth2_scheme)]):
     return user["email"]
 
 
+async def authorize_admin(user_email: str = Depends(authorize_user)):
+    """
+    Authorizes an admin user based on the provided JWT token.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - The admin's email.
+
+    Raises:
+    - HTTPException 403 FORBIDDEN: If the user is not listed in ADMIN_EMAILS.
+    """
+    if user_email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return user_email
+
+
 @router.get(
     "/health", response_description="Health Check", status_code=status.HTTP_200_OK
 )
@@ -124,52 +373,181 @@ def health_check():
     return {"status": "ok"}
 
 
+@router.get(
+    "/health/live", response_description="Liveness", status_code=status.HTTP_200_OK
+)
+async def liveness():
+    """
+    Endpoint for checking that the worker is alive (its event loop answers), regardless of its dependencies.
+
+    Returns:
+    - JSON response indicating the status as "ok".
+    """
+    return {"status": "ok"}
+
+
+@router.get(
+    "/health/ready",
+    response_description="Readiness",
+    status_code=status.HTTP_200_OK,
+    responses={503: {"description": "Not ready"}},
+)
+async def readiness():
+    """
+    Endpoint for checking that the worker can serve traffic.
+
+    It serves the last snapshot of the background prober instead of probing, so frequent checks from load
+    balancers cost nothing and never reach the DB.
+
+    Returns:
+    - JSON response with the status, the reasons the worker is not ready, the snapshot age, the DB ping
+      latency, the connection pool and threadpool usage and the event loop lag.
+    - 503 status code if the worker is not ready.
+    """
+    ready, snapshot = health_prober.readiness()
+    return JSONResponse(
+        content=snapshot,
+        status_code=(
+            status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
+
+
+@router.get(
+    "/metrics/candidate-queries",
+    response_description="Candidate query coalescing metrics",
+    status_code=status.HTTP_200_OK,
+)
+def candidate_query_metrics(user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for reporting how many /all-candidates queries were coalesced.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - JSON response with executed, collapsed and cached query counts, and the same for total counts.
+    """
+    return {**candidate_queries.stats(), "counts": candidate_counts.stats()}
+
+
+@router.get(
+    "/metrics/query-budgets",
+    response_description="Query time budget metrics",
+    status_code=status.HTTP_200_OK,
+)
+def query_budget_metrics(user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for reporting the queries that ran out of time budget or were cancelled.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - JSON response with the configured budgets and the timeout and cancellation counts per operation.
+    """
+    return {"budgets_ms": QUERY_BUDGETS_MS, "operations": query_budgets.stats()}
+
+
+@router.get(
+    "/metrics/idempotency",
+    response_description="Idempotency key metrics",
+    status_code=status.HTTP_200_OK,
+)
+def idempotency_metrics(user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for reporting how many keyed create requests were executed, replayed or coalesced.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - JSON response with the executed, replayed, coalesced, mismatched and in progress request counts.
+    """
+    return idempotent_requests.stats()
+
+
+@router.get(
+    "/metrics/saved-searches",
+    response_description="Saved search matching metrics",
+    status_code=status.HTTP_200_OK,
+)
+def saved_search_metrics(user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for reporting how written candidates were matched against the saved searches.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - JSON response with the indexed (and unanchored) searches, and the candidates matched, searches tested,
+      matches found and recording errors counts.
+    """
+    return percolator.stats()
+
+
 @router.post(
     "/user",
     response_description="Create a user",
     status_code=status.HTTP_201_CREATED,
     response_model=User,
 )
-def create_user(request: Request, user: User = Body(...)):
+def create_user(
+    request: Request,
+    response: Response,
+    user: User = Body(...),
+    idempotency_key: str = Header(None),
+):
     """
     Endpoint for creating a user.
 
     Args:
     - request: FastAPI request object.
+    - response: FastAPI response object.
     - user: User model for the new user.
+    - idempotency_key: Optional key making retries replay the first response instead of creating the user again.
 
     Returns:
     - JSON response containing the created user.
     """
-    try:
-        user_collection = detect_user_context()
 
-        existing_emails = [
-            entry["email"] for entry in user_collection.find({}, {"email": 1})
-        ]
-        if user.email in existing_emails:
+    def create():
+        try:
+            user_repository = detect_user_context()
+
+            # Fail fast on taken emails (the unique index still guards against races)
+            if user_repository.get_by_email(user.email):
+                return JSONResponse(
+                    content={"detail": "Email must be unique"}, status_code=400
+                )
+
+            # Hash the provided password before storing in the database
+            user.set_password(user.hashed_password)
+
+            # Convert User model to a dictionary
+            user_dict = jsonable_encoder(user)
+
+            # Insert the user into the database
+            created_user = user_repository.insert(user_dict)
+            return created_user
+        except DuplicateKeyError:
             return JSONResponse(
                 content={"detail": "Email must be unique"}, status_code=400
             )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
 
-        # Hash the provided password before storing in the database
-        user.set_password(user.hashed_password)
-
-        # Convert User model to a dictionary
-        user_dict = jsonable_encoder(user)
-
-        # Insert the user into the database
-        new_user = request.app.database["user"].insert_one(user_dict)
-        created_user = request.app.database["user"].find_one(
-            {"_id": new_user.inserted_id}
-        )
-        return created_user
-    except DuplicateKeyError:
-        return JSONResponse(content={"detail": "Email must be unique"}, status_code=400)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
-        )
+    if not idempotency_key:
+        return create()
+    return idempotent_requests.run(
+        detect_idempotency_context(),
+        idempotency_key,
+        "POST /user",
+        user.model_dump(mode="json", exclude_unset=True),
+        lambda: as_response(create(), response, User, status.HTTP_201_CREATED),
+    )
 
 
 @router.post("/token")
@@ -188,8 +566,8 @@ def generate_token(auth: Auth):
     """
 
     # Validate user credentials
-    user_collection = detect_user_context()
-    user = user_collection.find_one({"email": auth.email})
+    user_repository = detect_user_context()
+    user = user_repository.get_by_email(auth.email)
     if user is None or not (user.get("password")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -208,11 +586,35 @@ def generate_token(auth: Auth):
     # Generate and return the JWT token
     email = auth.email
     access_token = auth.create_access_token(
-        data={"sub": email}
+        data={
+            "sub": email,
+            "uid": user["_id"],
+            "ver": user.get(TOKEN_VERSION_FIELD, 0),
+        }
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_tokens(user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for revoking all the tokens issued so far to the current user.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - Empty response once the token version was bumped.
+    """
+    user = detect_user_context().bump_token_version(user_email)
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    # Apply locally right away, other workers catch up on their next refresh
+    revoked_tokens.revoke(user["_id"], user[TOKEN_VERSION_FIELD])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.post(
     "/candidate",
     response_description="Create a candidate",
@@ -220,48 +622,87 @@ def generate_token(auth: Auth):
     response_model=Candidate,
 )
 def create_candidate(
-    request: Request, candidate: Candidate, user_email: str = Depends(authorize_user)
+    request: Request,
+    response: Response,
+    candidate: Candidate,
+    user_email: str = Depends(authorize_user),
+    idempotency_key: str = Header(None),
 ):
     """
     Endpoint for creating a candidate.
 
     Args:
     - request: FastAPI request object.
+    - response: FastAPI response object, used to set the ETag header.
     - candidate: Candidate model for the new candidate.
     - user_email: User's email obtained from the Token Authentication.
+    - idempotency_key: Optional key making retries replay the first response instead of creating the candidate again.
 
     Returns:
     - JSON response containing the created candidate.
+    - 409 Conflict if the candidate looks like a duplicate and DEDUP_ON_INSERT is "reject".
     """
-    user_collection = detect_user_context()
-    user = user_collection.find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
 
-    try:
-        candidate_collection = detect_candidate_context()
-        existing_emails = [
-            entry["email"] for entry in candidate_collection.find({}, {"email": 1})
-        ]
-        if candidate.email in existing_emails:
-            raise DuplicateKeyError("Email must be unique")
-
-        candidate_dict = jsonable_encoder(candidate)
-        new_candidate = candidate_collection.insert_one(candidate_dict)
-        created_candidate = candidate_collection.find_one(
-            {"_id": new_candidate.inserted_id}
-        )
-        return created_candidate
-    except DuplicateKeyError:
-        return JSONResponse(
-            content={"detail": "Email must be unique"},
-            status_code=status.HTTP_400_BAD_REQUEST,
-        )
-    except Exception as e:
-        return JSONResponse(
-            content={"detail": str(e)},
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+    def create():
+        try:
+            candidate_repository = detect_candidate_context()
+
+            # Duplicate emails are rejected by the unique email index
+            candidate_dict = jsonable_encoder(candidate)
+
+            # Near-duplicates (same person, other email) are found through their shared LSH bands
+            candidate_dict.update(candidate_dedup.fingerprint(candidate_dict))
+            candidate_dict.update(gazetteer.location(candidate_dict["city"]))
+            duplicates = []
+            if DEDUP_ON_INSERT != "off":
+                duplicates = candidate_dedup.find_duplicates(
+                    candidate_dict, candidate_repository
+                )
+                if duplicates and DEDUP_ON_INSERT == "reject":
+                    return JSONResponse(
+                        content={
+                            "detail": "Candidate looks like a duplicate",
+                            "duplicates": duplicates,
+                        },
+                        status_code=status.HTTP_409_CONFLICT,
+                    )
+
+            if candidate_inserts is not None:
+                created_candidate = candidate_inserts.submit(candidate_dict)
+            else:
+                created_candidate = candidate_repository.insert(candidate_dict)
+            invalidate_candidate_caches()
+            percolator.percolate(detect_saved_search_context(), [created_candidate])
+            annotate(candidate_id=created_candidate["_id"])
+            response.headers["ETag"] = candidate_etag(
+                created_candidate["_id"], created_candidate[REVISION_FIELD]
+            )
+            if duplicates:
+                response.headers["X-Possible-Duplicates"] = ",".join(
+                    duplicate["_id"] for duplicate in duplicates
+                )
+            return created_candidate
+        except DuplicateKeyError:
+            return JSONResponse(
+                content={"detail": "Email must be unique"},
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            return JSONResponse(
+                content={"detail": str(e)},
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    if not idempotency_key:
+        return create()
+    # Keys are scoped per user, so that users never get each other's responses
+    return idempotent_requests.run(
+        detect_idempotency_context(),
+        idempotency_key,
+        f"POST /candidate\n{user_email}",
+        candidate.model_dump(mode="json", exclude_unset=True),
+        lambda: as_response(create(), response, Candidate, status.HTTP_201_CREATED),
+    )
 
 
 @router.get(
@@ -271,28 +712,43 @@ def create_candidate(
     response_model=Candidate,
 )
 def get_candidate(
-    request: Request, candidate_id: str, user_email: str = Depends(authorize_user)
+    request: Request,
+    response: Response,
+    candidate_id: str,
+    user_email: str = Depends(authorize_user),
+    if_none_match: str = Header(None),
 ):
     """
     Endpoint for retrieving a candidate by ID.
 
     Args:
     - request: FastAPI request object.
+    - response: FastAPI response object, used to set the ETag header.
     - candidate_id: ID of the candidate to be retrieved.
     - user_email: User's email obtained from the Token Authentication.
+    - if_none_match: ETag of the client's cached copy, if any.
 
     Returns:
     - JSON response containing the retrieved candidate.
+    - 304 Not Modified if the client's cached copy is still current.
     """
-    user_collection = detect_user_context()
-    candidate_collection = detect_candidate_context()
-
-    user = user_collection.find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
-    candidate = candidate_collection.find_one({"_id": candidate_id})
+    candidate_repository = detect_candidate_context()
+
+    if if_none_match:
+        # Only the revision is sent back, the full candidate is only read for stale copies
+        revision = candidate_repository.get(candidate_id, {"_id": 1, REVISION_FIELD: 1})
+        if revision:
+            etag = candidate_etag(candidate_id, revision.get(REVISION_FIELD, 0))
+            if etag_matches(if_none_match, etag):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+                )
+
+    candidate = candidate_repository.get(candidate_id)
     if candidate:
+        response.headers["ETag"] = candidate_etag(
+            candidate_id, candidate.get(REVISION_FIELD, 0)
+        )
         return candidate
     else:
         raise HTTPException(
@@ -307,6 +763,7 @@ def get_candidate(
     response_model=Candidate,
 )
 def update_candidate(
+    response: Response,
     candidate_id: str,
     candidate: Candidate,
     user_email: str = Depends(authorize_user),
@@ -315,6 +772,7 @@ def update_candidate(
     Endpoint for updating a candidate by ID.
 
     Args:
+    - response: FastAPI response object, used to set the ETag header.
     - candidate_id: ID of the candidate to be updated.
     - candidate: Updated Candidate model.
     - user_email: User's email obtained from the Token Authentication.
@@ -322,22 +780,20 @@ def update_candidate(
     Returns:
     - JSON response containing the updated candidate.
     """
-    user_collection = detect_user_context()
-    candidate_collection = detect_candidate_context()
-
-    user = user_collection.find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    candidate_repository = detect_candidate_context()
 
     update_data = {
         key: value for key, value in jsonable_encoder(candidate).items() if key != "_id"
     }
-    updated_candidate = candidate_collection.find_one_and_update(
-        {"_id": candidate_id},
-        {"$set": update_data},
-        return_document=True,
-    )
+    update_data.update(candidate_dedup.fingerprint(update_data))
+    update_data.update(gazetteer.location(update_data["city"]))
+    updated_candidate = candidate_repository.update(candidate_id, {"$set": update_data})
+    invalidate_candidate_caches()
     if updated_candidate:
+        percolator.percolate(detect_saved_search_context(), [updated_candidate])
+        response.headers["ETag"] = candidate_etag(
+            candidate_id, updated_candidate[REVISION_FIELD]
+        )
         return updated_candidate
     else:
         raise HTTPException(
@@ -345,6 +801,95 @@ def update_candidate(
         )
 
 
+@router.patch(
+    "/candidate/{candidate_id}",
+    response_description="Partially update a candidate by ID",
+    status_code=status.HTTP_200_OK,
+    response_model=Candidate,
+)
+def patch_candidate(
+    response: Response,
+    candidate_id: str,
+    patch: CandidatePatch,
+    user_email: str = Depends(authorize_user),
+    if_match: str = Header(None),
+):
+    """
+    Endpoint for partially updating a candidate by ID.
+
+    Args:
+    - response: FastAPI response object, used to set the ETag header.
+    - candidate_id: ID of the candidate to be updated.
+    - patch: Fields to change, plus optional skills to add or remove.
+    - user_email: User's email obtained from the Token Authentication.
+    - if_match: ETag the update is conditional on, if any.
+
+    Returns:
+    - JSON response containing the updated candidate.
+
+    Raises:
+    - HTTPException 400 BAD REQUEST: If the patch is invalid or the email is taken.
+    - HTTPException 404 NOT FOUND: If the candidate does not exist.
+    - HTTPException 412 PRECONDITION FAILED: If the candidate changed since the If-Match ETag.
+    """
+    candidate_repository = detect_candidate_context()
+
+    try:
+        update = patch.to_update()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if "city" in update["$set"]:
+        update["$set"].update(gazetteer.location(update["$set"]["city"]))
+
+    # Check the revision in the same atomic write to avoid lost updates
+    revisions = if_match_revisions(if_match, candidate_id) if if_match else None
+    changed = {field for fields in update.values() for field in fields}
+    for _ in range(PATCH_FINGERPRINT_ATTEMPTS):
+        write, write_revisions = update, revisions
+        # Refresh the fingerprint in the same write when fingerprinted fields change, computed from the revision
+        # it patches (retried if another write got in between)
+        if changed & set(FINGERPRINT_FIELDS):
+            current = candidate_repository.get(
+                candidate_id,
+                {**dict.fromkeys(FINGERPRINT_FIELDS, 1), REVISION_FIELD: 1},
+            )
+            if current and (revisions is None or current[REVISION_FIELD] in revisions):
+                fingerprint = candidate_dedup.fingerprint(apply_update(current, update))
+                write = {**update, "$set": {**update["$set"], **fingerprint}}
+                write_revisions = [current[REVISION_FIELD]]
+        try:
+            updated_candidate = candidate_repository.update(
+                candidate_id, write, write_revisions
+            )
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Email must be unique"
+            )
+        if updated_candidate or write_revisions is revisions:
+            break
+    invalidate_candidate_caches()
+
+    if updated_candidate:
+        percolator.percolate(detect_saved_search_context(), [updated_candidate])
+        response.headers["ETag"] = candidate_etag(
+            candidate_id, updated_candidate[REVISION_FIELD]
+        )
+        return updated_candidate
+
+    current = candidate_repository.get(candidate_id, {"_id": 1, REVISION_FIELD: 1})
+    if current:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Candidate was modified by another request",
+            headers={
+                "ETag": candidate_etag(candidate_id, current.get(REVISION_FIELD, 0))
+            },
+        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="Candidate not found"
+    )
+
+
 @router.delete(
     "/candidate/{candidate_id}",
     response_description="Delete a candidate by ID",
@@ -363,15 +908,11 @@ def delete_candidate(
     Returns:
     - JSON response indicating successful deletion or not found.
     """
-    user_collection = detect_user_context()
-    candidate_collection = detect_candidate_context()
-
-    user = user_collection.find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    candidate_repository = detect_candidate_context()
 
-    result = candidate_collection.delete_one({"_id": candidate_id})
-    if result.deleted_count == 1:
+    deleted = candidate_repository.delete(candidate_id)
+    invalidate_candidate_caches()
+    if deleted:
         return JSONResponse(
             content={"detail": "Candidate deleted successfully"},
             status_code=status.HTTP_204_NO_CONTENT,
@@ -382,13 +923,78 @@ def delete_candidate(
         )
 
 
+def total_count_headers(
+    candidate_repository,
+    filters: dict,
+    mode: str,
+    budget: QueryBudget,
+    operation: str = "list",
+) -> dict:
+    """
+    Count the candidates matching a filter, for the headers of a list response.
+
+    Counts are cached for a few seconds and shared between concurrent requests, so paging through a list does
+    not count it again on every page. Approximate counts of filtered lists stop at `CANDIDATE_COUNT_LIMIT`.
+
+    Args:
+    - candidate_repository: Repository holding the candidates.
+    - filters: Filter document of the list.
+    - mode: "exact", "approximate" or "none".
+    - budget: Budget of the count, separate from the list's so a slow count never delays the list.
+    - operation: Name of the read operation used to pick its read preference.
+
+    Returns:
+    - The `X-Total-Count` and `X-Total-Count-Relation` ("eq", or "gte" when the count stopped at its limit)
+      headers, or no header if counting is disabled, ran out of budget or failed.
+    """
+    if mode == "none":
+        return {}
+    limit = CANDIDATE_COUNT_LIMIT if mode == "approximate" and filters else 0
+    try:
+        total = candidate_counts.do(
+            f"{limit}:{canonical_filter_key(filters)}",
+            lambda: candidate_repository.count(
+                filters, limit=limit, operation=operation, budget=budget
+            ),
+        )
+    except ExecutionTimeout:
+        # The list itself is still served, only without its total
+        query_budgets.record("count", "timeouts")
+        return {}
+    except OperationFailure:
+        return {}
+    return {
+        "X-Total-Count": str(total),
+        "X-Total-Count-Relation": "gte" if limit and total >= limit else "eq",
+    }
+
+
 @router.get(
     "/all-candidates",
-    response_description="Get all candidates",
-    response_model=List[Candidate],
+    response_description="Get all candidates (summaries, or full candidates with view=full)",
+    response_model=List[CandidateSummary],
 )
-def get_all_candidates(
+async def get_all_candidates(
+    request: Request,
     user_email: str = Depends(authorize_user),
+    if_none_match: str = Header(None),
+    accept: str = Header(None),
+    x_request_timeout_ms: str = Header(None),
+    stream: bool = Query(
+        False, description="Stream the JSON array instead of buffering it"
+    ),
+    view: Literal["summary", "full"] = Query(
+        "summary", description="Return candidate summaries, or full candidates"
+    ),
+    page: int = Query(
+        None, gt=0, description="Page number for pagination (all candidates if unset)"
+    ),
+    page_size: int = Query(50, gt=0, le=1000, description="Items per page"),
+    count: Literal["exact", "approximate", "none"] = Query(
+        None,
+        description="Total count returned in `X-Total-Count`: exact, capped, or none "
+        "(exact by default for pages, none for streams)",
+    ),
     _id: str = Query(None, title="UUID", description="Filter by UUID"),
     first_name: str = Query(
         None, title="First Name", description="Filter by first name"
@@ -415,12 +1021,35 @@ def get_all_candidates(
     keywords: str = Query(
         None, title="Keywords", description="Global search using keywords"
     ),
+    near: str = Query(
+        None,
+        title="Near",
+        description="Search around a city, or a latitude,longitude pair (nearest first)",
+    ),
+    radius_km: float = Query(
+        GEO_DEFAULT_RADIUS_KM,
+        gt=0,
+        le=20000,
+        title="Radius",
+        description="Search radius around `near`, in kilometers",
+    ),
 ):
     """
     Endpoint for retrieving all candidates with optional filters.
 
     Args:
+    - request: FastAPI request object, used to detect client disconnects.
     - user_email: User's email obtained from the Token Authentication.
+    - if_none_match: ETag of the client's cached copy, if any.
+    - accept: Accept header, `application/x-ndjson` streams one candidate per line.
+    - x_request_timeout_ms: Caller's remaining time budget, shortening the query's budget.
+    - stream: Stream the JSON array while reading the cursor instead of buffering it.
+    - view: "summary" (default) for compact candidate summaries, "full" for full candidates.
+    - page: Page number, all matching candidates are returned if unset.
+    - page_size: Number of candidates per page.
+    - count: "exact" total count (default for pages), "approximate" to stop counting filtered lists at
+      `CANDIDATE_COUNT_LIMIT`, or "none" to skip counting (default for streams). Unpaginated lists are not
+      counted, their total is their length.
     - _id: Filter by candidate UUID.
     - first_name: Filter by candidate first name.
     - last_name: Filter by candidate last name.
@@ -435,104 +1064,242 @@ def get_all_candidates(
     - salary: Filter by candidate salary.
     - gender: Filter by candidate gender.
     - keywords: Global search using keywords.
+    - near: Only return candidates around this city (or `latitude,longitude`), nearest first.
+    - radius_km: Search radius around `near`, in kilometers.
 
     Returns:
-    - List of candidates matching the specified filters.
-    """
-    user_collection = detect_user_context()
-    candidate_collection = detect_candidate_context()
-
-    user = user_collection.find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    - List of candidate summaries (or full candidates) matching the specified filters (streamed as NDJSON or a
+      chunked JSON array on request), with their total count in the `X-Total-Count` header.
+    - 304 Not Modified if the client's cached copy is still current.
 
-    filters = {}
-    # Add filters for each field
+    Raises:
+    - HTTPException 400 BAD REQUEST: If `near` is neither a known city nor valid coordinates.
+    - HTTPException 504 GATEWAY TIMEOUT: If the query ran out of its time budget.
+    """
+    candidate_repository = detect_candidate_context()
+
+    # Query parameters were already validated
+    filters = CandidateFilters.model_construct(
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        career_level=career_level,
+        job_major=job_major,
+        years_of_experience=years_of_experience,
+        degree_type=degree_type,
+        skills=skills,
+        nationality=nationality,
+        city=city,
+        salary=salary,
+        gender=gender,
+        keywords=keywords,
+    ).to_filters()
     if _id:
         filters["_id"] = _id
-    if first_name:
-        filters["first_name"] = first_name
-    if last_name:
-        filters["last_name"] = last_name
-    if email:
-        filters["email"] = email
-    if career_level:
-        filters["career_level"] = career_level
-    if job_major:
-        filters["job_major"] = job_major
-    if years_of_experience is not None:
-        filters["years_of_experience"] = years_of_experience
-    if degree_type:
-        filters["degree_type"] = degree_type
-    if skills:
-        filters["skills"] = {"$all": skills}
-    if nationality:
-        filters["nationality"] = nationality
-    if city:
-        filters["city"] = city
-    if salary is not None:
-        filters["salary"] = salary
-    if gender:
-        filters["gender"] = gender
-
-    # Add global search using keywords
-    if keywords:
-        global_search_filters = {
-            "$or": [
-                {"_id": {"$regex": keywords, "$options": "i"}},
-                {"first_name": {"$regex": keywords, "$options": "i"}},
-                {"last_name": {"$regex": keywords, "$options": "i"}},
-                {"email": {"$regex": keywords, "$options": "i"}},
-                {"career_level": {"$regex": keywords, "$options": "i"}},
-                {"job_major": {"$regex": keywords, "$options": "i"}},
-                {"years_of_experience": {"$regex": str(keywords), "$options": "i"}},
-                {"degree_type": {"$regex": keywords, "$options": "i"}},
-                {"nationality": {"$regex": keywords, "$options": "i"}},
-                {"city": {"$regex": keywords, "$options": "i"}},
-                {"skills": {"$in": [keywords]}},
-                {"gender": {"$regex": keywords, "$options": "i"}},
-                {"salary": {"$regex": str(keywords), "$options": "i"}},
-            ]
-        }
-        filters["$or"] = global_search_filters["$or"]
+    if near:
+        # Answered by the 2dsphere index on the candidate locations, nearest first
+        try:
+            filters.update(near_filter(gazetteer.parse_near(near), radius_km))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Summaries are read through a projection and encoded without per-row validation
+    if view == "summary":
+        projection, model = CANDIDATE_SUMMARY_PROJECTION, None
+    else:
+        projection, model = None, Candidate
+
+    skip, limit = ((page - 1) * page_size, page_size) if page else (0, 0)
+
+    # Keyword and distance searches are read with the "search" read preference, plain lists with the "list" one
+    operation = "search" if keywords or near else "list"
+
+    # The version and the list are read in one causally consistent session, so the list is never older than the
+    # version its ETag is built from, even when they are served by different members
+    session = candidate_repository.causal_session()
+    streaming = False
+    ndjson = accepts(accept, NDJSON_MEDIA_TYPE)
+    media_type = NDJSON_MEDIA_TYPE if ndjson else "application/json"
+    try:
+        # The list ETag changes whenever any candidate write commits, and differs per representation (the
+        # JSON array and NDJSON bodies are not byte-identical), which caches tell apart through `Vary: Accept`
+        filter_key = (
+            f"{media_type}:{view}:{skip}:{limit}:{canonical_filter_key(filters)}"
+        )
+        etag = list_etag(
+            await run_in_threadpool(
+                candidate_repository.current_version, operation, session
+            ),
+            filter_key,
+        )
+        if etag_matches(if_none_match, etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Vary": "Accept"},
+            )
+
+        budget = QueryBudget("list", QUERY_BUDGETS_MS["list"], x_request_timeout_ms)
+        # Counts run with their own budget, so a slow count only drops the total instead of the list
+        count_budget = QueryBudget(
+            "count", QUERY_BUDGETS_MS["count"], x_request_timeout_ms
+        )
+        headers = {"ETag": etag, "Vary": "Accept"}
+
+        # Streamed responses encode candidates as they come out of the cursor, in constant memory. Their headers
+        # are sent before the first candidate, so they are only counted on request
+        if ndjson or stream:
+            headers.update(
+                await run_in_threadpool(
+                    total_count_headers,
+                    candidate_repository,
+                    filters,
+                    count or "none",
+                    count_budget,
+                    operation,
+                )
+            )
+            candidates = candidate_repository.iterate(
+                filters,
+                batch_size=CANDIDATE_STREAM_BATCH_SIZE,
+                operation=operation,
+                budget=budget,
+                projection=projection,
+                skip=skip,
+                limit=limit,
+                session=session,
+            )
+            encode = ndjson_lines if ndjson else json_array_chunks
+            chunks = encode(candidates, model, chunk_size=CANDIDATE_STREAM_BATCH_SIZE)
+            # The stream ends the session once the cursor is done with it
+            streaming = True
+            return StreamingResponse(
+                stream_query(
+                    chunks,
+                    budget,
+                    candidate_repository,
+                    query_budgets,
+                    on_close=lambda: end_session(session),
+                ),
+                media_type=media_type,
+                headers=headers,
+            )
 
-    result = candidate_collection.find(filters)
-    return list(result)
+        def encode_list() -> tuple:
+            candidates = candidate_repository.find(
+                filters,
+                skip=skip,
+                limit=limit,
+                operation=operation,
+                budget=budget,
+                projection=projection,
+                session=session,
+            )
+            return "".join(json_array_chunks(candidates, model)), len(candidates)
+
+        # Identical concurrent queries share a single DB call, and the encoding of its result. Queries are only
+        # shared at the same collection version (the ETag) and with the same budget, so no caller gets a list
+        # older than its ETag or inherits a shorter deadline
+        listing = run_query(
+            request,
+            budget,
+            candidate_repository,
+            query_budgets,
+            lambda: candidate_queries.do(
+                f"{budget.budget_ms}:{etag}",
+                encode_list,
+                # A leader whose client left kills the shared query, the followers still waiting run it again
+                retry_if=lambda error: isinstance(error, OperationFailure)
+                and error.code == INTERRUPTED
+                and not budget.cancelled.is_set(),
+            ),
+        )
+        if page:
+            # Pages are counted while the list is read
+            (body, _), total_count = await asyncio.gather(
+                listing,
+                run_in_threadpool(
+                    total_count_headers,
+                    candidate_repository,
+                    filters,
+                    count or "exact",
+                    count_budget,
+                    operation,
+                ),
+            )
+        else:
+            # Unpaginated lists hold every match, so their length is their total
+            body, length = await listing
+            total_count = (
+                {}
+                if count == "none"
+                else {"X-Total-Count": str(length), "X-Total-Count-Relation": "eq"}
+            )
+    except ExecutionTimeout:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Query exceeded its time budget, narrow down the filters",
+        )
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    finally:
+        if not streaming:
+            end_session(session)
+    headers.update(total_count)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/generate-report")
 async def generate_report(
+    request: Request,
     page: int = Query(1, gt=0, description="Page number for pagination"),
     page_size: int = Query(10, gt=0, le=100, description="Items per page"),
     user_email: str = Depends(authorize_user),
+    x_request_timeout_ms: str = Header(None),
 ):
     """
     Endpoint for generating a report of all candidates in CSV format.
 
     Args:
+    - request: FastAPI request object, used to detect client disconnects.
     - page: Page number for pagination (default: 1).
     - page_size: Items per page (default: 10, max: 100).
     - user_email: User's email obtained from the Token Authentication.
+    - x_request_timeout_ms: Caller's remaining time budget, shortening the query's budget.
 
     Returns:
     - StreamingResponse: CSV file containing candidate information.
-    """
 
-    user_collection = detect_user_context()
-    candidate_collection = detect_candidate_context()
+    Raises:
+    - HTTPException 504 GATEWAY TIMEOUT: If the query ran out of its time budget.
+    """
 
-    user = user_collection.find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    candidate_repository = detect_candidate_context()
 
     # Calculate skip and limit based on pagination parameters
     skip = (page - 1) * page_size
     limit = page_size
 
-    # Fetch candidates based on pagination
-    candidates = list(candidate_collection.find().skip(skip).limit(limit))
+    # Fetch candidates based on pagination, off the event loop and within the report's time budget
+    budget = QueryBudget("report", QUERY_BUDGETS_MS["report"], x_request_timeout_ms)
+    try:
+        candidates = await run_query(
+            request,
+            budget,
+            candidate_repository,
+            query_budgets,
+            lambda: candidate_repository.find(
+                skip=skip, limit=limit, operation="report", budget=budget
+            ),
+        )
+    except ExecutionTimeout:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Query exceeded its time budget",
+        )
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
 
-    header = Candidate.model_json_schema()["properties"].keys()
+    header = REPORT_FIELDS
 
     def generate_csv():
         yield ",".join(header) + "\n"
@@ -549,3 +1316,214 @@ async def generate_report(
     )
 
     return response
+
+
+@router.get("/candidates/snapshot")
+async def export_candidates_snapshot(
+    since: int = Query(
+        0, ge=0, description="Only export candidates written after this revision"
+    ),
+    user_email: str = Depends(authorize_user),
+):
+    """
+    Endpoint for exporting the candidate collection as a columnar snapshot (Parquet).
+
+    Args:
+    - since: Only export candidates written after this revision (default: 0, the whole collection).
+      Pass the `X-Snapshot-Revision` of the previous snapshot to get an incremental one.
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - StreamingResponse: Parquet file, read through a memory map, with the revision it was taken at in the
+      `X-Snapshot-Revision` header.
+    """
+    candidate_repository = detect_candidate_context()
+
+    # The export reads the whole cursor and writes the file, off the event loop
+    snapshot, revision = await run_in_threadpool(
+        candidate_snapshots.export, candidate_repository, since
+    )
+    return StreamingResponse(
+        mapped_chunks(snapshot),
+        media_type=PARQUET_MEDIA_TYPE,
+        headers={
+            "Content-Length": str(os.fstat(snapshot.fileno()).st_size),
+            "Content-Disposition": f'attachment; filename="{os.path.basename(snapshot.name)}"',
+            "X-Snapshot-Revision": str(revision),
+        },
+    )
+
+
+@router.get("/candidates/changes")
+def candidate_changes(
+    checkpoint: str = Query(
+        None, description="Checkpoint returned by the previous page"
+    ),
+    since: int = Query(
+        0, ge=0, description="Revision to start from without a checkpoint"
+    ),
+    limit: int = Query(1000, gt=0, le=10000, description="Number of changes"),
+    user_email: str = Depends(authorize_user),
+):
+    """
+    Endpoint for reading the candidate inserts, updates and deletes after a checkpoint, for downstream sync.
+
+    Args:
+    - checkpoint: Checkpoint returned by the previous page.
+    - since: Revision to start from without a checkpoint (default: 0, the whole collection), e.g. the
+      `X-Snapshot-Revision` of a snapshot.
+    - limit: Maximum number of changes per page (default: 1000, max: 10000).
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - JSON response with the changes in revision order, the checkpoint of the next page, whether more changes
+      are known and the seconds to wait before asking for the next page.
+
+    Raises:
+    - HTTPException 400 BAD REQUEST: If the checkpoint is malformed.
+    - HTTPException 410 GONE: If the checkpoint is older than the tombstones (resync from a snapshot).
+    """
+    try:
+        page = change_feed.page(detect_candidate_context(), checkpoint, since, limit)
+    except CheckpointExpired as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return JSONResponse(content=page)
+
+
+@router.post(
+    "/saved-searches",
+    response_description="Save a candidate search",
+    status_code=status.HTTP_201_CREATED,
+    response_model=SavedSearch,
+)
+def create_saved_search(search: SavedSearch, user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for saving a candidate search, matched against every candidate written from now on.
+
+    Args:
+    - search: Name and filters of the search (same filters as /all-candidates).
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - JSON response containing the saved search.
+
+    Raises:
+    - HTTPException 400 BAD REQUEST: If the search has no filter, or its keywords are not a valid pattern.
+    """
+    if not search.to_filters():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A saved search needs at least one filter",
+        )
+    # Keywords are matched as a pattern against every written candidate
+    if search.keywords:
+        try:
+            re.compile(search.keywords)
+        except re.error as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid keywords pattern: {e}",
+            )
+    search_dict = {
+        **search.model_dump(by_alias=True, exclude_none=True),
+        "user_email": user_email,
+    }
+    saved_search = detect_saved_search_context().insert(search_dict)
+    percolator.add(saved_search)
+    return saved_search
+
+
+@router.get(
+    "/saved-searches",
+    response_description="List the saved searches",
+    status_code=status.HTTP_200_OK,
+    response_model=List[SavedSearch],
+)
+def list_saved_searches(user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for listing the user's saved searches.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - JSON response containing the user's saved searches.
+    """
+    return detect_saved_search_context().find(user_email)
+
+
+@router.get(
+    "/saved-searches/matches",
+    response_description="New matches of the saved searches",
+    status_code=status.HTTP_200_OK,
+)
+def saved_search_matches(
+    user_email: str = Depends(authorize_user),
+    after: str = Query("", description="Cursor returned by the previous call"),
+    search_id: str = Query(None, description="Only the matches of this search"),
+    limit: int = Query(100, gt=0, le=1000, description="Number of matches"),
+):
+    """
+    Endpoint for fetching the candidates that newly matched the user's saved searches.
+
+    Candidates are matched when they are created or updated, and each candidate is reported once per search
+    (the first time it matches). Passing back the returned cursor only fetches the newer matches, from an
+    index, instead of re-running the searches. Matches are served once settled, when every match recorded
+    before them has committed, so a cursor never moves past a match still being recorded.
+
+    Args:
+    - user_email: User's email obtained from the Token Authentication.
+    - after: Cursor returned by the previous call (omit to fetch all matches).
+    - search_id: Only return the matches of this saved search.
+    - limit: Maximum number of matches (default: 100, max: 1000).
+
+    Returns:
+    - JSON response with the matches (search ID, candidate summary at the time of the match and match time),
+      oldest first, and the cursor to pass to the next call.
+    """
+    recorded_before = datetime.now(timezone.utc) - timedelta(
+        seconds=percolator.settle_seconds
+    )
+    matches = detect_saved_search_context().find_matches(
+        user_email, after, search_id, limit, recorded_before
+    )
+    return {
+        "matches": [
+            {
+                "search_id": match["search_id"],
+                "candidate": match["candidate"],
+                "matched_at": match["matched_at"],
+            }
+            for match in matches
+        ],
+        "cursor": matches[-1]["cursor"] if matches else after,
+    }
+
+
+@router.delete(
+    "/saved-searches/{search_id}",
+    response_description="Delete a saved search",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+def delete_saved_search(search_id: str, user_email: str = Depends(authorize_user)):
+    """
+    Endpoint for deleting a saved search and its matches.
+
+    Args:
+    - search_id: ID of the saved search to be deleted.
+    - user_email: User's email obtained from the Token Authentication.
+
+    Returns:
+    - 204 No Content if deleted.
+
+    Raises:
+    - HTTPException 404 NOT FOUND: If the user has no saved search with this ID.
+    """
+    if not detect_saved_search_context().delete(user_email, search_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Saved search not found"
+        )
+    percolator.remove(search_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,76 @@
+"""
+This module is the production entry point of the application.
+
+It runs the application in several worker processes (one per available core by default) without the reloader.
+Workers are spawned, not forked from a preloaded parent: the DB client is created when the application is
+imported and is not fork-safe, so each worker imports the application, opens its own connections and runs its
+warm-up in the lifespan, and only starts accepting connections once it is ready. On SIGTERM or SIGINT, a worker
+stops accepting connections, lets in-flight requests finish for up to the graceful shutdown timeout, then closes
+its DB connections and flushes its access log.
+
+Usage:
+    python -m app.serve [--host 0.0.0.0] [--port 8000] [--workers N] [--graceful-shutdown-seconds 30]
+"""
+
+import argparse
+import os
+import uvicorn
+from dotenv import dotenv_values
+
+
+def available_cores() -> int:
+    """
+    Return the number of cores this process may run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main():
+    # Read directly, so that the supervisor does not import the application and connect to the DB
+    config = dotenv_values(".env")
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(config.get("WEB_CONCURRENCY") or available_cores()),
+    )
+    parser.add_argument(
+        "--graceful-shutdown-seconds",
+        type=int,
+        default=int(config.get("GRACEFUL_SHUTDOWN_SECONDS") or 30),
+    )
+    parser.add_argument(
+        "--no-warm-up",
+        action="store_true",
+        help="Accept connections without warming workers up (to measure cold starts)",
+    )
+    args = parser.parse_args()
+
+    # Inherited by the spawned workers
+    if args.no_warm_up:
+        os.environ["SKIP_WARM_UP"] = "1"
+    if args.workers > 1:
+        # Each worker writes and rotates its own access and slow query logs
+        os.environ["PER_WORKER_LOGS"] = "1"
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        # A worker whose lifespan startup fails exits instead of serving unprepared
+        lifespan="on",
+        timeout_graceful_shutdown=args.graceful_shutdown_seconds,
+        # Requests are logged by the application's access log
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+This module benchmarks the overhead of the access log middleware on a request.
+
+It calls a minimal ASGI app directly (no HTTP server, so the middleware's cost is not hidden by network noise), with
+and without the access log middleware, and reports the added time per request for several sample rates. Records are
+written to a temporary file by the background writer.
+
+Usage:
+    python -m benchmarks.bench_access_log [--requests 50000] [--sample-rates 1 0.1]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from app.internal.access_log import AccessLog, AccessLogMiddleware
+
+
+async def endpoint(scope, receive, send):
+    """
+    Minimal ASGI app answering every request with an empty JSON object.
+    """
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def run(app, requests: int) -> float:
+    """
+    Send requests to an ASGI app one after the other, returning the elapsed seconds.
+    """
+    scope = {"type": "http", "method": "GET", "path": "/health", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--sample-rates", type=float, nargs="+", default=[1, 0.1])
+    args = parser.parse_args()
+
+    # Warm up, then measure the bare app as the baseline
+    asyncio.run(run(endpoint, 1000))
+    baseline = asyncio.run(run(endpoint, args.requests))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for sample_rate in args.sample_rates:
+            path = os.path.join(directory, f"access-{sample_rate}.log")
+            access_log = AccessLog(path, sample_rate=sample_rate)
+            app = AccessLogMiddleware(endpoint, access_log)
+            asyncio.run(run(app, 1000))
+            elapsed = asyncio.run(run(app, args.requests))
+            access_log.stop()
+
+            overhead_us = (elapsed - baseline) / args.requests * 1e6
+            print(
+                f"sample rate {sample_rate:>4}: +{overhead_us:6.1f} us/request"
+                f"  ({args.requests / elapsed:>8.0f} requests/s)  {access_log.stats()}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+This module benchmarks candidate inserts with and without micro-batching.
+
+It runs many concurrent writers against a candidate repository, either the in-memory engine simulating a remote
+DB, or a real MongoDB, and reports throughput and latency percentiles.
+
+Usage:
+    python -m benchmarks.bench_candidate_inserts [--requests 5000] [--writers 64] [--window-ms 5] [--batch 100]
+                                                 [--rtt-ms 1] [--call-ms 0.2] [--document-us 10]
+                                                 [--mongo-uri URI]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+from app.internal.batching import InsertBatcher
+from app.internal.memory import MemoryCandidateRepository
+from app.internal.repository import MongoCandidateRepository
+
+
+class SimulatedRepository(MemoryCandidateRepository):
+    """
+    In-memory repository simulating a remote DB: every call pays a network round trip (in parallel), then a
+    per-request server overhead and a per-document write cost (serialized, like a busy primary).
+    """
+
+    def __init__(self, rtt_ms: float, call_ms: float, document_us: float):
+        super().__init__()
+        self.rtt = rtt_ms / 1000
+        self.call = call_ms / 1000
+        self.document = document_us / 1000000
+        self._server = threading.Lock()
+
+    def _round_trip(self, documents: int):
+        time.sleep(self.rtt)
+        with self._server:
+            time.sleep(self.call + self.document * documents)
+
+    def insert(self, candidate: dict) -> dict:
+        self._round_trip(1)
+        return super().insert(candidate)
+
+    def insert_many(self, candidates: list) -> list:
+        self._round_trip(len(candidates))
+        results = []
+        for candidate in candidates:
+            try:
+                results.append(MemoryCandidateRepository.insert(self, candidate))
+            except DuplicateKeyError as e:
+                results.append(e)
+        return results
+
+
+def make_candidate(index: int) -> dict:
+    return {
+        "_id": str(uuid4()),
+        "first_name": "Bench",
+        "last_name": str(index),
+        # Every 50th request reuses an email to exercise per-row duplicate errors
+        "email": f"bench{index - index % 50 if index % 50 == 49 else index}@example.com",
+        "career_level": "Senior",
+        "job_major": "Computer Science",
+        "years_of_experience": index % 10,
+        "degree_type": "Bachelor",
+        "skills": ["Python"],
+        "nationality": "JO",
+        "city": "Amman",
+        "salary": 1000.0,
+        "gender": "Not Specified",
+    }
+
+
+def run(insert, requests: int, writers: int) -> dict:
+    latencies = []
+    duplicates = []
+
+    def write(index: int):
+        started = time.perf_counter()
+        try:
+            insert(make_candidate(index))
+        except DuplicateKeyError:
+            duplicates.append(index)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(write, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "duplicates": len(duplicates),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--rtt-ms", type=float, default=1)
+    parser.add_argument("--call-ms", type=float, default=0.2)
+    parser.add_argument("--document-us", type=float, default=10)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--mongo-uri", default=None)
+    args = parser.parse_args()
+
+    def repository():
+        if args.mongo_uri:
+            client = MongoClient(args.mongo_uri)
+            client.drop_database("bench_candidate_inserts")
+            mongo = MongoCandidateRepository(client["bench_candidate_inserts"])
+            mongo.ensure_indexes()
+            return mongo
+        return SimulatedRepository(args.rtt_ms, args.call_ms, args.document_us)
+
+    direct = run(repository().insert, args.requests, args.writers)
+    batched_repository = repository()
+    batcher = InsertBatcher(
+        batched_repository.insert_many,
+        max_delay_ms=args.window_ms,
+        max_batch=args.batch,
+    )
+    batched = run(batcher.submit, args.requests, args.writers)
+
+    for name, result in (("direct", direct), ("batched", batched)):
+        print(
+            f"{name:>8}: {result['throughput']:>9.0f} inserts/s"
+            f"  p50 {result['p50_ms']:6.2f} ms  p99 {result['p99_ms']:6.2f} ms"
+            f"  duplicates {result['duplicates']}"
+        )
+    print(f"batches: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
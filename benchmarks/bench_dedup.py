@@ -0,0 +1,113 @@
+"""
+This module benchmarks the near-duplicate candidate clustering.
+
+It generates synthetic candidates, a share of which are re-submissions of an earlier candidate with another email
+and a small spelling change, then clusters growing collections to show the near-linear scaling, and reports the
+recall and precision of the found duplicate pairs.
+
+Usage:
+    python -m benchmarks.bench_dedup [--sizes 10000 20000 40000] [--duplicates 0.05] [--threshold 0.6]
+"""
+
+import argparse
+import itertools
+import random
+import time
+from uuid import uuid4
+
+from app.internal.dedup import MinHashLSH
+
+
+# Names are built from syllables, so that the name pool is about as diverse as real data
+SYLLABLES = (
+    "ma mo ha sa la na ra da ya ka za fa ta ba wa mi li ri di hi ni si mu hu nu ru am an al ar"
+).split()
+CITIES = [f"City {number}" for number in range(60)]
+MAJORS = [f"Major {number}" for number in range(40)]
+SKILLS = [f"Skill {number}" for number in range(150)]
+
+
+def random_name(rng: random.Random) -> str:
+    """
+    Generate a random name of two to four syllables.
+    """
+    return "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize()
+
+
+def generate(size: int, duplicate_share: float, rng: random.Random):
+    """
+    Generate candidates and the set of true duplicate pairs among them.
+    """
+    candidates = []
+    people = {}
+    for _ in range(size):
+        if candidates and rng.random() < duplicate_share:
+            original = rng.choice(candidates)
+            candidate = {**original, "_id": str(uuid4())}
+            # Drop or swap a letter of the last name, as re-typed by another partner
+            name = candidate["last_name"]
+            position = rng.randrange(1, len(name))
+            candidate["last_name"] = (
+                name[:position] + rng.choice("aeiouy") + name[position + 1 :]
+            )
+            people[candidate["_id"]] = people[original["_id"]]
+        else:
+            candidate = {
+                "_id": str(uuid4()),
+                "first_name": random_name(rng),
+                "last_name": random_name(rng),
+                "city": rng.choice(CITIES),
+                "job_major": rng.choice(MAJORS),
+                "skills": rng.sample(SKILLS, rng.randint(2, 5)),
+            }
+            people[candidate["_id"]] = candidate["_id"]
+        candidates.append(candidate)
+
+    groups = {}
+    for candidate_id, person in people.items():
+        groups.setdefault(person, []).append(candidate_id)
+    pairs = {
+        frozenset(pair)
+        for group in groups.values()
+        for pair in itertools.combinations(group, 2)
+    }
+    return candidates, pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 20000, 40000])
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    args = parser.parse_args()
+
+    lsh = MinHashLSH(threshold=args.threshold)
+    for size in args.sizes:
+        candidates, pairs = generate(size, args.duplicates, random.Random(size))
+
+        started = time.perf_counter()
+        fingerprinted = [
+            {**candidate, **lsh.fingerprint(candidate)} for candidate in candidates
+        ]
+        fingerprinting = time.perf_counter() - started
+
+        started = time.perf_counter()
+        clusters = lsh.clusters(fingerprinted)
+        clustering = time.perf_counter() - started
+
+        found = {
+            frozenset(pair)
+            for cluster in clusters
+            for pair in itertools.combinations(cluster, 2)
+        }
+        recall = len(found & pairs) / len(pairs) if pairs else 1.0
+        precision = len(found & pairs) / len(found) if found else 1.0
+        print(
+            f"{size:>9} candidates: fingerprint {fingerprinting:6.2f} s"
+            f"  cluster {clustering:6.2f} s ({clustering / size * 1e6:5.1f} us/candidate)"
+            f"  clusters {len(clusters):>6}  recall {recall:.3f}  precision {precision:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
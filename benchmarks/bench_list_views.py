@@ -0,0 +1,98 @@
+"""
+This module benchmarks the candidate summary list view against the full one.
+
+It fills the in-memory engine with candidates stored the way the API stores them (with their revision and
+near-duplicate fingerprint), then reads and encodes the whole list as `/all-candidates` does, once with the
+summary projection and once with full candidates. It reports the BSON bytes read from the DB, the JSON bytes sent
+over the wire and the CPU time per row.
+
+Usage:
+    python -m benchmarks.bench_list_views [--candidates 20000] [--rounds 5]
+"""
+
+import argparse
+import random
+import time
+import bson
+
+from app.internal.dedup import MinHashLSH
+from app.internal.memory import MemoryCandidateRepository
+from app.internal.models import Candidate, CANDIDATE_SUMMARY_PROJECTION
+from app.internal.streaming import json_array_chunks
+
+
+CITIES = ["Amman", "Irbid", "Zarqa", "Aqaba", "Salt", "Madaba"]
+MAJORS = ["Computer Science", "Mathematics", "Physics", "History", "Accounting"]
+SKILLS = ["Python", "Go", "Java", "SQL", "Excel", "Writing", "Docker", "React"]
+
+
+def make_candidate(index: int, rng: random.Random) -> dict:
+    """
+    Generate a candidate document.
+    """
+    return {
+        "_id": f"{index:08d}-0000-4000-8000-000000000000",
+        "first_name": f"First{index}",
+        "last_name": f"Last{index}",
+        "email": f"candidate{index}@example.com",
+        "career_level": rng.choice(["Junior", "Senior", "Lead"]),
+        "job_major": rng.choice(MAJORS),
+        "years_of_experience": rng.randint(0, 30),
+        "degree_type": rng.choice(["Bachelor", "Master", "PhD"]),
+        "skills": rng.sample(SKILLS, rng.randint(2, 5)),
+        "nationality": rng.choice(["JO", "US", "EG"]),
+        "city": rng.choice(CITIES),
+        "salary": float(rng.randint(500, 5000)),
+        "gender": rng.choice(["Male", "Female", "Not Specified"]),
+    }
+
+
+def measure(repository, projection, model, rounds: int):
+    """
+    Read and encode the whole list `rounds` times, returning the DB bytes, wire bytes and seconds per round.
+    """
+    documents = repository.find(projection=projection)
+    db_bytes = sum(len(bson.encode(document)) for document in documents)
+
+    started = time.process_time()
+    for _ in range(rounds):
+        body = "".join(json_array_chunks(repository.find(projection=projection), model))
+    elapsed = (time.process_time() - started) / rounds
+    return db_bytes, len(body.encode()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--candidates", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lsh = MinHashLSH()
+    repository = MemoryCandidateRepository()
+    for index in range(args.candidates):
+        candidate = make_candidate(index, rng)
+        repository.insert({**candidate, **lsh.fingerprint(candidate)})
+
+    results = {}
+    for view, projection, model in (
+        ("full", None, Candidate),
+        ("summary", CANDIDATE_SUMMARY_PROJECTION, None),
+    ):
+        results[view] = measure(repository, projection, model, args.rounds)
+        db_bytes, wire_bytes, elapsed = results[view]
+        print(
+            f"{view:>8}: {db_bytes / args.candidates:7.0f} DB bytes/row"
+            f"  {wire_bytes / args.candidates:5.0f} wire bytes/row"
+            f"  {elapsed / args.candidates * 1e6:6.2f} us/row"
+        )
+
+    full, summary = results["full"], results["summary"]
+    print(
+        f"summary saves {1 - summary[0] / full[0]:.0%} DB bytes,"
+        f" {1 - summary[1] / full[1]:.0%} wire bytes and {1 - summary[2] / full[2]:.0%} CPU per row"
+    )
+
+
+if __name__ == "__main__":
+    main()
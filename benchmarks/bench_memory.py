@@ -0,0 +1,234 @@
+"""
+This module benchmarks the peak memory of the large-response endpoints.
+
+It fills the in-memory engine with candidates, then requests each endpoint from the application served by uvicorn
+over the whole collection, reading the response in chunks like a client: the `/all-candidates` list (summaries and
+full candidates, buffered and streamed), the last `/generate-report` page and a `/candidates/snapshot` export. Each
+request is served in a forked child of the filled process, so it starts from the same memory state, and the child
+reports two peaks above that state (server and client side, the client only holds one chunk at a time):
+
+- RSS: resident memory sampled every few milliseconds, including native allocations (e.g. Arrow buffers).
+- Python: peak of the Python allocations traced by tracemalloc (measured in another child, tracing inflates RSS).
+
+Results can be saved with `--output` and checked against a previous run with `--baseline`, which fails when a peak
+grew by more than `--tolerance`, so memory regressions are caught before deploy. Needs Linux (fork and /proc), and
+`STORAGE_BACKEND=memory` in `.env`.
+
+Usage:
+    python -m benchmarks.bench_memory [--rows 10000 100000 1000000] [--output memory.json]
+        [--baseline memory.json] [--tolerance 0.1]
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import uvicorn
+from fastapi.testclient import TestClient
+
+from app.internal.profiling import rss_bytes
+from app.internal.settings import QUERY_BUDGETS_MS, STORAGE_BACKEND
+from app.internal.snapshots import SnapshotStore
+from app.main import app
+from app.routers import routes
+from benchmarks.bench_list_views import make_candidate
+from benchmarks.bench_startup import free_port
+
+
+# Peaks under this many bytes above the baseline are noise, never regressions
+NOISE_BYTES = 2 * 1024 * 1024
+
+# Path requested by each scenario, given the number of candidates
+SCENARIOS = {
+    "list_summary": lambda rows: "/all-candidates",
+    "list_full": lambda rows: "/all-candidates?view=full",
+    "list_full_streamed": lambda rows: "/all-candidates?view=full&stream=true",
+    "report_page": lambda rows: f"/generate-report?page={max(-(-rows // 100), 1)}&page_size=100",
+    "snapshot_export": lambda rows: "/candidates/snapshot",
+}
+
+
+def log_in() -> str:
+    """
+    Sign a benchmark user up and log it in, returning its access token.
+    """
+    client = TestClient(app)
+    credentials = {"email": "bench-memory@example.com", "password": "password"}
+    client.post(
+        "/user", json={"first_name": "Bench", "last_name": "User", **credentials}
+    )
+    response = client.post("/token", json=credentials)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def read_response(port: int, path: str, token: str) -> int:
+    """
+    Request a path and read the response in chunks, returning the number of bytes read.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        connection.request("GET", path, headers={"Authorization": f"Bearer {token}"})
+        response = connection.getresponse()
+        if response.status >= 400:
+            raise RuntimeError(
+                f"GET {path} returned {response.status}: {response.read(200)}"
+            )
+        size = 0
+        while chunk := response.read(64 * 1024):
+            size += len(chunk)
+        return size
+    finally:
+        connection.close()
+
+
+def _peak_rss(request) -> int:
+    baseline = peak = rss_bytes()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.005):
+            peak = max(peak, rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        request()
+    finally:
+        done.set()
+        sampler.join()
+    return max(peak, rss_bytes()) - baseline
+
+
+def _peak_python(request) -> int:
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        request()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def _child(measure, path, token, connection):
+    with tempfile.TemporaryDirectory() as directory:
+        # Snapshots of this run only, written without waiting for in-flight writes
+        routes.candidate_snapshots = SnapshotStore(directory, settle_seconds=0)
+        port = free_port()
+        server = uvicorn.Server(
+            uvicorn.Config(
+                app, port=port, lifespan="off", log_level="warning", access_log=False
+            )
+        )
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        try:
+            connection.send(measure(lambda: read_response(port, path, token)))
+        finally:
+            server.should_exit = True
+            thread.join()
+    connection.close()
+
+
+def in_child(measure, path, token) -> int:
+    """
+    Serve and measure a request in a forked child, so it starts from the memory state of the filled process.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(measure, path, token, sender))
+    process.start()
+    # Only the child holds the sending end, so its exit without a result ends the wait
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        raise RuntimeError(f"The child exited without a result ({path})")
+    finally:
+        process.join()
+    return result
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Return the peaks that grew by more than `tolerance` over the baseline (ignoring noise-sized peaks).
+    """
+    found = []
+    for key, peaks in results.items():
+        for kind, peak in peaks.items():
+            previous = baseline.get(key, {}).get(kind)
+            if previous is not None and peak > max(
+                previous * (1 + tolerance), NOISE_BYTES
+            ):
+                found.append(
+                    f"{key} {kind}: {previous / 2**20:.1f} MB -> {peak / 2**20:.1f} MB"
+                )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--output", help="Save the peaks to this JSON file")
+    parser.add_argument("--baseline", help="Fail if peaks grew over this JSON file's")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if STORAGE_BACKEND != "memory":
+        parser.error("needs STORAGE_BACKEND=memory in .env")
+    # Whole-collection lists and reports run past the production time budgets
+    QUERY_BUDGETS_MS.update(list=0, report=0)
+
+    # The application's candidates, grown from one row count to the next
+    repository = routes.detect_candidate_context()
+    token = log_in()
+    rng = random.Random(0)
+    results = {}
+    for rows in sorted(args.rows):
+        started = time.perf_counter()
+        for index in range(repository.collection.count(), rows):
+            repository.insert(make_candidate(index, rng))
+        print(
+            f"{rows} candidates loaded in {time.perf_counter() - started:.1f} s,"
+            f" RSS {rss_bytes() / 2**20:.0f} MB"
+        )
+        for name in args.scenarios:
+            path = SCENARIOS[name](rows)
+            peaks = {
+                "rss_bytes": in_child(_peak_rss, path, token),
+                "python_bytes": in_child(_peak_python, path, token),
+            }
+            results[f"{name}@{rows}"] = peaks
+            print(
+                f"{name:>20}: {peaks['rss_bytes'] / 2**20:8.1f} MB RSS"
+                f"  {peaks['python_bytes'] / 2**20:8.1f} MB Python"
+                f"  {peaks['python_bytes'] / rows:7.0f} Python bytes/row"
+            )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            found = regressions(results, json.load(baseline), args.tolerance)
+        for regression in found:
+            print(f"regression: {regression}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+This module benchmarks the start-up of a production worker, with and without its warm-up.
+
+It starts `python -m app.serve` with a single worker on a free port, measures the time until the worker accepts
+connections (time-to-ready), then the latency of the first and second calls of a few endpoints: signing up and
+logging in (password hashing), listing candidates, generating the report and reading the OpenAPI schema.
+
+The production entry point reads `.env`, which needs `PRODUCTION=True`. Use `STORAGE_BACKEND=memory` to run it
+without a DB.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 3]
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import subprocess
+import sys
+import time
+
+
+def free_port() -> int:
+    """
+    Return a port nothing listens on.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(
+    port: int, process: subprocess.Popen, timeout: float = 60
+) -> float:
+    """
+    Wait until the server accepts connections, returning the seconds waited.
+    """
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with code {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError("The server did not start")
+
+
+def timed_request(connection, method: str, path: str, body=None, token=None):
+    """
+    Send a request, returning its latency in milliseconds and its body.
+    """
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    started = time.perf_counter()
+    connection.request(
+        method,
+        path,
+        body=json.dumps(body) if body is not None else None,
+        headers=headers,
+    )
+    response = connection.getresponse()
+    payload = response.read()
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status >= 400:
+        raise RuntimeError(
+            f"{method} {path} returned {response.status}: {payload[:200]}"
+        )
+    return elapsed, payload
+
+
+def first_requests(port: int, run: int) -> dict:
+    """
+    Call each endpoint twice, returning the first and second latencies by endpoint.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = {}
+    for attempt in range(2):
+        email = f"bench-{run}-{attempt}@example.com"
+        user = {
+            "first_name": "Bench",
+            "last_name": "User",
+            "email": email,
+            "password": "password",
+        }
+        credentials = {"email": email, "password": "password"}
+        calls = [
+            ("sign up", "POST", "/user", user),
+            ("log in", "POST", "/token", credentials),
+            ("list candidates", "GET", "/all-candidates", None),
+            ("report", "GET", "/generate-report", None),
+            ("openapi", "GET", "/openapi.json", None),
+        ]
+        token = None
+        for name, method, path, body in calls:
+            elapsed, payload = timed_request(connection, method, path, body, token)
+            if path == "/token":
+                token = json.loads(payload)["access_token"]
+            latencies.setdefault(name, []).append(elapsed)
+    connection.close()
+    return latencies
+
+
+def measure(warm_up: bool, run: int) -> tuple:
+    """
+    Start a server, returning its time-to-ready in milliseconds and the latencies of its first requests.
+    """
+    port = free_port()
+    command = [sys.executable, "-m", "app.serve", "--port", str(port), "--workers", "1"]
+    if not warm_up:
+        command.append("--no-warm-up")
+    process = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        ready = wait_until_ready(port, process) * 1000
+        return ready, first_requests(port, run)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for warm_up in (False, True):
+        readies, latencies = [], {}
+        for run in range(args.runs):
+            ready, run_latencies = measure(warm_up, run)
+            readies.append(ready)
+            for name, (first, second) in run_latencies.items():
+                latencies.setdefault(name, []).append((first, second))
+
+        print(f"{'warm' if warm_up else 'cold'} start: {min(readies):7.1f} ms to ready")
+        for name, runs in latencies.items():
+            first = min(first for first, _ in runs)
+            second = min(second for _, second in runs)
+            print(
+                f"{name:>16}: {first:7.1f} ms first call  {second:7.1f} ms second call"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+This module backfills the derived fields of the candidates written before those fields existed.
+
+Candidates are stamped with their revision (`_rev`), their near-duplicate fingerprint (`_minhash` and `_lsh`) and
+their location (`_location`) when they are written, so candidates stored before each of these was introduced lack
+them: they are missing from the change feed and the incremental snapshots, from duplicate detection and from
+searches by distance. The backfill rewrites each of them once through the repository, which stamps a new revision,
+and only while the candidate is unchanged, so a concurrent write is never overwritten with stale fields.
+
+It reads `.env` like the application, and backfills the production candidates when `PRODUCTION=True`, the testing
+ones otherwise. Run it once after deploying, it is safe to run again.
+
+Usage:
+    python -m scripts.backfill [--batch-size 500]
+"""
+
+import argparse
+
+from app.internal.dedup import FINGERPRINT_FIELDS, SIGNATURE_FIELD, MinHashLSH
+from app.internal.geo import LOCATION_FIELD, Gazetteer
+from app.internal.revisions import REVISION_FIELD
+from app.internal.settings import (
+    CANDIDATES,
+    DEDUP_THRESHOLD,
+    GAZETTEER_PATH,
+    PRODUCTION,
+    TEST_CANDIDATES,
+)
+
+
+# Candidates missing any of the fields derived at write time
+MISSING_FIELDS_FILTER = {
+    "$or": [
+        {field: {"$exists": False}}
+        for field in (REVISION_FIELD, SIGNATURE_FIELD, LOCATION_FIELD)
+    ]
+}
+
+
+def backfill_candidates(
+    candidate_repository, dedup: MinHashLSH, gazetteer: Gazetteer, batch_size: int = 500
+) -> dict:
+    """
+    Stamp the candidates missing a revision, fingerprint or location with them.
+
+    Candidates are read in batches from the primary and each one is updated only if its revision did not change
+    since it was read (a candidate without a revision only while it still has none). Candidates written
+    concurrently are left to the next batch, which reads them again.
+
+    Args:
+    - candidate_repository: Repository holding the candidates.
+    - dedup: Near-duplicate index computing the fingerprints, configured as the application's.
+    - gazetteer: Gazetteer resolving the candidate cities, configured as the application's.
+    - batch_size: Number of candidates read per batch.
+
+    Returns:
+    - The number of candidates updated, and of updates skipped because the candidate changed meanwhile.
+    """
+    projection = {**dict.fromkeys(FINGERPRINT_FIELDS, 1), REVISION_FIELD: 1}
+    updated = skipped = 0
+    while True:
+        candidates = candidate_repository.find(
+            MISSING_FIELDS_FILTER, limit=batch_size, projection=projection
+        )
+        batch_updated = 0
+        for candidate in candidates:
+            fields = {
+                **dedup.fingerprint(candidate),
+                **gazetteer.location(candidate.get("city")),
+            }
+            # A missing revision compares equal to null, so unrevised candidates are only updated while unrevised
+            if candidate_repository.update(
+                candidate["_id"],
+                {"$set": fields},
+                revisions=[candidate.get(REVISION_FIELD)],
+            ):
+                batch_updated += 1
+            else:
+                skipped += 1
+        updated += batch_updated
+        # Stop once every candidate is stamped, or when the remaining ones keep changing under the backfill
+        if not batch_updated:
+            return {"updated": updated, "skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    candidate_repository = CANDIDATES if PRODUCTION == "true" else TEST_CANDIDATES
+    result = backfill_candidates(
+        candidate_repository,
+        MinHashLSH(threshold=DEDUP_THRESHOLD),
+        Gazetteer(GAZETTEER_PATH),
+        args.batch_size,
+    )
+    print(
+        f"{result['updated']} candidates backfilled, "
+        f"{result['skipped']} changed during the backfill"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,66 @@
 This module contains unit tests for the application.
 """
 
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
+from pymongo import MongoClient
+from pymongo.errors import ExecutionTimeout, OperationFailure
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 
-from app.internal.settings import TEST_CLIENT, TEST_DB, TEST_DB_NAME, PRODUCTION
+from app.internal.access_log import (
+    PER_WORKER_LOGS,
+    REQUEST_CONTEXT,
+    AccessLog,
+    AccessLogMiddleware,
+    DbTimer,
+    worker_log_path,
+)
+from app.internal.auth import TOKEN_VERSION_FIELD, RevocationFilter
+from app.internal.batching import InsertBatcher
+from app.internal.budgets import INTERRUPTED, QueryBudget
+from app.internal.change_feed import encode_checkpoint
+from app.internal.coalescing import SingleFlight
+from app.internal.dedup import SIGNATURE_FIELD
+from app.internal.health import HealthProber, PoolUsage
+from app.internal.idempotency import IdempotentRequests, MemoryIdempotencyStore
+from app.internal.read_routing import MemberUsage
+from app.internal.repository import MongoCandidateRepository
+from app.internal.revisions import REVISION_FIELD
+from app.internal.saved_searches import Percolator
+from app.internal.slow_queries import SlowQueryLog
+from app.internal.snapshots import SnapshotStore, mapped_chunks
+from app.internal.warmup import warm_up
+from app.internal.settings import (
+    CONFIG,
+    READ_PREFERENCES,
+    TEST_USERS,
+    TEST_CANDIDATES,
+    TEST_IDEMPOTENCY_KEYS,
+    TEST_SAVED_SEARCHES,
+    TEST_DB_NAME,
+    PRODUCTION,
+)
+from app.routers import routes
 from app.routers.routes import router
+from scripts.backfill import backfill_candidates
+from app.routers.admin import router as admin_router
 
 
 app = FastAPI()
 app.include_router(router)
+app.include_router(admin_router)
 
 # Prepare some helpers to persist values through the tests
 candidate_test_id = {"value": ""}
@@ -21,21 +71,17 @@ invalid_auth_headers = {"Authorization": f"Bearer {"SOME_INVALID_VALUE"}"}
 
 
 @pytest.fixture
-# Create Testing client to mock the behavior of the real application, and connect it to a testing DB
+# Create Testing client to mock the behavior of the real application, and connect it to the testing storage
+# (the testing DB, or the in-memory engine with STORAGE_BACKEND=memory)
 def test_app():
     with TestClient(app) as client:
         if PRODUCTION != "false":
             raise Exception("PLEASE DISABLE PRODUCTION ENVIRONMENT.")
-        app.mongodb_client = TEST_CLIENT
-        app.database = TEST_DB
 
         print(f"Connected to testing DB ({TEST_DB_NAME}) successfully.")
 
-        TEST_USERS = TEST_DB["user"]
-        TEST_CANDIDATES = TEST_DB["candidate"]
-
-        TEST_USERS.create_index([("email", 1)], unique=True)
-        TEST_CANDIDATES.create_index([("email", 1)], unique=True)
+        TEST_USERS.ensure_indexes()
+        TEST_CANDIDATES.ensure_indexes()
         yield client
 
 
@@ -47,6 +93,46 @@ def test_health_check(test_app):
     assert response.json() == {"status": "ok"}
 
 
+def test_health_probes(test_app):
+    response = test_app.get("/health/live")
+    assert response.status_code == 200
+
+    # Not ready until the prober ran (in the lifespan)
+    response = test_app.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+    asyncio.run(routes.health_prober.probe())
+    response = test_app.get("/health/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["db"]["ok"]
+    assert body["threadpool"]["size"] > 0
+
+    def unreachable():
+        raise ConnectionError("connection refused")
+
+    prober = HealthProber(unreachable)
+    asyncio.run(prober.probe())
+    ready, snapshot = prober.readiness()
+    assert not ready
+    assert snapshot["reasons"] == ["db unreachable"]
+    assert snapshot["db"]["error"] == "connection refused"
+
+    # Pool usage follows check outs and check ins
+    pool_usage = PoolUsage()
+    address = ("localhost", 27017)
+    pool_usage.pool_created(SimpleNamespace(address=address, options={"maxPoolSize": 4}))
+    for _ in range(3):
+        pool_usage.connection_check_out_started(SimpleNamespace(address=address))
+    for _ in range(2):
+        pool_usage.connection_checked_out(SimpleNamespace(address=address))
+    assert pool_usage.summary() == {"checked_out": 2, "waiting": 1, "saturation": 0.5}
+    pool_usage.connection_checked_in(SimpleNamespace(address=address))
+    assert pool_usage.summary()["checked_out"] == 1
+
+
 def test_create_user_unique_email(test_app):
     response = test_app.post(
         "/user",
@@ -196,6 +282,15 @@ def test_get_candidate(test_app):
     assert "last_name" in response.json()
     assert "email" in response.json()
 
+    # Test conditional GET with the returned ETag
+    etag = response.headers["etag"]
+    response = test_app.get(
+        f"/candidate/{candidate_test_id['value']}",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
 
 def test_update_candidate(test_app):
     candidate_data = {
@@ -236,6 +331,53 @@ def test_update_candidate(test_app):
     assert response.json()["email"] == "mark.doe@example.com"
 
 
+def test_patch_candidate(test_app):
+    # Test with invalid authorization
+    response = test_app.patch(
+        f"/candidate/{candidate_test_id['value']}",
+        json={"city": "Amman"},
+        headers=invalid_auth_headers,
+    )
+    assert response.status_code == 401
+
+    # Test a partial update with a skills operation
+    response = test_app.patch(
+        f"/candidate/{candidate_test_id['value']}",
+        json={"city": "Amman", "add_skills": ["Go", "Javascript"]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["city"] == "Amman"
+    assert response.json()["first_name"] == "Mark"
+    assert sorted(response.json()["skills"]) == ["Go", "Javascript"]
+    etag = response.headers["etag"]
+
+    # Test a conditional update with the current ETag
+    response = test_app.patch(
+        f"/candidate/{candidate_test_id['value']}",
+        json={"remove_skills": ["Go"]},
+        headers={**auth_headers, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["skills"] == ["Javascript"]
+
+    # Test a conflicting update with the stale ETag
+    response = test_app.patch(
+        f"/candidate/{candidate_test_id['value']}",
+        json={"city": "Irbid"},
+        headers={**auth_headers, "If-Match": etag},
+    )
+    assert response.status_code == 412
+
+    # Test an invalid patch
+    response = test_app.patch(
+        f"/candidate/{candidate_test_id['value']}",
+        json={"first_name": None},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+
+
 def test_delete_candidate(test_app):
 
     # Test with invalid authorization
@@ -251,7 +393,7 @@ def test_delete_candidate(test_app):
     assert response.status_code == 204
 
 
-def test_get_all_candidates(test_app):
+def test_get_all_candidates(test_app, monkeypatch):
     # Create test candidates
     test_app.post(
         "/candidate",
@@ -310,6 +452,14 @@ def test_get_all_candidates(test_app):
     assert response.status_code == 200
     assert response.json()[0]["first_name"] == "John"
 
+    # Test filtering on any of several genders
+    response = test_app.get(
+        "/all-candidates?gender=Female&gender=Not%20Specified&city=SF",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["first_name"] == "Jane"
+
     # Test global search with keywords and regular filters
     response = test_app.get(
         "/all-candidates?keywords=Doe&city=SF", headers=auth_headers
@@ -333,6 +483,520 @@ def test_get_all_candidates(test_app):
     assert response.status_code == 200
     assert response.json()[0]["first_name"] == "Jane"
 
+    # Test conditional GET, then invalidation by a write
+    etag = response.headers["etag"]
+    response = test_app.get(
+        f"/all-candidates?{query_string}",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    # The collection version only moves once the write has committed
+    repository = routes.detect_candidate_context()
+    collection = repository.collection
+    write_name = "insert_one" if hasattr(collection, "insert_one") else "insert"
+    write = getattr(collection, write_name)
+    versions_during_write = []
+
+    def observed_write(*args, **kwargs):
+        versions_during_write.append(repository.current_version("list"))
+        return write(*args, **kwargs)
+
+    monkeypatch.setattr(collection, write_name, observed_write)
+    version = repository.current_version("list")
+    test_app.post(
+        "/candidate",
+        json={
+            "first_name": "Jim",
+            "last_name": "Doe",
+            "email": "jim.doe@example.com",
+            "career_level": "Junior",
+            "job_major": "Physics",
+            "years_of_experience": 1,
+            "degree_type": "Bachelor",
+            "skills": ["C"],
+            "nationality": "US",
+            "city": "LA",
+            "salary": 50000.0,
+            "gender": "Male",
+        },
+        headers=auth_headers,
+    )
+    monkeypatch.undo()
+    assert versions_during_write == [version]
+    assert repository.current_version("list") == version + 1
+    response = test_app.get(
+        f"/all-candidates?{query_string}",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+    # Lists return candidate summaries by default, full candidates on demand
+    summary = response.json()[0]
+    summary_etag = response.headers["etag"]
+    assert set(summary) == {
+        "_id",
+        "first_name",
+        "last_name",
+        "email",
+        "career_level",
+        "job_major",
+        "years_of_experience",
+        "city",
+    }
+    response = test_app.get(
+        f"/all-candidates?{query_string}&view=full", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()[0] == {
+        **summary,
+        "degree_type": "Master",
+        "skills": ["JavaScript", "SQL"],
+        "nationality": "US",
+        "salary": 80000.0,
+        "gender": "Female",
+    }
+    assert response.headers["etag"] != summary_etag
+
+    response = test_app.get(
+        f"/all-candidates?{query_string}&view=full&stream=true", headers=auth_headers
+    )
+    assert response.json()[0]["skills"] == ["JavaScript", "SQL"]
+
+
+def test_get_all_candidates_streaming(test_app):
+    buffered = test_app.get("/all-candidates?last_name=Doe", headers=auth_headers)
+    assert buffered.status_code == 200
+    assert len(buffered.json()) > 0
+
+    # Test NDJSON, negotiated with the Accept header
+    response = test_app.get(
+        "/all-candidates?last_name=Doe",
+        headers={**auth_headers, "Accept": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    # Each representation has its own ETag
+    assert response.headers["etag"] != buffered.headers["etag"]
+    assert response.headers["vary"] == buffered.headers["vary"] == "Accept"
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == buffered.json()
+    response = test_app.get(
+        "/all-candidates?last_name=Doe",
+        headers={**auth_headers, "If-None-Match": buffered.headers["etag"]},
+    )
+    assert response.status_code == 304
+    response = test_app.get(
+        "/all-candidates?last_name=Doe",
+        headers={
+            **auth_headers,
+            "Accept": "application/x-ndjson",
+            "If-None-Match": buffered.headers["etag"],
+        },
+    )
+    assert response.status_code == 200
+
+    # Test the streamed JSON array, including an empty result
+    response = test_app.get(
+        "/all-candidates?last_name=Doe&stream=true", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json() == buffered.json()
+    assert response.headers["etag"] == buffered.headers["etag"]
+
+    response = test_app.get(
+        "/all-candidates?keywords=InvalidName&stream=true", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_candidate_snapshot(test_app, monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        routes, "candidate_snapshots", SnapshotStore(str(tmp_path), settle_seconds=0)
+    )
+
+    response = test_app.get("/candidates/snapshot", headers=invalid_auth_headers)
+    assert response.status_code == 401
+
+    # Test the full snapshot
+    response = test_app.get("/candidates/snapshot", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    snapshot = pq.ParquetFile(pa.BufferReader(response.content))
+    candidates = test_app.get("/all-candidates", headers=auth_headers).json()
+    assert snapshot.metadata.num_rows == len(candidates)
+    assert set(snapshot.read().column("_id").to_pylist()) == {
+        candidate["_id"] for candidate in candidates
+    }
+    revision = response.headers["x-snapshot-revision"]
+    assert snapshot.schema_arrow.metadata[b"revision"] == revision.encode()
+    city = snapshot.schema_arrow.get_field_index("city")
+    assert "RLE_DICTIONARY" in snapshot.metadata.row_group(0).column(city).encodings
+
+    # Test the incremental snapshot, only holding the candidates written since
+    response = test_app.patch(
+        f"/candidate/{candidates[0]['_id']}",
+        json={"city": "Madaba"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    response = test_app.get(
+        f"/candidates/snapshot?since={revision}", headers=auth_headers
+    )
+    assert response.status_code == 200
+    table = pq.read_table(pa.BufferReader(response.content))
+    assert table.column("_id").to_pylist() == [candidates[0]["_id"]]
+    assert table.column("city").to_pylist() == ["Madaba"]
+
+    # Unchanged collections reuse the existing snapshot files
+    test_app.get(f"/candidates/snapshot?since={revision}", headers=auth_headers)
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # Test that a write stamped up to the snapshot revision, still committing when the revision is read, is
+    # exported once settled
+    committed = []
+    repository = SimpleNamespace(
+        current_revision=lambda operation: 7,
+        iterate=lambda filters, batch_size, operation, projection: iter(committed),
+    )
+    writer = threading.Timer(
+        0.1, lambda: committed.append({"_id": "in-flight", REVISION_FIELD: 7})
+    )
+    writer.start()
+    store = SnapshotStore(str(tmp_path), keep=1, settle_seconds=0.5)
+    snapshot, revision = store.export(repository)
+    assert revision == 7
+    assert pq.read_table(snapshot).column("_id").to_pylist() == ["in-flight"]
+
+    # Test that a snapshot pruned by a later export can still be streamed, and is read from the primary
+    operations = []
+    repository.current_revision = lambda operation: operations.append(operation) or 8
+    store.settle_seconds = 0
+    streamed, _ = store.export(repository)
+    pruned, _ = store.export(repository, since=7)
+    assert not os.path.exists(streamed.name)
+    table = pq.read_table(pa.BufferReader(b"".join(mapped_chunks(streamed))))
+    assert table.column("_id").to_pylist() == ["in-flight"]
+    assert operations == [None, None]
+    snapshot.close()
+    pruned.close()
+
+
+def test_change_feed(test_app, monkeypatch):
+    monkeypatch.setattr(routes.change_feed, "settle_seconds", 0)
+    response = test_app.get("/candidates/changes", headers=invalid_auth_headers)
+    assert response.status_code == 401
+
+    # Start from the current revision, like after a snapshot
+    revision = routes.detect_candidate_context().current_revision()
+    response = test_app.get(
+        f"/candidates/changes?since={revision}", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["changes"] == []
+    checkpoint = response.json()["checkpoint"]
+
+    candidate_data = {
+        "first_name": "Change",
+        "last_name": "Feed",
+        "email": "change.feed@example.com",
+        "career_level": "Junior",
+        "job_major": "Computer Science",
+        "years_of_experience": 1,
+        "degree_type": "Bachelor",
+        "skills": ["SQL"],
+        "nationality": "JO",
+        "city": "Amman",
+        "salary": 900.0,
+        "gender": "Male",
+    }
+    kept_id = test_app.post(
+        "/candidate", json=candidate_data, headers=auth_headers
+    ).json()["_id"]
+    deleted_id = test_app.post(
+        "/candidate",
+        json={**candidate_data, "email": "deleted.feed@example.com"},
+        headers=auth_headers,
+    ).json()["_id"]
+    test_app.patch(
+        f"/candidate/{kept_id}", json={"city": "Irbid"}, headers=auth_headers
+    )
+    test_app.delete(f"/candidate/{deleted_id}", headers=auth_headers)
+
+    # Pages follow the revision order, with each candidate at its latest revision
+    response = test_app.get(
+        f"/candidates/changes?checkpoint={checkpoint}&limit=1", headers=auth_headers
+    )
+    page = response.json()
+    assert page["has_more"]
+    assert [change["op"] for change in page["changes"]] == ["insert"]
+    assert page["changes"][0]["candidate"]["_id"] == kept_id
+    assert page["changes"][0]["candidate"]["city"] == "Irbid"
+    assert "_rev" not in page["changes"][0]["candidate"]
+
+    response = test_app.get(
+        f"/candidates/changes?checkpoint={page['checkpoint']}&limit=1",
+        headers=auth_headers,
+    )
+    page = response.json()
+    assert page["changes"] == [
+        {"op": "delete", "revision": page["changes"][0]["revision"], "_id": deleted_id}
+    ]
+
+    response = test_app.get(
+        f"/candidates/changes?checkpoint={page['checkpoint']}", headers=auth_headers
+    )
+    page = response.json()
+    assert page["changes"] == []
+    assert not page["has_more"]
+
+    # Candidates delivered before are updates
+    test_app.patch(
+        f"/candidate/{kept_id}", json={"city": "Aqaba"}, headers=auth_headers
+    )
+    response = test_app.get(
+        f"/candidates/changes?checkpoint={page['checkpoint']}", headers=auth_headers
+    )
+    changes = response.json()["changes"]
+    assert [(change["op"], change["candidate"]["city"]) for change in changes] == [
+        ("update", "Aqaba")
+    ]
+
+    # Revisions allocated after the horizon are only served once settled
+    monkeypatch.setattr(routes.change_feed, "settle_seconds", 60)
+    checkpoint = response.json()["checkpoint"]
+    test_app.patch(
+        f"/candidate/{kept_id}", json={"city": "Salt"}, headers=auth_headers
+    )
+    response = test_app.get(
+        f"/candidates/changes?checkpoint={checkpoint}", headers=auth_headers
+    )
+    page = response.json()
+    assert page["changes"] == []
+    assert page["has_more"]
+    assert page["retry_after"] > 0
+
+    response = test_app.get(
+        "/candidates/changes?checkpoint=not-a-checkpoint", headers=auth_headers
+    )
+    assert response.status_code == 400
+
+    read_at = time.time() - routes.change_feed.retention_seconds - 1
+    expired = encode_checkpoint(0, 0, read_at)
+    response = test_app.get(
+        f"/candidates/changes?checkpoint={expired}", headers=auth_headers
+    )
+    assert response.status_code == 410
+
+    # The horizon and the changes are read from the primary
+    operations = []
+    for method in ("current_revision", "changes"):
+        read = getattr(TEST_CANDIDATES, method)
+        monkeypatch.setattr(
+            TEST_CANDIDATES,
+            method,
+            lambda *args, read=read, method=method: operations.append(
+                (method, args[3] if method == "changes" else args[0])
+            )
+            or read(*args),
+        )
+    monkeypatch.setattr(routes.change_feed, "settle_seconds", 0)
+    response = test_app.get("/candidates/changes?since=0", headers=auth_headers)
+    assert response.status_code == 200
+    assert operations and all(operation is None for _, operation in operations)
+
+    test_app.delete(f"/candidate/{kept_id}", headers=auth_headers)
+
+
+def test_backfill_candidates(test_app):
+    legacy = {
+        "_id": "legacy-candidate",
+        "first_name": "Legacy",
+        "last_name": "Doe",
+        "email": "legacy.doe@example.com",
+        "career_level": "Senior",
+        "job_major": "Computer Science",
+        "years_of_experience": 9,
+        "degree_type": "Master",
+        "skills": ["Cobol"],
+        "nationality": "JO",
+        "city": "Irbid",
+        "salary": 3000.0,
+        "gender": "Male",
+    }
+    # Candidates stored before revisions, fingerprints and locations were written
+    if isinstance(TEST_CANDIDATES, MongoCandidateRepository):
+        TEST_CANDIDATES.collection.insert_one(dict(legacy))
+    else:
+        # The in-memory engine always stamps revisions
+        TEST_CANDIDATES.collection.insert({**legacy, REVISION_FIELD: 0})
+
+    result = backfill_candidates(
+        TEST_CANDIDATES, routes.candidate_dedup, routes.gazetteer, batch_size=1
+    )
+    assert result == {"updated": 1, "skipped": 0}
+    candidate = TEST_CANDIDATES.get(legacy["_id"])
+    assert candidate[REVISION_FIELD] > 0
+    assert candidate[SIGNATURE_FIELD] == routes.candidate_dedup.fingerprint(legacy)[
+        SIGNATURE_FIELD
+    ]
+    assert candidate["_location"] == routes.gazetteer.location("Irbid")["_location"]
+
+    # Backfilled candidates are left alone
+    assert backfill_candidates(
+        TEST_CANDIDATES, routes.candidate_dedup, routes.gazetteer
+    ) == {"updated": 0, "skipped": 0}
+
+    test_app.delete(f"/candidate/{legacy['_id']}", headers=auth_headers)
+
+
+def test_geo_search(test_app):
+    candidate_data = {
+        "first_name": "Geo",
+        "last_name": "Search",
+        "career_level": "Senior",
+        "job_major": "Geography",
+        "years_of_experience": 4,
+        "degree_type": "Bachelor",
+        "skills": ["GIS"],
+        "nationality": "JO",
+        "salary": 1500.0,
+        "gender": "Male",
+    }
+    ids = {}
+    for city in ("Irbid", "Zarqa", "Aqaba", "Atlantis"):
+        response = test_app.post(
+            "/candidate",
+            json={
+                **candidate_data,
+                "email": f"geo.{city.lower()}@example.com",
+                "city": city,
+            },
+            headers=auth_headers,
+        )
+        assert response.status_code == 201
+        # Locations are stored on the candidate, not returned
+        assert "_location" not in response.json()
+        ids[city] = response.json()["_id"]
+
+    def search(query):
+        response = test_app.get(
+            f"/all-candidates?job_major=Geography&{query}", headers=auth_headers
+        )
+        assert response.status_code == 200
+        return [candidate["_id"] for candidate in response.json()]
+
+    # Nearest first: Zarqa is about 20 km from Amman, Irbid about 70 km
+    assert search("near=Amman&radius_km=100") == [ids["Zarqa"], ids["Irbid"]]
+    assert search("near=amman") == [ids["Zarqa"]]
+    assert search("near=32.55,35.85&radius_km=10") == [ids["Irbid"]]
+    assert search("near=Amman&radius_km=100&city=Irbid") == [ids["Irbid"]]
+
+    # Moving a candidate moves its location
+    test_app.patch(
+        f"/candidate/{ids['Aqaba']}", json={"city": "Madaba"}, headers=auth_headers
+    )
+    assert ids["Aqaba"] in search("near=Amman")
+
+    response = test_app.get("/all-candidates?near=Atlantis", headers=auth_headers)
+    assert response.status_code == 400
+    response = test_app.get("/all-candidates?near=95,35", headers=auth_headers)
+    assert response.status_code == 400
+
+    for candidate_id in ids.values():
+        test_app.delete(f"/candidate/{candidate_id}", headers=auth_headers)
+
+
+def test_candidate_counts(test_app, monkeypatch):
+    candidate_data = {
+        "first_name": "Count",
+        "last_name": "Me",
+        "career_level": "Junior",
+        "job_major": "Counting",
+        "years_of_experience": 1,
+        "degree_type": "Bachelor",
+        "skills": ["Arithmetic"],
+        "nationality": "JO",
+        "city": "Amman",
+        "salary": 800.0,
+        "gender": "Female",
+    }
+
+    def create(index):
+        response = test_app.post(
+            "/candidate",
+            json={**candidate_data, "email": f"count.{index}@example.com"},
+            headers=auth_headers,
+        )
+        assert response.status_code == 201
+        return response.json()["_id"]
+
+    ids = [create(index) for index in range(3)]
+
+    def search(query):
+        response = test_app.get(
+            f"/all-candidates?job_major=Counting&{query}", headers=auth_headers
+        )
+        assert response.status_code == 200
+        return response
+
+    # Every page carries the total of the whole list
+    first = search("page=1&page_size=2")
+    second = search("page=2&page_size=2")
+    assert len(first.json()) == 2 and len(second.json()) == 1
+    assert {c["_id"] for c in first.json() + second.json()} == set(ids)
+    assert first.headers["X-Total-Count"] == second.headers["X-Total-Count"] == "3"
+    assert first.headers["X-Total-Count-Relation"] == "eq"
+
+    # Approximate counts stop at the limit
+    monkeypatch.setattr(routes, "CANDIDATE_COUNT_LIMIT", 2)
+    response = search("page=1&page_size=2&count=approximate")
+    assert response.headers["X-Total-Count"] == "2"
+    assert response.headers["X-Total-Count-Relation"] == "gte"
+    assert "X-Total-Count" not in search("page=1&page_size=2&count=none").headers
+
+    # Streams are only counted on request
+    assert "X-Total-Count" not in search("stream=true").headers
+    assert search("stream=true&count=exact").headers["X-Total-Count"] == "3"
+
+    # Counts that time out or fail only drop the total, not the list
+    repository = routes.detect_candidate_context()
+    for error in (
+        ExecutionTimeout("operation exceeded time limit", 50),
+        OperationFailure("operation was interrupted", INTERRUPTED),
+    ):
+
+        def failing_count(*args, **kwargs):
+            raise error
+
+        monkeypatch.setattr(repository, "count", failing_count)
+        routes.candidate_counts.invalidate()
+        response = search("page=1&page_size=5")
+        assert len(response.json()) == 3
+        assert "X-Total-Count" not in response.headers
+
+    # Unpaginated lists are not counted, their total is their length
+    response = search("count=exact")
+    assert response.headers["X-Total-Count"] == "3"
+    assert response.headers["X-Total-Count-Relation"] == "eq"
+    assert "X-Total-Count" not in search("count=none").headers
+    monkeypatch.undo()
+
+    # Writes invalidate the cached totals
+    ids.append(create(3))
+    assert search("page=1&page_size=2").headers["X-Total-Count"] == "4"
+
+    response = test_app.get("/all-candidates", headers=auth_headers)
+    assert response.headers["X-Total-Count"] == str(len(response.json()))
+
+    response = test_app.get("/metrics/candidate-queries", headers=auth_headers)
+    assert response.json()["counts"]["executed"] >= 1
+
+    for candidate_id in ids:
+        test_app.delete(f"/candidate/{candidate_id}", headers=auth_headers)
+
 
 def test_generate_report(test_app):
 
@@ -394,9 +1058,863 @@ def test_generate_report(test_app):
     assert response.text.startswith(expected_headers)
 
 
+def test_create_candidate_batched(test_app, monkeypatch):
+    batcher = InsertBatcher(
+        lambda candidates: TEST_CANDIDATES.insert_many(candidates), max_delay_ms=1
+    )
+    monkeypatch.setattr(routes, "candidate_inserts", batcher)
+    candidate_data = {
+        "first_name": "Batch",
+        "last_name": "Doe",
+        "email": "batch.doe@example.com",
+        "career_level": "Junior",
+        "job_major": "Physics",
+        "years_of_experience": 1,
+        "degree_type": "Bachelor",
+        "skills": ["C"],
+        "nationality": "JO",
+        "city": "Amman",
+        "salary": 1000.0,
+        "gender": "Female",
+    }
+
+    response = test_app.post("/candidate", json=candidate_data, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["email"] == "batch.doe@example.com"
+
+    # Per-row duplicate errors are reported to the request that caused them
+    response = test_app.post("/candidate", json=candidate_data, headers=auth_headers)
+    assert response.status_code == 400
+    assert batcher.stats()["documents"] == 2
+
+    # Concurrent inserts are flushed as one batch, each request getting its own row back, and a duplicate row
+    # only fails its own request
+    batcher = InsertBatcher(
+        lambda candidates: TEST_CANDIDATES.insert_many(candidates),
+        max_delay_ms=5000,
+        max_batch=4,
+    )
+    monkeypatch.setattr(routes, "candidate_inserts", batcher)
+    emails = [f"batch.{index}@example.com" for index in range(3)]
+    emails.append("batch.doe@example.com")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(
+            executor.map(
+                lambda email: test_app.post(
+                    "/candidate",
+                    json={**candidate_data, "email": email},
+                    headers=auth_headers,
+                ),
+                emails,
+            )
+        )
+    assert [response.status_code for response in responses] == [201, 201, 201, 400]
+    assert [response.json()["email"] for response in responses[:3]] == emails[:3]
+    assert len({response.json()["_id"] for response in responses[:3]}) == 3
+    assert batcher.stats()["batches"] == 1
+    assert batcher.stats()["largest_batch"] == 4
+
+
+def test_candidate_duplicates(test_app, monkeypatch):
+    candidate_data = {
+        "first_name": "Mohammad",
+        "last_name": "Hanbali",
+        "email": "m.hanbali@example.com",
+        "career_level": "Senior",
+        "job_major": "Computer Science",
+        "years_of_experience": 5,
+        "degree_type": "Bachelor",
+        "skills": ["Python", "Go"],
+        "nationality": "JO",
+        "city": "Amman",
+        "salary": 3000.0,
+        "gender": "Male",
+    }
+    response = test_app.post("/candidate", json=candidate_data, headers=auth_headers)
+    assert response.status_code == 201
+    original_id = response.json()["_id"]
+
+    # Same person through another partner: different email, slightly different spelling
+    near_duplicate = {
+        **candidate_data,
+        "last_name": "Hanbaly",
+        "email": "mohammad.hanbaly@example.com",
+    }
+
+    # Test the reject mode
+    monkeypatch.setattr(routes, "DEDUP_ON_INSERT", "reject")
+    response = test_app.post("/candidate", json=near_duplicate, headers=auth_headers)
+    assert response.status_code == 409
+    assert response.json()["duplicates"][0]["_id"] == original_id
+
+    # Test the warn mode
+    monkeypatch.setattr(routes, "DEDUP_ON_INSERT", "warn")
+    response = test_app.post("/candidate", json=near_duplicate, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.headers["x-possible-duplicates"] == original_id
+    duplicate_id = response.json()["_id"]
+
+    # Patches refresh the fingerprint in the same write, taking a single revision
+    repository = routes.detect_candidate_context()
+    revision = repository.current_revision()
+    response = test_app.patch(
+        f"/candidate/{duplicate_id}",
+        json={"last_name": "Hanbale", "add_skills": ["Rust"]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    patched = repository.get(duplicate_id)
+    assert patched[REVISION_FIELD] == revision + 1
+    assert repository.current_revision() == revision + 1
+    assert patched["skills"] == ["Python", "Go", "Rust"]
+    assert patched[SIGNATURE_FIELD] == routes.candidate_dedup.signature(patched)
+
+    # Test the batch job
+    response = test_app.get("/admin/duplicates", headers=auth_headers)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(routes, "ADMIN_EMAILS", {"useremail@example.com"})
+    response = test_app.get("/admin/duplicates", headers=auth_headers)
+    assert response.status_code == 200
+    assert any(
+        {original_id, duplicate_id} <= set(cluster)
+        for cluster in response.json()["clusters"]
+    )
+
+
+def test_saved_searches(test_app, monkeypatch):
+    monkeypatch.setattr(routes.percolator, "settle_seconds", 0)
+    response = test_app.post(
+        "/saved-searches", json={"name": "Everyone"}, headers=auth_headers
+    )
+    assert response.status_code == 400
+
+    response = test_app.post(
+        "/saved-searches",
+        json={
+            "name": "Senior Go developers in Irbid",
+            "career_level": "Senior",
+            "skills": ["Go"],
+            "city": "Irbid",
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    search_id = response.json()["_id"]
+    # Searches without equality filters are tested against every candidate
+    response = test_app.post(
+        "/saved-searches",
+        json={"name": "Keyword", "keywords": "Percolated"},
+        headers=auth_headers,
+    )
+    keyword_search_id = response.json()["_id"]
+    response = test_app.post(
+        "/saved-searches",
+        json={"name": "Unix", "keywords": "*nix"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+    response = test_app.get("/saved-searches", headers=auth_headers)
+    assert {search["_id"] for search in response.json()} == {
+        search_id,
+        keyword_search_id,
+    }
+
+    candidate_data = {
+        "first_name": "Saved",
+        "last_name": "Search",
+        "email": "saved.search@example.com",
+        "career_level": "Senior",
+        "job_major": "Computer Science",
+        "years_of_experience": 6,
+        "degree_type": "Bachelor",
+        "skills": ["Go", "Python"],
+        "nationality": "JO",
+        "city": "Irbid",
+        "salary": 2500.0,
+        "gender": "Female",
+    }
+    response = test_app.post("/candidate", json=candidate_data, headers=auth_headers)
+    matching_id = response.json()["_id"]
+    response = test_app.post(
+        "/candidate",
+        json={
+            **candidate_data,
+            "email": "junior.search@example.com",
+            "career_level": "Junior",
+        },
+        headers=auth_headers,
+    )
+    junior_id = response.json()["_id"]
+
+    response = test_app.get("/saved-searches/matches", headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert [match["candidate"]["_id"] for match in body["matches"]] == [matching_id]
+    assert body["matches"][0]["search_id"] == search_id
+    cursor = body["cursor"]
+
+    # A search that cannot be evaluated (e.g. saved before keywords were validated) is skipped alone
+    routes.percolator.add(
+        {
+            "_id": "broken",
+            "name": "Unix",
+            "user_email": "useremail@example.com",
+            "keywords": "*nix",
+        }
+    )
+
+    # Updates are matched too, and a candidate is only reported once per search
+    for _ in range(2):
+        test_app.patch(
+            f"/candidate/{junior_id}",
+            json={"career_level": "Senior", "last_name": "Percolated"},
+            headers=auth_headers,
+        )
+    response = test_app.get(
+        f"/saved-searches/matches?after={cursor}", headers=auth_headers
+    )
+    matches = response.json()["matches"]
+    assert sorted(match["search_id"] for match in matches) == sorted(
+        [search_id, keyword_search_id]
+    )
+    assert {match["candidate"]["_id"] for match in matches} == {junior_id}
+    response = test_app.get(
+        f"/saved-searches/matches?after={response.json()['cursor']}",
+        headers=auth_headers,
+    )
+    assert response.json()["matches"] == []
+
+    # Candidates are only tested against the searches sharing one of their values
+    stats = test_app.get("/metrics/saved-searches", headers=auth_headers).json()
+    assert stats["unanchored"] == 2
+    assert stats["search_errors"] == 2
+    assert stats["errors"] == 0
+    routes.percolator.remove("broken")
+    assert stats["searches_tested"] < stats["candidates"] * stats["searches"]
+
+    response = test_app.delete(f"/saved-searches/{search_id}", headers=auth_headers)
+    assert response.status_code == 204
+    response = test_app.delete(f"/saved-searches/{search_id}", headers=auth_headers)
+    assert response.status_code == 404
+    response = test_app.get(
+        f"/saved-searches/matches?search_id={search_id}", headers=auth_headers
+    )
+    assert response.json()["matches"] == []
+
+    for candidate_id in (matching_id, junior_id):
+        test_app.delete(f"/candidate/{candidate_id}", headers=auth_headers)
+
+
+def test_saved_search_match_order(test_app):
+    TEST_SAVED_SEARCHES.insert(
+        {"_id": "live", "name": "Live", "user_email": "order@example.com"}
+    )
+
+    def record(candidate_id):
+        TEST_SAVED_SEARCHES.record_matches(
+            [
+                {
+                    "_id": f"live:{candidate_id}",
+                    "search_id": "live",
+                    "user_email": "order@example.com",
+                    "candidate": {"_id": candidate_id},
+                }
+            ]
+        )
+
+    # A match recorded late (e.g. for a candidate written at a lower revision) still comes after the fetched ones
+    record("b")
+    cursor = TEST_SAVED_SEARCHES.find_matches("order@example.com")[-1]["cursor"]
+    record("a")
+    matches = TEST_SAVED_SEARCHES.find_matches("order@example.com", cursor)
+    assert [match["candidate"]["_id"] for match in matches] == ["a"]
+
+    # Matches are only served once settled
+    settled = datetime.now(timezone.utc) - timedelta(seconds=60)
+    matches = TEST_SAVED_SEARCHES.find_matches(
+        "order@example.com", recorded_before=settled
+    )
+    assert matches == []
+
+    # Matches recorded after their search was deleted are not served
+    TEST_SAVED_SEARCHES.delete("order@example.com", "live")
+    record("c")
+    assert TEST_SAVED_SEARCHES.find_matches("order@example.com") == []
+
+    # Local adds and removes made while the index is refreshed survive the refresh
+    percolator = Percolator(lambda search: {"city": search["city"]})
+    added = {"_id": "added", "user_email": "order@example.com", "city": "Irbid"}
+    removed = {"_id": "removed", "user_email": "order@example.com", "city": "Irbid"}
+    percolator.add(removed)
+
+    def find(user_email=None):
+        percolator.add(added)
+        percolator.remove("removed")
+        return [removed]
+
+    percolator.refresh(SimpleNamespace(find=find))
+    assert [search["_id"] for search in percolator.match({"city": "Irbid"})] == ["added"]
+
+
+def test_idempotency_keys(test_app):
+    candidate_data = {
+        "first_name": "Retry",
+        "last_name": "Doe",
+        "email": "retry.doe@example.com",
+        "career_level": "Junior",
+        "job_major": "Physics",
+        "years_of_experience": 1,
+        "degree_type": "Master",
+        "skills": ["Python"],
+        "nationality": "JO",
+        "city": "Aqaba",
+        "salary": 1500.0,
+        "gender": "Female",
+    }
+    headers = {**auth_headers, "Idempotency-Key": "create-retry-doe"}
+    response = test_app.post("/candidate", json=candidate_data, headers=headers)
+    assert response.status_code == 201
+    assert "idempotent-replayed" not in response.headers
+    created = response.json()
+    etag = response.headers["etag"]
+
+    # A retry gets the stored response instead of a duplicate email error
+    response = test_app.post("/candidate", json=candidate_data, headers=headers)
+    assert response.status_code == 201
+    assert response.headers["idempotent-replayed"] == "true"
+    assert response.headers["etag"] == etag
+    assert response.json() == created
+
+    # The same key cannot be reused for another request
+    response = test_app.post(
+        "/candidate", json={**candidate_data, "city": "Irbid"}, headers=headers
+    )
+    assert response.status_code == 422
+
+    # Test user creation, whose replays skip the password hashing
+    user_data = {
+        "first_name": "Retry",
+        "last_name": "User",
+        "email": "retry.user@example.com",
+        "password": "retryPassword",
+    }
+    headers = {"Idempotency-Key": "create-retry-user"}
+    first = test_app.post("/user", json=user_data, headers=headers)
+    second = test_app.post("/user", json=user_data, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.json()["_id"] == first.json()["_id"]
+
+    # Concurrent requests with the same key run the handler once
+    idempotent_requests = IdempotentRequests("secret")
+    store = MemoryIdempotencyStore()
+    calls = []
+
+    def handler():
+        calls.append(True)
+        time.sleep(0.1)
+        return JSONResponse({"created": len(calls)}, status_code=201)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(
+            executor.map(
+                lambda _: idempotent_requests.run(
+                    store, "key", "scope", {"payload": 1}, handler
+                ),
+                range(4),
+            )
+        )
+    assert len(calls) == 1
+    assert {response.body for response in responses} == {b'{"created":1}'}
+    assert idempotent_requests.stats()["replayed"] == 3
+
+    response = test_app.get("/metrics/idempotency", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["replayed"] >= 1
+
+
+def test_candidate_query_metrics(test_app, monkeypatch):
+    response = test_app.get(
+        "/metrics/candidate-queries", headers=invalid_auth_headers
+    )
+    assert response.status_code == 401
+
+    # Concurrent identical queries, keyed the same regardless of list order, run a single DB query
+    requests = 5
+    candidate_queries = SingleFlight()
+    monkeypatch.setattr(routes, "candidate_queries", candidate_queries)
+    find = TEST_CANDIDATES.find
+    finds = []
+
+    def blocking_find(*args, **kwargs):
+        finds.append(args)
+        # Hold the query until every other request waits on it
+        deadline = time.monotonic() + 5
+        while candidate_queries.stats()["collapsed"] < requests - 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(TEST_CANDIDATES, "find", blocking_find)
+    urls = [
+        "/all-candidates?skills=Python&skills=Java",
+        "/all-candidates?skills=Java&skills=Python",
+    ]
+    with ThreadPoolExecutor(max_workers=requests) as executor:
+        responses = list(
+            executor.map(
+                lambda index: test_app.get(urls[index % 2], headers=auth_headers),
+                range(requests),
+            )
+        )
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert len(finds) == 1
+
+    response = test_app.get("/metrics/candidate-queries", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["executed"] == 1
+    assert response.json()["collapsed"] == requests - 1
+    assert response.json()["cache_hits"] == 0
+
+
+def test_query_budgets(test_app, monkeypatch):
+    response = test_app.get("/metrics/query-budgets", headers=invalid_auth_headers)
+    assert response.status_code == 401
+
+    # The caller's deadline can only shorten the operation's budget
+    assert QueryBudget("list", 5000, "200").budget_ms == 200
+    assert QueryBudget("list", 100, "200").budget_ms == 100
+    assert QueryBudget("list", 100, "invalid").budget_ms == 100
+
+    # Test a query running out of budget
+    def timeout(*args, **kwargs):
+        raise ExecutionTimeout("operation exceeded time limit", 50)
+
+    monkeypatch.setattr(TEST_CANDIDATES, "find", timeout)
+    response = test_app.get(
+        "/all-candidates?keywords=budget",
+        headers={**auth_headers, "X-Request-Timeout-Ms": "50"},
+    )
+    assert response.status_code == 504
+
+    response = test_app.get("/metrics/query-budgets", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["operations"]["list"]["timeouts"] >= 1
+    assert response.json()["budgets_ms"]["report"] >= 0
+
+    # Followers of a shared query killed for its leader's client run it again
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def interrupted():
+        started.set()
+        time.sleep(0.2)
+        raise OperationFailure("operation was interrupted", INTERRUPTED)
+
+    def retry_if(error):
+        return isinstance(error, OperationFailure) and error.code == INTERRUPTED
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", interrupted, retry_if)
+        started.wait()
+        follower = executor.submit(flight.do, "key", lambda: "result", retry_if)
+        with pytest.raises(OperationFailure):
+            leader.result()
+        assert follower.result() == "result"
+    assert flight.stats()["collapsed"] == 1
+    assert flight.stats()["executed"] == 2
+
+    # Cached results are bounded: expired ones are dropped as new ones are stored, then the least recently used
+    flight = SingleFlight(ttl=0.1, max_entries=2)
+    flight.do("expired", lambda: "expired")
+    time.sleep(0.15)
+    flight.ttl = 60
+    flight.do("first", lambda: "first")
+    assert flight.stats()["cached_keys"] == 1
+    flight.do("second", lambda: "second")
+    flight.do("first", lambda: "recomputed")
+    flight.do("third", lambda: "third")
+    assert flight.stats()["cached_keys"] == 2
+    assert flight.do("first", lambda: "recomputed") == "first"
+    assert flight.do("second", lambda: "recomputed") == "recomputed"
+
+
+def test_slow_queries(test_app, monkeypatch):
+    # Test as a non-admin user
+    response = test_app.get("/admin/slow-queries", headers=auth_headers)
+    assert response.status_code == 403
+
+    # Test as an admin user
+    monkeypatch.setattr(routes, "ADMIN_EMAILS", {"useremail@example.com"})
+    response = test_app.get("/admin/slow-queries?top=5", headers=auth_headers)
+    assert response.status_code == 200
+    assert "threshold_ms" in response.json()
+    assert isinstance(response.json()["shapes"], list)
+
+
+def test_slow_query_log(tmp_path):
+    explains = []
+
+    def explain(command, read_preference):
+        explains.append((command, read_preference))
+        return {
+            "queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+            "executionStats": {"totalDocsExamined": 500, "nReturned": 3},
+        }
+
+    slow_queries = SlowQueryLog(
+        "slow_test", threshold_ms=100, log_path=str(tmp_path / "slow.log")
+    )
+    slow_queries.watch(SimpleNamespace(name="db", command=explain))
+    request_ids = iter(range(100))
+
+    def run(command, reply, duration_ms=150):
+        name = next(iter(command))
+        request_id = next(request_ids)
+        slow_queries.started(
+            SimpleNamespace(
+                command_name=name,
+                database_name="db",
+                command=command,
+                request_id=request_id,
+            )
+        )
+        slow_queries.succeeded(
+            SimpleNamespace(
+                command_name=name,
+                request_id=request_id,
+                reply=reply,
+                duration_micros=duration_ms * 1000,
+            )
+        )
+
+    # A slow find is recorded once its cursor is exhausted, with the time and documents of every batch
+    for _ in range(3):
+        run(
+            {"find": "slow_test", "filter": {"city": "Amman"}},
+            {"cursor": {"id": 42, "firstBatch": [{}, {}]}},
+        )
+        run(
+            {"getMore": 42, "collection": "slow_test"},
+            {"cursor": {"id": 0, "nextBatch": [{}]}},
+            duration_ms=1,
+        )
+    # Fast queries are not recorded
+    run({"count": "slow_test", "query": {"city": "Amman"}}, {"n": 1}, duration_ms=1)
+    # A fast first batch followed by a slow drain is recorded, and explained with the original read preference
+    run(
+        {
+            "find": "slow_test",
+            "filter": {"skills": "Go"},
+            "$readPreference": {
+                "mode": "secondaryPreferred",
+                "maxStalenessSeconds": 90,
+            },
+        },
+        {"cursor": {"id": 43, "firstBatch": [{}]}},
+        duration_ms=1,
+    )
+    run(
+        {"getMore": 43, "collection": "slow_test"},
+        {"cursor": {"id": 0, "nextBatch": [{}]}},
+        duration_ms=120,
+    )
+
+    slow_queries._explainer.shutdown(wait=True)
+    shape, drained = slow_queries.summary()
+    assert shape["shape"] == '{"city": 1}'
+    assert shape["count"] == 3
+    assert shape["total_ms"] == 453
+    assert shape["max_ms"] == 151
+    assert shape["returned"] == 9
+    assert drained["shape"] == '{"skills": 1}'
+    assert drained["total_ms"] == 121
+    # The shape is only explained once per interval
+    assert len(explains) == 2
+    command, read_preference = explains[0]
+    assert command["explain"] == {"find": "slow_test", "filter": {"city": "Amman"}}
+    assert read_preference.mongos_mode == "primary"
+    command, read_preference = explains[1]
+    assert command["explain"] == {"find": "slow_test", "filter": {"skills": "Go"}}
+    assert read_preference.mongos_mode == "secondaryPreferred"
+    assert read_preference.max_staleness == 90
+    assert shape["explained"] == 1
+    assert shape["docs_examined"] == 500
+    assert shape["last_plan"]["stages"] == ["COLLSCAN"]
+    records = [
+        json.loads(line) for line in (tmp_path / "slow.log").read_text().splitlines()
+    ]
+    assert [record["returned"] for record in records] == [3, 3, 3, 2]
+    assert sum("plan" in record for record in records) == 2
+
+
+def test_read_routing(test_app, monkeypatch):
+    response = test_app.get("/admin/read-routing", headers=auth_headers)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(routes, "ADMIN_EMAILS", {"useremail@example.com"})
+    response = test_app.get("/admin/read-routing", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["preferences"]["list"]["mode"] == READ_PREFERENCES[
+        "list"
+    ].mongos_mode
+    assert isinstance(response.json()["members"], list)
+
+    # Keyword searches are read with the search read preference, plain lists with the list one
+    operations = []
+    find = TEST_CANDIDATES.find
+
+    def routed_find(*args, **kwargs):
+        operations.append(kwargs["operation"])
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(TEST_CANDIDATES, "find", routed_find)
+    test_app.get("/all-candidates?keywords=Doe&count=none", headers=auth_headers)
+    test_app.get("/all-candidates?city=Amman&count=none", headers=auth_headers)
+    assert operations == ["search", "list"]
+
+
+def test_memory_profiling(test_app, monkeypatch):
+    response = test_app.get("/admin/memory", headers=auth_headers)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(routes, "ADMIN_EMAILS", {"useremail@example.com"})
+    response = test_app.get("/admin/memory", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["rss_bytes"] > 0
+    assert "generations" in response.json()["gc"]
+
+    response = test_app.post(
+        "/admin/memory/snapshots?name=before", headers=auth_headers
+    )
+    assert response.status_code == 409
+
+    response = test_app.post("/admin/memory/tracing", headers=auth_headers)
+    assert response.json()["tracing"]
+    try:
+        test_app.post("/admin/memory/snapshots?name=before", headers=auth_headers)
+        retained = [f"allocation {index}" for index in range(20000)]
+        response = test_app.get("/admin/memory/diff?first=before", headers=auth_headers)
+        assert response.status_code == 200
+        # The list comprehension above is the site that grew the most
+        grown = response.json()["sites"][0]
+        assert "test_main.py" in grown["site"]
+        assert grown["size_diff_bytes"] > 0
+
+        response = test_app.get(
+            "/admin/memory/snapshots/before?top=5", headers=auth_headers
+        )
+        assert len(response.json()["sites"]) == 5
+        response = test_app.get(
+            "/admin/memory/snapshots/unknown", headers=auth_headers
+        )
+        assert response.status_code == 404
+        assert len(retained) == 20000
+    finally:
+        response = test_app.delete("/admin/memory/tracing", headers=auth_headers)
+    assert response.status_code == 204
+    response = test_app.get("/admin/memory", headers=auth_headers)
+    assert not response.json()["tracemalloc"]["tracing"]
+    assert response.json()["tracemalloc"]["snapshots"] == []
+
+
+@pytest.mark.skipif(
+    not CONFIG.get("TEST_REPLICA_SET_URI"),
+    reason="Requires a local replica set (TEST_REPLICA_SET_URI)",
+)
+def test_read_routing_replica_set():
+    # e.g. mongod --replSet rs0 --port 27017 && mongosh --eval "rs.initiate()"
+    usage = MemberUsage()
+    client = MongoClient(CONFIG["TEST_REPLICA_SET_URI"], event_listeners=[usage])
+    repository = MongoCandidateRepository(client["read_routing_test"], READ_PREFERENCES)
+    try:
+        repository.insert({"_id": "routed", "email": "routed@example.com"})
+
+        # Read-after-write goes to the primary, the list falls back to it on a single node
+        assert repository.get("routed")["email"] == "routed@example.com"
+        assert len(repository.find({"_id": "routed"}, operation="list")) == 1
+
+        members = usage.summary([client])
+        assert len(members) == 1
+        assert members[0]["role"] == "primary"
+        assert members[0]["commands"]["read_routing_test.find"] >= 2
+    finally:
+        client.drop_database("read_routing_test")
+        client.close()
+
+
+def test_kill_routed_query():
+    class Admin:
+        def __init__(self, operations):
+            self.operations = operations
+            self.killed = []
+
+        def aggregate(self, pipeline):
+            comment = pipeline[1]["$match"]["command.comment"]
+            return [o for o in self.operations if o["command"]["comment"] == comment]
+
+        def command(self, name, op):
+            self.killed.append(op)
+
+    primary = Admin([{"opid": 1, "command": {"comment": "report:other"}}])
+    secondary = Admin([{"opid": 2, "command": {"comment": "list:routed"}}])
+    client = SimpleNamespace(admin=primary, secondaries={("secondary", 27017)})
+    collection = SimpleNamespace(database=SimpleNamespace(client=client))
+    members = SimpleNamespace(get=lambda address: SimpleNamespace(admin=secondary))
+    repository = MongoCandidateRepository(
+        {"candidate": collection, "counter": None, "candidate_tombstone": None},
+        member_clients=members,
+    )
+
+    # A list routed to a secondary is killed there
+    repository.kill("list:routed")
+    assert secondary.killed == [2]
+    assert primary.killed == []
+
+
+def test_access_log(tmp_path, monkeypatch):
+    # Under several workers, each worker writes its own log files
+    assert worker_log_path("logs/access.log") == "logs/access.log"
+    monkeypatch.setenv(PER_WORKER_LOGS, "1")
+    assert worker_log_path("logs/access.log") == f"logs/access.{os.getpid()}.log"
+    assert worker_log_path("") == ""
+
+    access_log = AccessLog(str(tmp_path / "access.log"), sample_rate=0)
+    logged_app = FastAPI()
+    logged_app.include_router(router)
+    logged_app.add_middleware(AccessLogMiddleware, access_log=access_log)
+
+    with TestClient(logged_app) as client:
+        # Successful reads are sampled out, writes and errors are always logged
+        client.get("/health")
+        response = client.post(
+            "/candidate",
+            json={
+                "first_name": "Audit",
+                "last_name": "Doe",
+                "email": "audit.doe@example.com",
+                "career_level": "Junior",
+                "job_major": "History",
+                "years_of_experience": 1,
+                "degree_type": "Bachelor",
+                "skills": ["Writing"],
+                "nationality": "JO",
+                "city": "Salt",
+                "salary": 1000.0,
+                "gender": "Female",
+            },
+            headers=auth_headers,
+        )
+        assert response.status_code == 201
+        candidate_id = response.json()["_id"]
+        client.get("/candidate/unknown-id", headers=auth_headers)
+    access_log.stop()
+
+    records = [
+        json.loads(line) for line in (tmp_path / "access.log").read_text().splitlines()
+    ]
+    assert [record["route"] for record in records] == [
+        "/candidate",
+        "/candidate/{candidate_id}",
+    ]
+    assert records[0]["method"] == "POST"
+    assert records[0]["status"] == 201
+    assert records[0]["user"] == "useremail@example.com"
+    assert records[0]["candidate_id"] == candidate_id
+    assert records[0]["latency_ms"] > 0
+    assert records[1]["status"] == 404
+    assert records[1]["candidate_id"] == "unknown-id"
+    assert access_log.stats()["written"] == 2
+
+    # Commands run by several threads of the same request add up
+    context = {}
+    token = REQUEST_CONTEXT.set(context)
+    try:
+        threads = [contextvars.copy_context() for _ in range(4)]
+    finally:
+        REQUEST_CONTEXT.reset(token)
+    event = SimpleNamespace(duration_micros=1000)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(
+                thread.run, lambda: [DbTimer().succeeded(event) for _ in range(2000)]
+            )
+            for thread in threads
+        ]
+        for future in futures:
+            future.result()
+    assert context["db_ms"] == 8000
+
+
+def test_warm_up():
+    calls = []
+
+    def fail():
+        raise RuntimeError("unavailable")
+
+    # Steps run in order, and a failing step does not stop the others
+    timings = warm_up(
+        {
+            "first": lambda: calls.append("first"),
+            "failing": fail,
+            "last": lambda: calls.append("last"),
+        }
+    )
+    assert calls == ["first", "last"]
+    assert list(timings) == ["first", "failing", "last"]
+    assert timings["failing"] is None
+    assert timings["first"] >= 0 and timings["last"] >= 0
+
+
+def test_revoke_tokens(test_app):
+    response = test_app.post("/token/revoke", headers=invalid_auth_headers)
+    assert response.status_code == 401
+
+    response = test_app.post("/token/revoke", headers=auth_headers)
+    assert response.status_code == 204
+
+    # The revoked token is rejected without waiting for a refresh
+    response = test_app.get("/all-candidates", headers=auth_headers)
+    assert response.status_code == 401
+
+    # A freshly issued token carries the new token version
+    response = test_app.post(
+        "/token", json={"email": "useremail@example.com", "password": "testingPassword"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = test_app.get("/all-candidates", headers=headers)
+    assert response.status_code == 200
+
+    # Stale snapshots are refreshed in the background, and revocations made while a refresh scans the users
+    # survive it
+    scanning, scanned = threading.Event(), threading.Event()
+
+    def find_revoked():
+        scanning.set()
+        scanned.wait(5)
+        return [{"_id": "scanned", TOKEN_VERSION_FIELD: 1}]
+
+    revocations = RevocationFilter(refresh_interval=0)
+    revocations.maybe_refresh(SimpleNamespace(find_revoked=find_revoked))
+    assert scanning.wait(5)
+    revocations.revoke("revoked-locally", 2)
+    scanned.set()
+    for _ in range(50):
+        if revocations.is_revoked("scanned", 0):
+            break
+        time.sleep(0.1)
+    assert revocations.is_revoked("scanned", 0)
+    assert revocations.is_revoked("revoked-locally", 1)
+    assert not revocations.is_revoked("revoked-locally", 2)
+
+
 def test_cleanup(test_app):
     # Drop the user and candidate collections in the testing database
-    app.database.drop_collection("user")
-    app.database.drop_collection("candidate")
+    TEST_USERS.drop()
+    TEST_CANDIDATES.drop()
+    TEST_IDEMPOTENCY_KEYS.drop()
+    TEST_SAVED_SEARCHES.drop()
     test_app.close()
     print(f"Disconnected from testing DB ({TEST_DB_NAME}) successfully.")